@@ -0,0 +1 @@
+# needed for python -m benchmarks.*
@@ -0,0 +1,133 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Times the loader and report queries before and after the index migrations
+
+Builds a synthetic zone on the schema as it was before the indexes went in,
+times each query, applies the remaining migrations and times them again.
+Runs on SQLite unless --backend says otherwise.
+
+Run with: python -m benchmarks.bench_indexes [--domains N] [--repeat N] [--backend sqlite|firebird]'''
+
+import argparse
+import os
+import tempfile
+import time
+
+from gtld_data import gtld_db, gtld_lookup_config
+from gtld_data.backends import BACKENDS
+
+from benchmarks.zone_generator import ZoneGenerator
+
+# Last schema version without the performance indexes
+UNINDEXED_VERSION = 3
+
+QUERIES = [
+    ("resume", """SELECT id, zone_file_id, domain_name, status FROM domains WHERE zone_file_id = ? AND resolved = 0""", True),
+    ("load rdata", """SELECT r.id, r.domain_id, r.rrtype, r.rdata FROM domain_rdata r
+                      JOIN domains d ON d.id = r.domain_id WHERE d.zone_file_id = ?""", True),
+    ("load ptrs", """SELECT dp.domain_id, p.id, p.zone_file_id, p.ip_address, p.reverse_lookup_name
+                     FROM domain_ptr_records dp
+                     JOIN domains d ON d.id = dp.domain_id
+                     JOIN ptr_records p ON p.id = dp.ptr_record_id WHERE d.zone_file_id = ?""", True),
+    ("rdata report", """SELECT d.domain_name, d.status, rd.rrtype, rd.rdata
+                        FROM domains AS d LEFT JOIN domain_rdata AS rd ON (d.id=rd.domain_id)
+                        WHERE rrtype IS NOT NULL""", False),
+    ("ptr report", """SELECT (count(dpr.ptr_record_id)) AS ptr_count, ptr.reverse_lookup_name
+                      FROM domain_ptr_records AS dpr
+                      LEFT JOIN ptr_records AS ptr ON (ptr.id=dpr.ptr_record_id)
+                      GROUP BY ptr.reverse_lookup_name ORDER BY ptr_count DESC""", False),
+    ("nameserver report", """SELECT (count(dns.nameserver_id)) AS nameserver_count, ns.nameserver
+                             FROM domain_nameservers AS dns
+                             LEFT JOIN nameservers AS ns ON (dns.nameserver_id=ns.id)
+                             GROUP BY ns.nameserver ORDER BY nameserver_count DESC""", False),
+    ("domains on nameserver", """SELECT d.domain_name FROM domain_nameservers dn
+                                 JOIN domains d ON d.id = dn.domain_id WHERE dn.nameserver_id = ?""", None),
+]
+
+def time_queries(cursor, zonefile_id, nameserver_id, repeat):
+    '''Returns the best of repeat runs for each query, in seconds'''
+    timings = {}
+    for name, query, by_zone in QUERIES:
+        if by_zone is True:
+            params = [zonefile_id]
+        elif by_zone is None:
+            params = [nameserver_id]
+        else:
+            params = []
+
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cursor.execute(query, params)
+            cursor.fetchall()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        timings[name] = best
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--domains', type=int, default=100000, help='Number of domains in the synthetic zone')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of each query, the best is kept')
+    parser.add_argument('--backend', default='sqlite', choices=sorted(BACKENDS.keys()), help='Database backend to run on')
+    args = parser.parse_args()
+    gtld_lookup_config.database_backend = args.backend
+
+    file_descriptor, db_filename = tempfile.mkstemp()
+    os.close(file_descriptor)
+    os.remove(db_filename)
+    gtld_lookup_config.database_path = db_filename
+
+    try:
+        gtld_db.create_database(target_version=UNINDEXED_VERSION)
+        cursor = gtld_db.database_connection.cursor()
+        zonefile_id = ZoneGenerator(args.domains).populate(cursor)
+        gtld_db.database_connection.commit()
+
+        cursor = gtld_db.database_connection.cursor()
+        cursor.execute("""SELECT MIN(id) FROM nameservers""")
+        nameserver_id = int(cursor.fetchone()[0])
+
+        before = time_queries(cursor, zonefile_id, nameserver_id, args.repeat)
+        gtld_db.database_connection.commit()
+
+        start = time.perf_counter()
+        applied = gtld_db.upgrade()
+        upgrade_time = time.perf_counter() - start
+
+        cursor = gtld_db.database_connection.cursor()
+        after = time_queries(cursor, zonefile_id, nameserver_id, args.repeat)
+        gtld_db.database_connection.commit()
+    finally:
+        if gtld_db.database_connection is not None:
+            gtld_db.database_connection.close()
+        if os.path.exists(db_filename):
+            os.remove(db_filename)
+
+    print("Domains: " + str(args.domains) + ", migrations applied: " + str(applied) +
+          " in %.2fs" % upgrade_time)
+    print("%24s %10s %10s" % ("query", "before", "after"))
+    for name, _, _ in QUERIES:
+        print("%24s %9.3fs %9.3fs" % (name, before[name], after[name]))
+
+if __name__ == "__main__":
+    main()
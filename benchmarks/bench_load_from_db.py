@@ -0,0 +1,105 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Counts the queries needed to load a zone back from the database
+
+Compares ZoneData.load_from_db against reading each domain with
+DomainRecord.from_db, for a few zone sizes. Runs on SQLite unless
+--backend says otherwise.
+
+Run with: python -m benchmarks.bench_load_from_db [--sizes 100,1000,10000] [--backend sqlite|firebird]'''
+
+import argparse
+import os
+import tempfile
+import time
+
+from gtld_data import gtld_db, gtld_lookup_config
+from gtld_data.backends import BACKENDS
+from gtld_data.domain_record import DomainRecord
+from gtld_data.zone_data import ZoneData
+
+from benchmarks.zone_generator import ZoneGenerator
+
+class CountingCursor(object):
+    '''Wraps a cursor, counting the statements run through it'''
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.queries = 0
+
+    def execute(self, *args):
+        self.queries = self.queries + 1
+        return self.cursor.execute(*args)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+def per_domain_load(cursor, zonefile_id):
+    '''The original loader, one from_db per domain'''
+    cursor.execute("""SELECT id FROM domains WHERE zone_file_id = ?""", [zonefile_id])
+    domains = set()
+    for row in cursor.fetchall():
+        domains.add(DomainRecord.from_db(cursor, int(row[0])))
+    return domains
+
+def measure(loader, cursor, zonefile_id):
+    counting_cursor = CountingCursor(cursor)
+    start = time.perf_counter()
+    loader(counting_cursor, zonefile_id)
+    return counting_cursor.queries, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='100,1000,10000', help='Comma separated zone sizes to try')
+    parser.add_argument('--skip-per-domain', action='store_true', help="Don't run the per-domain loader")
+    parser.add_argument('--backend', default='sqlite', choices=sorted(BACKENDS.keys()), help='Database backend to run on')
+    args = parser.parse_args()
+    gtld_lookup_config.database_backend = args.backend
+
+    print("%10s %12s %10s %12s %10s" % ("domains", "bulk queries", "bulk time", "per-domain", "time"))
+    for size in [int(s) for s in args.sizes.split(',')]:
+        file_descriptor, db_filename = tempfile.mkstemp()
+        os.close(file_descriptor)
+        os.remove(db_filename)
+        gtld_lookup_config.database_path = db_filename
+
+        try:
+            gtld_db.create_database()
+            cursor = gtld_db.database_connection.cursor()
+            zonefile_id = ZoneGenerator(size).populate(cursor)
+            gtld_db.database_connection.commit()
+
+            bulk_queries, bulk_time = measure(ZoneData.load_from_db, cursor, zonefile_id)
+            if args.skip_per_domain:
+                print("%10d %12d %9.2fs" % (size, bulk_queries, bulk_time))
+            else:
+                naive_queries, naive_time = measure(per_domain_load, cursor, zonefile_id)
+                print("%10d %12d %9.2fs %12d %9.2fs" % (size, bulk_queries, bulk_time, naive_queries, naive_time))
+        finally:
+            if gtld_db.database_connection is not None:
+                gtld_db.database_connection.close()
+            if os.path.exists(db_filename):
+                os.remove(db_filename)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Measures the memory used by the model objects for a large zone
+
+Builds a synthetic zone of --domains domains (a million by default) out of
+DomainRecord, NameserverRecord, DomainRData and PtrRecord objects. Each
+domain gets two nameservers from a shared pool, one A record and one PTR.
+Prints the size of a single object of each class, and what each step of
+building the zone adds per domain according to tracemalloc.
+
+Run with: python -m benchmarks.bench_memory [--domains 1000000]'''
+
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+
+from gtld_data.domain_rdata import DomainRData
+from gtld_data.domain_record import DomainRecord
+from gtld_data.nameserver_record import NameserverRecord
+from gtld_data.ptr_record import PtrRecord
+
+NAMESERVER_POOL = 5000
+PTR_POOL = 20000
+
+def object_size(factory, count=10000):
+    '''Returns the average memory taken by an object, including its __dict__ and cached hash'''
+    tracemalloc.start()
+    objs = [factory(i) for i in range(count)]
+    for obj in objs:
+        hash(obj)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size // count
+
+def new_rdata(i):
+    rdata_obj = DomainRData()
+    rdata_obj.rrtype = "A"
+    rdata_obj.rdata = "198.51.100." + str(i % 256)
+    return rdata_obj
+
+def build_zone(size, steps):
+    '''Builds the zone a step at a time, recording memory after each'''
+    def record(step):
+        gc.collect()
+        steps.append((step, tracemalloc.get_traced_memory()[0]))
+
+    record('start')
+    nameservers = []
+    for i in range(NAMESERVER_POOL):
+        nameservers.append(NameserverRecord("ns" + str(i % 2 + 1) + ".host" + str(i) + ".net."))
+    ptrs = []
+    for i in range(PTR_POOL):
+        ptrs.append(PtrRecord("192.0." + str(i // 256) + "." + str(i % 256), "parked" + str(i) + ".example.net."))
+    record('shared nameservers and PTRs')
+
+    domains = {}
+    for i in range(size):
+        name = "domain" + str(i) + ".example."
+        domains[name] = DomainRecord(name)
+    record('domains')
+
+    for i, domain in enumerate(domains.values()):
+        domain.nameservers.add(nameservers[i % NAMESERVER_POOL])
+        domain.nameservers.add(nameservers[(i + 1) % NAMESERVER_POOL])
+    record('nameserver links')
+
+    for i, domain in enumerate(domains.values()):
+        rdata_obj = new_rdata(i)
+        domain.records[rdata_obj.rrtype] = {rdata_obj}
+    record('rdata')
+
+    for i, domain in enumerate(domains.values()):
+        domain.reverse_lookup_ptrs.add(ptrs[i % PTR_POOL])
+    record('PTR links')
+
+    return domains
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--domains', type=int, default=1000000, help='Domains in the synthetic zone')
+    args = parser.parse_args()
+
+    # Names are shared with the zone, so leave them out of the per-object sizes
+    print("Size of one object, in bytes:")
+    print("  DomainRecord: " + str(object_size(lambda i: DomainRecord(""))))
+    print("  NameserverRecord: " + str(object_size(lambda i: NameserverRecord(""))))
+    print("  DomainRData: " + str(object_size(new_rdata)))
+    print("  PtrRecord: " + str(object_size(lambda i: PtrRecord("", ""))))
+
+    steps = []
+    tracemalloc.start()
+    start = time.perf_counter()
+    domains = build_zone(args.domains, steps)
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+
+    print("Memory for " + str(len(domains)) + " domains, built in " + ("%.1f" % elapsed) + "s:")
+    for (_, before), (step, after) in zip(steps, steps[1:]):
+        print("  %-28s %8.1f MB %8.1f bytes/domain" % (step, (after - before) / 1e6,
+                                                       (after - before) / float(args.domains)))
+    total = steps[-1][1] - steps[0][1]
+    print("  %-28s %8.1f MB %8.1f bytes/domain" % ('total', total / 1e6, total / float(args.domains)))
+
+if __name__ == "__main__":
+    main()
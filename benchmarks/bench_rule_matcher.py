@@ -0,0 +1,76 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Benchmarks the compiled RuleMatcher against the per-pattern regex loop
+
+Run with: python -m benchmarks.bench_rule_matcher [--names N] [--providers N]'''
+
+import argparse
+import re
+import time
+
+from gtld_data.rule_matcher import RuleMatcher
+
+from tests.rule_patterns import load_patterns, generate_names
+
+def regex_loop(compiled_patterns, names):
+    '''The original ZoneProcessor matching loop'''
+    results = []
+    for name in names:
+        matched = False
+        for pattern in compiled_patterns:
+            if pattern.search(name) is not None:
+                matched = True
+                break
+        results.append(matched)
+    return results
+
+def rule_matcher(matcher, names):
+    return [matcher.search(name) for name in names]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--names', type=int, default=200000, help='Number of names to match')
+    parser.add_argument('--providers', type=int, default=500, help='Number of synthetic parking providers')
+    args = parser.parse_args()
+
+    patterns = load_patterns(args.providers)
+    names = generate_names(args.names, args.providers)
+
+    compiled_patterns = [re.compile(p) for p in patterns]
+    start = time.perf_counter()
+    expected = regex_loop(compiled_patterns, names)
+    regex_time = time.perf_counter() - start
+
+    matcher = RuleMatcher(patterns)
+    start = time.perf_counter()
+    results = rule_matcher(matcher, names)
+    matcher_time = time.perf_counter() - start
+
+    if results != expected:
+        raise RuntimeError("RuleMatcher disagrees with the per-pattern regex loop")
+
+    print("Patterns: " + str(len(patterns)) + ", names: " + str(len(names)) +
+          ", matches: " + str(sum(expected)))
+    print("  regex loop:   %.3fs" % regex_time)
+    print("  RuleMatcher:  %.3fs (%.1fx)" % (matcher_time, regex_time / matcher_time))
+
+if __name__ == "__main__":
+    main()
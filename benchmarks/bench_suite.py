@@ -0,0 +1,219 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Times each stage of processing a zone, on a synthetic zone
+
+Generates a zone with ZoneGenerator and times, separately:
+  parse           ZoneData.load_from_file
+  count           counting domains per nameserver over the zone data
+  count_graph     building a ZoneGraph and counting through it
+  db_write        writing the zone and its resolution results in a bulk load
+  db_load         ZoneData.load_from_db
+  classify        ZoneProcessor.process_zone_data
+  classify_graph  ZoneProcessor.process_zone_graph, graph build included
+
+Each stage's time is the best of --repeat runs. Results can be written
+as JSON with --output, and compared against an earlier run's JSON with
+--compare. Runs on SQLite unless --backend says otherwise, and from the
+top of the tree so the lists in data/ are found.
+
+Run with: python -m benchmarks.bench_suite [--domains 20000] [--repeat 3] [--output results.json] [--compare old.json]'''
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+from gtld_data import gtld_db, gtld_lookup_config
+from gtld_data.backends import BACKENDS, get_backend
+from gtld_data.zone_data import ZoneData
+from gtld_data.zone_graph import ZoneGraph, numpy
+from gtld_data.zone_processor import ZoneProcessor
+
+from benchmarks.zone_generator import ZoneGenerator
+
+PHASES = ['parse', 'count', 'count_graph', 'db_write', 'db_load', 'classify', 'classify_graph']
+
+def load_lists(zone_processor):
+    zone_processor.load_parked_domains_list('data/parking_nameservers.txt')
+    zone_processor.load_blocked_domains_list('data/blocking_nameservers.txt')
+    zone_processor.load_known_expired_ptrs('data/reverse_expired_ptrs.txt')
+    zone_processor.load_known_parked_ptrs('data/reverse_parking_ptrs.txt')
+    zone_processor.load_other_inactive_list('data/other_inactive_nameservers.txt')
+
+def count_nameservers(zone_data):
+    '''Counts the domains on each nameserver by walking the domains'''
+    counts = {}
+    for domain in zone_data.domains.values():
+        for nameserver in domain.nameservers:
+            counts[nameserver.nameserver] = counts.get(nameserver.nameserver, 0) + 1
+    return counts
+
+def run_once(generator, zone_file, db_filename):
+    '''Runs every stage once, returning the time each took and the domain statuses'''
+    timings = {}
+
+    start = time.perf_counter()
+    zone_data = ZoneData.load_from_file(None, zone_file, origin=generator.origin)
+    timings['parse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    count_nameservers(zone_data)
+    timings['count'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ZoneGraph.from_zone_data(zone_data).nameserver_counts()
+    timings['count_graph'] = time.perf_counter() - start
+
+    gtld_lookup_config.database_path = db_filename
+    try:
+        gtld_db.create_database()
+
+        start = time.perf_counter()
+        with gtld_db.bulk_load():
+            cursor = gtld_db.database_connection.cursor()
+            zone_data.process_loaded_zone(cursor)
+            generator.store_resolutions(cursor, zone_data)
+        timings['db_write'] = time.perf_counter() - start
+
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+        start = time.perf_counter()
+        loaded = ZoneData.load_from_db(cursor, zone_data.db_id)
+        timings['db_load'] = time.perf_counter() - start
+        gtld_db.database_connection.commit()
+    finally:
+        if gtld_db.database_connection is not None:
+            gtld_db.database_connection.close()
+        if os.path.exists(db_filename):
+            os.remove(db_filename)
+
+    zone_processor = ZoneProcessor(loaded)
+    load_lists(zone_processor)
+
+    start = time.perf_counter()
+    zone_processor.process_zone_data()
+    timings['classify'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    status_ids = zone_processor.process_zone_graph(ZoneGraph.from_zone_data(loaded))
+    timings['classify_graph'] = time.perf_counter() - start
+
+    statuses = {}
+    for status, ids in status_ids.items():
+        statuses[status.name] = len(ids)
+    return timings, statuses
+
+def git_commit():
+    '''Returns the commit being benchmarked, or None outside a git checkout'''
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode().strip()
+
+def run_suite(generator, repeat=3, backend='sqlite'):
+    '''Runs the suite repeat times, returning a dict ready to be written out as JSON'''
+    gtld_lookup_config.database_backend = backend
+    work_dir = tempfile.mkdtemp()
+    try:
+        zone_file = os.path.join(work_dir, generator.origin + '.zone')
+        generator.write(zone_file)
+        db_filename = os.path.join(work_dir, 'bench' + get_backend(backend).file_extension)
+
+        best = {}
+        for _ in range(repeat):
+            timings, statuses = run_once(generator, zone_file, db_filename)
+            for phase, seconds in timings.items():
+                if phase not in best or seconds < best[phase]:
+                    best[phase] = seconds
+    finally:
+        shutil.rmtree(work_dir)
+
+    return {
+        'parameters': generator.parameters(),
+        'repeat': repeat,
+        'backend': backend,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': numpy is not None,
+            'commit': git_commit(),
+        },
+        'timings': best,
+        'statuses': statuses,
+    }
+
+def print_results(results, baseline=None):
+    if baseline is None:
+        print("%15s %10s" % ("phase", "seconds"))
+    else:
+        print("%15s %10s %10s %8s" % ("phase", "seconds", "baseline", "ratio"))
+
+    for phase in PHASES:
+        seconds = results['timings'][phase]
+        old_seconds = None
+        if baseline is not None:
+            old_seconds = baseline['timings'].get(phase, None)
+
+        if old_seconds is None:
+            print("%15s %9.3fs" % (phase, seconds))
+        else:
+            print("%15s %9.3fs %9.3fs %7.2fx" % (phase, seconds, old_seconds, seconds / max(old_seconds, 1e-9)))
+
+    if baseline is not None and baseline['parameters'] != results['parameters']:
+        print("Warning: the baseline was run with different zone parameters")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--domains', type=int, default=20000, help='Domains in the zone')
+    parser.add_argument('--providers', type=int, default=1000, help='Ordinary hosting providers to spread domains over')
+    parser.add_argument('--parking-share', type=float, default=0.3, help='Share of domains on parking nameservers')
+    parser.add_argument('--a-density', type=float, default=0.8, help='Share of domains with an A record')
+    parser.add_argument('--aaaa-density', type=float, default=0.2, help='Share of domains with an AAAA record')
+    parser.add_argument('--ptr-density', type=float, default=0.5, help='Share of addresses with a PTR')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the zone generator')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs to take the best time of')
+    parser.add_argument('--backend', default='sqlite', choices=sorted(BACKENDS.keys()), help='Database backend to run on')
+    parser.add_argument('--output', help='File to write the results to as JSON')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args()
+
+    generator = ZoneGenerator(args.domains, providers=args.providers, parking_share=args.parking_share,
+                              a_density=args.a_density, aaaa_density=args.aaaa_density,
+                              ptr_density=args.ptr_density, seed=args.seed)
+    results = run_suite(generator, repeat=args.repeat, backend=args.backend)
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Deterministic synthetic zones for the benchmarks
+
+The same parameters and seed always give the same zone. Domains pick
+nameservers from a pool of hosting providers with a long tailed (Zipf
+like) popularity, and a share of them go to a handful of parking
+providers on the shipped lists, which is where real new gTLD zones are
+heavily skewed. Resolution results are generated the same way: A and
+AAAA records for a share of the domains, and PTRs for a share of those,
+some of which point at known parking or expired pages.'''
+
+import random
+
+from gtld_data.domain_rdata import DomainRData
+from gtld_data.ptr_record import PtrRecordMap
+from gtld_data.zone_data import ZoneData
+
+# Providers on data/parking_nameservers.txt, data/blocking_nameservers.txt and data/other_inactive_nameservers.txt
+PARKING_PROVIDERS = ['sedoparking.com.', 'parkingcrew.net.', 'domainparking.ru.']
+BLOCKED_NAMESERVERS = ['blocked1.nic.ru.', 'blocked2.nic.ru.']
+INACTIVE_NAMESERVERS = ['statuspage1.nic.ru.', 'statuspage2.nic.ru.']
+
+# Names on data/reverse_parking_ptrs.txt and data/reverse_expired_ptrs.txt
+PARKED_PTRS = ['dns.parked.zone.', 'parked.hc.ru.', 'r1.domainparking.ru.']
+EXPIRED_PTRS = ['expirepages-kiae-1.nic.ru.', 'expirepages-kiae-2.nic.ru.']
+
+class ZoneGenerator(object):
+    '''Generates a zone file, and resolution results for it, from a few parameters
+
+    domains: number of delegated domains
+    providers: number of ordinary hosting providers, each with two nameservers
+    parking_share: share of domains parked with a parking provider
+    blocked_share, inactive_share: shares on blocked and other inactive nameservers
+    a_density, aaaa_density: share of domains resolving to an A or AAAA record
+    ptr_density: share of addresses with a PTR
+    parked_ptr_share: share of PTRs pointing at a known parking or expired page'''
+
+    def __init__(self, domains, origin='example', providers=1000, parking_share=0.3,
+                 blocked_share=0.01, inactive_share=0.01, a_density=0.8, aaaa_density=0.2,
+                 ptr_density=0.5, parked_ptr_share=0.2, seed=1):
+        self.domains = domains
+        self.origin = origin
+        self.providers = providers
+        self.parking_share = parking_share
+        self.blocked_share = blocked_share
+        self.inactive_share = inactive_share
+        self.a_density = a_density
+        self.aaaa_density = aaaa_density
+        self.ptr_density = ptr_density
+        self.parked_ptr_share = parked_ptr_share
+        self.seed = seed
+
+    def parameters(self):
+        '''Returns the parameters as a dict, for recording alongside results'''
+        return {
+            'domains': self.domains,
+            'origin': self.origin,
+            'providers': self.providers,
+            'parking_share': self.parking_share,
+            'blocked_share': self.blocked_share,
+            'inactive_share': self.inactive_share,
+            'a_density': self.a_density,
+            'aaaa_density': self.aaaa_density,
+            'ptr_density': self.ptr_density,
+            'parked_ptr_share': self.parked_ptr_share,
+            'seed': self.seed,
+        }
+
+    def domain_name(self, i):
+        return "domain" + str(i) + "." + self.origin + "."
+
+    def delegations(self):
+        '''Yields (domain name, nameserver names) for every domain, in name order'''
+        rng = random.Random(self.seed)
+
+        # Provider popularity falls off as 1/rank
+        cumulative = []
+        total = 0.0
+        for rank in range(1, self.providers + 1):
+            total = total + 1.0 / rank
+            cumulative.append(total)
+
+        names = sorted(self.domain_name(i) for i in range(self.domains))
+        for name in names:
+            draw = rng.random()
+            if draw < self.parking_share:
+                provider = rng.choice(PARKING_PROVIDERS)
+                nameservers = ["ns1." + provider, "ns2." + provider]
+            elif draw < self.parking_share + self.blocked_share:
+                nameservers = list(BLOCKED_NAMESERVERS)
+            elif draw < self.parking_share + self.blocked_share + self.inactive_share:
+                nameservers = list(INACTIVE_NAMESERVERS)
+            else:
+                provider = rng.choices(range(self.providers), cum_weights=cumulative)[0]
+                nameservers = ["ns1.provider" + str(provider) + ".net.", "ns2.provider" + str(provider) + ".net."]
+            yield name, nameservers
+
+    def lines(self):
+        '''Yields the lines of the zone file'''
+        yield "$ORIGIN " + self.origin + ".\n"
+        yield "@ IN SOA ns1." + self.origin + ". hostmaster." + self.origin + ". 1 3600 900 86400 3600\n"
+        yield "@ IN NS ns1." + self.origin + ".\n"
+        for name, nameservers in self.delegations():
+            for nameserver in nameservers:
+                yield name + " IN NS " + nameserver + "\n"
+
+    def write(self, path):
+        '''Writes the zone file to path'''
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(self.lines())
+
+    def resolutions(self):
+        '''Yields (domain name, [(rrtype, rdata)], [(ip address, PTR name)]) for each domain that resolves'''
+        rng = random.Random(self.seed + 1)
+        for name, _ in self.delegations():
+            records = []
+            if rng.random() < self.a_density:
+                records.append(("A", "198.51." + str(rng.randrange(256)) + "." + str(rng.randrange(256))))
+            if rng.random() < self.aaaa_density:
+                records.append(("AAAA", "2001:db8::" + format(rng.randrange(65536), 'x')))
+
+            ptrs = []
+            for _, address in records:
+                if rng.random() >= self.ptr_density:
+                    continue
+                draw = rng.random()
+                if draw < self.parked_ptr_share / 2:
+                    ptrs.append((address, rng.choice(PARKED_PTRS)))
+                elif draw < self.parked_ptr_share:
+                    ptrs.append((address, rng.choice(EXPIRED_PTRS)))
+                else:
+                    ptrs.append((address, "host-" + address.replace(':', '-').replace('.', '-') + ".isp.example."))
+
+            if len(records) != 0:
+                yield name, records, ptrs
+
+    def populate(self, cursor):
+        '''Stores the zone and its resolution results in the database, returning the zone file id'''
+        zone_data = ZoneData.load_from_file(cursor, list(self.lines()), origin=self.origin)
+        self.store_resolutions(cursor, zone_data)
+        return zone_data.db_id
+
+    def store_resolutions(self, cursor, zone_data):
+        '''Stores resolution results for a zone already written to the database
+
+        They go in the way resolve_in_batches writes them'''
+        rdata_objs = []
+        ptr_map = PtrRecordMap()
+        for name, records, ptrs in self.resolutions():
+            domain = zone_data.domains[name]
+            for rrtype, rdata in records:
+                rdata_obj = DomainRData()
+                rdata_obj._domain_id = domain.db_id
+                rdata_obj.rrtype = rrtype
+                rdata_obj.rdata = rdata
+                rdata_objs.append(rdata_obj)
+            for address, ptr_name in ptrs:
+                ptr_map.add(zone_data.db_id, domain.db_id, address, ptr_name)
+
+        DomainRData.bulk_to_db(cursor, rdata_objs)
+        ptr_map.flush(cursor)
@@ -20,11 +20,15 @@
 
 from gtld_data.domain_status import DomainStatus
 from gtld_data.zone_data import ZoneData
+from gtld_data.zone_graph import ZoneGraph
 from gtld_data.zone_processor import ZoneProcessor
 from gtld_data.config import Config, gtld_lookup_config
 from gtld_data.db import Database, gtld_db
+from gtld_data.identity_map import IdentityMap
+from gtld_data.instrumentation import Instrumentation, gtld_instrumentation
+from gtld_data.resolver_cache import ResolverCache, gtld_resolver_cache
 from gtld_data.nameserver_record import NameserverRecord
-from gtld_data.ptr_record import PtrRecord
+from gtld_data.ptr_record import PtrRecord, PtrRecordMap
 from gtld_data.domain_record import DomainRecord
 from gtld_data.domain_rdata import DomainRData
 
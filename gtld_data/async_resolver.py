@@ -0,0 +1,154 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Resolves reverse zone information for many domains at once'''
+
+import asyncio
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+
+from gtld_data.config import gtld_lookup_config
+from gtld_data.domain_record import ADDRESS_RRTYPES, reverse_queries_for
+from gtld_data.instrumentation import gtld_instrumentation
+from gtld_data.resolver_cache import gtld_resolver_cache
+
+class AsyncReverseResolver(object):
+    '''Runs DomainRecord reverse lookups concurrently on an asyncio event loop
+
+    Results are stored through the same DomainRecord methods the blocking
+    lookups use, so records and reverse_lookup_ptrs end up identical. At most
+    max_in_flight queries are outstanding at any one time. PTRs go through
+    ptr_map when one is given.'''
+
+    def __init__(self, cursor, max_in_flight=None, ptr_map=None):
+        self.cursor = cursor
+        self.ptr_map = ptr_map
+        self.max_in_flight = max_in_flight
+        if self.max_in_flight is None:
+            self.max_in_flight = gtld_lookup_config.max_in_flight_queries
+        self._semaphore = None
+        self._pending = {}
+        self.failed = set()
+
+        self.resolver = dns.asyncresolver.Resolver(configure=False)
+        self.resolver.nameservers = gtld_lookup_config.upstream_resolvers
+        self.resolver.port = gtld_lookup_config.upstream_port
+
+    async def _resolve(self, name, record_type):
+        '''Sends a query upstream and caches the answer'''
+        async with self._semaphore:
+            gtld_instrumentation.count_dns_query(record_type)
+            try:
+                answers = await self.resolver.resolve(name, record_type)
+            except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN) as e:
+                # Record doesn't exist, same as an empty answer
+                return gtld_resolver_cache.put_negative(name, record_type, e)
+            except (dns.resolver.NoNameservers, dns.exception.Timeout):
+                # The servers failed or never answered, so don't remember it
+                gtld_instrumentation.count_dns_failure(record_type)
+                return None
+
+        return gtld_resolver_cache.put_answer(name, record_type, answers)
+
+    async def query(self, name, record_type):
+        '''Looks up a name, returning the rdata as text
+
+        Same as lookup_rdata, [] means there are no records and None that
+        the servers failed. Answers come from the run-wide cache where
+        possible, and concurrent lookups of the same name share a single query'''
+        rdata_texts = gtld_resolver_cache.get(name, record_type)
+        if rdata_texts is not None:
+            return rdata_texts
+
+        key = (name.lower(), record_type)
+        pending = self._pending.get(key, None)
+        if pending is None:
+            pending = asyncio.ensure_future(self._resolve(name, record_type))
+            self._pending[key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+
+        return await pending
+
+    async def get_records(self, domain, record_type, refresh=False):
+        '''Async version of DomainRecord.get_records'''
+        if refresh is False:
+            records = domain.records.get(record_type, None)
+            if records is not None:
+                return records
+
+        rdata_texts = await self.query(domain.domain_name, record_type)
+        if rdata_texts is None:
+            return None
+        return domain.store_records(self.cursor, record_type, rdata_texts)
+
+    async def reverse_lookup(self, domain, refresh=False):
+        '''Async version of DomainRecord.reverse_lookup'''
+        if refresh is False:
+            if len(domain.reverse_lookup_ptrs) != 0:
+                return domain.reverse_lookup_ptrs
+
+        # A/AAAA records may not exist
+        record_types = [t for t in ADDRESS_RRTYPES if refresh is True or t not in domain.records]
+        addresses = domain.held_addresses([t for t in ADDRESS_RRTYPES if t not in record_types])
+        results = await asyncio.gather(*[self.query(domain.domain_name, t) for t in record_types])
+        if None in results:
+            return None
+        for rdata_texts in results:
+            addresses.extend(rdata_texts)
+
+        queries = list(reverse_queries_for(addresses))
+        ptr_results = await asyncio.gather(*[self.query(query[1], "PTR") for query in queries])
+        if None in ptr_results:
+            return None
+
+        ptr_lookups = [(query[0], ptr_names) for query, ptr_names in zip(queries, ptr_results)]
+        domain.store_lookups(self.cursor, dict(zip(record_types, results)), ptr_lookups, ptr_map=self.ptr_map)
+        return domain.reverse_lookup_ptrs
+
+    async def _worker(self, domain_iter, reverse_zones):
+        '''Pulls domains off the shared iterator until it runs dry'''
+        for domain in domain_iter:
+            print("Resolving " + domain.domain_name + " ...")
+            ptrs = await self.reverse_lookup(domain)
+            if ptrs is None:
+                self.failed.add(domain.domain_name)
+            else:
+                reverse_zones[domain.domain_name] = ptrs
+
+    async def _resolve_all(self, domains):
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._pending = {}
+        self.failed = set()
+        reverse_zones = {}
+
+        # Only as many domains as we have query slots are in progress at once,
+        # so millions of domains don't turn into millions of pending tasks
+        domain_iter = iter(domains)
+        workers = [self._worker(domain_iter, reverse_zones) for _ in range(self.max_in_flight)]
+        await asyncio.gather(*workers)
+        return reverse_zones
+
+    def resolve(self, domains):
+        '''Reverse looks up an iterable of DomainRecords, returning a dict of name to ptrs
+
+        Domains where a lookup failed are left out, with their names in failed'''
+        return asyncio.run(self._resolve_all(domains))
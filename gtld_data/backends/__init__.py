@@ -0,0 +1,41 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Storage backends the Database can sit on
+
+Everything that differs between database engines lives in a backend: how
+to connect, where its schema files are, how ids are reserved, upserts and
+bulk-load tuning. Models only ever write plain SQL with ? placeholders.'''
+
+from gtld_data.backends.firebird import FirebirdBackend
+from gtld_data.backends.sqlite import SqliteBackend
+
+BACKENDS = {
+    'firebird': FirebirdBackend,
+    'sqlite': SqliteBackend,
+}
+
+def get_backend(name):
+    '''Returns a new backend by name'''
+    backend_class = BACKENDS.get(name, None)
+    if backend_class is None:
+        raise ValueError("unknown database backend " + str(name) + ", expected one of " +
+                         ", ".join(sorted(BACKENDS.keys())))
+    return backend_class()
@@ -0,0 +1,164 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Firebird backend, talking to a server through fdb'''
+
+import re
+
+import fdb
+import fdb.services
+
+# Online validation reports a count of errors for each table and index it checks
+VALIDATION_ERRORS_RE = re.compile(r'(\d+) errors', re.IGNORECASE)
+
+class FirebirdBackend(object):
+    name = 'firebird'
+    schema_dir = 'sql/firebird'
+    file_extension = '.fdb'
+    IntegrityError = fdb.IntegrityError
+
+    def __init__(self):
+        self.database_path = None
+        self.username = None
+        self.password = None
+
+    def connect(self, path, username, password):
+        self.database_path = path
+        self.username = username
+        self.password = password
+        return fdb.connect(database=path, user=username, password=password)
+
+    def create_database(self, path, username, password):
+        self.database_path = path
+        self.username = username
+        self.password = password
+        return fdb.create_database(database=path, user=username, password=password)
+
+    def table_exists(self, cursor, table):
+        cursor.execute("""SELECT 1 FROM RDB$RELATIONS WHERE RDB$RELATION_NAME = ?""", [table.upper()])
+        return cursor.fetchone() is not None
+
+    def legacy_schema_version(self, cursor):
+        '''Works out how far a database made before schema_version existed got'''
+        if not self.table_exists(cursor, 'zone_files'):
+            return 0
+
+        # Those databases ran whatever schema files existed at the time
+        cursor.execute("""SELECT 1 FROM RDB$GENERATORS WHERE RDB$GENERATOR_NAME = 'DOMAINS_ID_SEQ'""")
+        if cursor.fetchone() is not None:
+            return 3
+
+        cursor.execute("""SELECT 1 FROM RDB$RELATION_FIELDS
+                          WHERE RDB$RELATION_NAME = 'DOMAINS' AND RDB$FIELD_NAME = 'RESOLVED'""")
+        if cursor.fetchone() is not None:
+            return 2
+        return 1
+
+    def reserve_ids(self, connection, table, count):
+        '''Reserves count ids for a table, returning the last one'''
+        # GEN_ID hands back the end of the block; nobody else can be given anything in it
+        cursor = connection.cursor()
+        cursor.execute("SELECT GEN_ID(" + table + "_id_seq, " + str(int(count)) + ") FROM RDB$DATABASE")
+        last_id = int(cursor.fetchone()[0])
+        cursor.close()
+        return last_id
+
+    def prepare(self, cursor, statement):
+        return cursor.prep(statement)
+
+    def upsert(self, table, columns, matching):
+        '''Returns an insert that updates the row instead if one matches on the given columns'''
+        return ("UPDATE OR INSERT INTO " + table + " (" + ", ".join(columns) + ") VALUES (" +
+                ", ".join(["?"] * len(columns)) + ") MATCHING (" + ", ".join(matching) + ")")
+
+    def index_names(self, cursor):
+        '''Returns the names of our active indexes'''
+        cursor.execute("""SELECT TRIM(RDB$INDEX_NAME) FROM RDB$INDICES
+                          WHERE COALESCE(RDB$SYSTEM_FLAG, 0) = 0 AND COALESCE(RDB$INDEX_INACTIVE, 0) = 0""")
+        return [row[0].lower() for row in cursor.fetchall()]
+
+    def _user_indexes(self, cursor, constraint_indexes=True):
+        '''Returns the names of our own indexes, optionally leaving out ones backing constraints'''
+        index_select = """SELECT TRIM(i.RDB$INDEX_NAME) FROM RDB$INDICES i
+                          LEFT JOIN RDB$RELATION_CONSTRAINTS rc ON rc.RDB$INDEX_NAME = i.RDB$INDEX_NAME
+                          WHERE COALESCE(i.RDB$SYSTEM_FLAG, 0) = 0"""
+        if constraint_indexes is False:
+            index_select = index_select + """ AND rc.RDB$INDEX_NAME IS NULL"""
+        cursor.execute(index_select)
+        return [row[0] for row in cursor.fetchall()]
+
+    def _set_forced_writes(self, forced):
+        service = fdb.services.connect(user=self.username, password=self.password)
+        try:
+            if forced is True:
+                service.set_write_mode(self.database_path, fdb.services.WRITE_FORCED)
+            else:
+                service.set_write_mode(self.database_path, fdb.services.WRITE_BUFFERED)
+        finally:
+            service.close()
+
+    def begin_bulk_load(self, connection):
+        '''Deactivates secondary indexes and buffers writes, returning what to undo
+
+        Indexes behind primary, unique and foreign keys have to stay, since
+        Firebird won't turn off constraint checking'''
+        connection.begin()
+        cursor = connection.cursor()
+        deactivated = []
+        for index in self._user_indexes(cursor, constraint_indexes=False):
+            cursor.execute("""ALTER INDEX """ + index + """ INACTIVE""")
+            deactivated.append(index)
+        connection.commit()
+        self._set_forced_writes(False)
+        return deactivated
+
+    def end_bulk_load(self, connection, deactivated):
+        '''Restores forced writes and rebuilds the indexes begin_bulk_load turned off'''
+        self._set_forced_writes(True)
+        connection.begin()
+        cursor = connection.cursor()
+        for index in deactivated:
+            cursor.execute("""ALTER INDEX """ + index + """ ACTIVE""")
+        connection.commit()
+
+    def update_statistics(self, connection):
+        connection.begin()
+        cursor = connection.cursor()
+        for index in self._user_indexes(cursor):
+            cursor.execute("""SET STATISTICS INDEX """ + index)
+        connection.commit()
+
+    def check_integrity(self, connection):
+        '''Runs an online validation of the database, raising IntegrityError on any problems'''
+        service = fdb.services.connect(user=self.username, password=self.password)
+        try:
+            service.validate(self.database_path)
+            report = service.readlines()
+        finally:
+            service.close()
+
+        problems = []
+        for line in report:
+            match = VALIDATION_ERRORS_RE.search(line)
+            if match is not None and int(match.group(1)) != 0:
+                problems.append(line.strip())
+
+        if len(problems) != 0:
+            raise fdb.IntegrityError("validation found problems: " + "; ".join(problems))
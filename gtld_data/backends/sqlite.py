@@ -0,0 +1,140 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''SQLite backend, for tests and small jobs that don't need a server'''
+
+import os
+import sqlite3
+
+class SqliteConnection(sqlite3.Connection):
+    '''sqlite3 connection with the explicit begin() fdb connections have'''
+    def begin(self):
+        # Same as fdb, anything still open is committed first
+        if self.in_transaction:
+            self.commit()
+        self.execute("BEGIN")
+
+class SqliteBackend(object):
+    '''Runs everything in a local file
+
+    The database is in WAL mode so reports can read while a load writes.
+    SQLite only allows one writer, so ids are counted up in memory from the
+    largest one in each table rather than reserved from a sequence.'''
+    name = 'sqlite'
+    schema_dir = 'sql/sqlite'
+    file_extension = '.db'
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self):
+        self._last_ids = {}
+
+    def connect(self, path, username=None, password=None):
+        self._last_ids = {}
+        connection = sqlite3.connect(path, factory=SqliteConnection)
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        return connection
+
+    def create_database(self, path, username=None, password=None):
+        # Firebird refuses to create over an existing database, so do the same
+        if os.path.exists(path):
+            raise FileExistsError("database " + path + " already exists")
+        return self.connect(path)
+
+    def table_exists(self, cursor, table):
+        cursor.execute("""SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?""", [table.lower()])
+        return cursor.fetchone() is not None
+
+    def legacy_schema_version(self, cursor):
+        # Every SQLite database has had schema_version from the start
+        return 0
+
+    def reserve_ids(self, connection, table, count):
+        '''Reserves count ids for a table, returning the last one'''
+        last_id = self._last_ids.get(table, None)
+        if last_id is None:
+            cursor = connection.cursor()
+            cursor.execute("SELECT MAX(id) FROM " + table)
+            last_id = int(cursor.fetchone()[0] or 0)
+            cursor.close()
+
+        last_id = last_id + int(count)
+        self._last_ids[table] = last_id
+        return last_id
+
+    def prepare(self, cursor, statement):
+        # sqlite3 keeps its own cache of prepared statements
+        return statement
+
+    def upsert(self, table, columns, matching):
+        '''Returns an insert that updates the row instead if one matches on the given columns'''
+        updates = [column + " = excluded." + column for column in columns if column not in matching]
+        statement = ("INSERT INTO " + table + " (" + ", ".join(columns) + ") VALUES (" +
+                     ", ".join(["?"] * len(columns)) + ") ON CONFLICT (" + ", ".join(matching) + ")")
+        if len(updates) == 0:
+            return statement + " DO NOTHING"
+        return statement + " DO UPDATE SET " + ", ".join(updates)
+
+    def index_names(self, cursor):
+        '''Returns the names of our indexes'''
+        cursor.execute("""SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL""")
+        return [row[0].lower() for row in cursor.fetchall()]
+
+    def begin_bulk_load(self, connection):
+        '''Drops secondary indexes and stops syncing to disk, returning what to undo
+
+        SQLite can't switch an index off, so they are dropped and created
+        again afterwards. The ones behind constraints don't have any SQL of
+        their own and stay.'''
+        connection.begin()
+        cursor = connection.cursor()
+        cursor.execute("""SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL""")
+        dropped = cursor.fetchall()
+        for name, _ in dropped:
+            cursor.execute("""DROP INDEX """ + name)
+        connection.commit()
+        connection.execute("PRAGMA synchronous = OFF")
+        return dropped
+
+    def end_bulk_load(self, connection, dropped):
+        '''Syncs the database again and recreates the indexes begin_bulk_load dropped'''
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.begin()
+        cursor = connection.cursor()
+        for _, sql in dropped:
+            cursor.execute(sql)
+        connection.commit()
+
+    def update_statistics(self, connection):
+        connection.execute("ANALYZE")
+
+    def check_integrity(self, connection):
+        '''Checks the file and foreign keys, raising IntegrityError on any problems'''
+        cursor = connection.cursor()
+        cursor.execute("PRAGMA integrity_check")
+        problems = [row[0] for row in cursor.fetchall() if row[0] != 'ok']
+
+        cursor.execute("PRAGMA foreign_key_check")
+        for table, rowid, parent, _ in cursor.fetchall():
+            problems.append("row " + str(rowid) + " of " + table + " has no parent in " + parent)
+
+        if len(problems) != 0:
+            raise sqlite3.IntegrityError("integrity check found problems: " + "; ".join(problems))
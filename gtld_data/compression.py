@@ -0,0 +1,112 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Reads compressed zone files as a stream of lines
+
+Zone files are often published gzipped, and decompressing them to disk
+first costs both time and space. Compression is recognised by the file's
+magic bytes rather than its name. Decompression runs in a background
+thread a block at a time; zlib, bz2 and lzma release the GIL while they
+work, so it overlaps with parsing the lines already handed out.'''
+
+import bz2
+import gzip
+import lzma
+import queue
+import threading
+
+# Magic bytes at the start of each kind of compressed file
+COMPRESSION_OPENERS = [
+    (b'\x1f\x8b', gzip.open),
+    (b'BZh', bz2.open),
+    (b'\xfd7zXZ\x00', lzma.open),
+]
+
+def compression_opener(path):
+    '''Returns the function to open a compressed file with, or None if it isn't compressed'''
+    with open(path, 'rb') as f:
+        magic = f.read(6)
+
+    for prefix, opener in COMPRESSION_OPENERS:
+        if magic.startswith(prefix):
+            return opener
+    return None
+
+class DecompressedLines(object):
+    '''Iterates the lines of a compressed file, decompressing in a background thread
+
+    At most queue_size blocks of block_size bytes are decompressed ahead of
+    what has been read. Errors from the decompressor, such as a truncated
+    file, are raised from the iteration.'''
+
+    def __init__(self, path, opener, block_size=1024*1024, queue_size=8):
+        self.path = path
+        self.opener = opener
+        self.block_size = block_size
+        self.queue_size = queue_size
+
+    def _decompress(self, blocks, stop):
+        try:
+            with self.opener(self.path, 'rb') as f:
+                while not stop.is_set():
+                    block = f.read(self.block_size)
+                    if len(block) == 0:
+                        break
+                    blocks.put(block)
+        except BaseException as e:
+            blocks.put(e)
+            return
+        blocks.put(None)
+
+    def __iter__(self):
+        blocks = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._decompress, args=(blocks, stop), daemon=True)
+        thread.start()
+
+        try:
+            pending = b''
+            while True:
+                block = blocks.get()
+                if block is None:
+                    break
+                if isinstance(block, BaseException):
+                    raise block
+
+                # Only decode up to the last full line, so characters aren't split between blocks
+                data = pending + block
+                cut = data.rfind(b'\n') + 1
+                pending = data[cut:]
+                # splitlines() would also break on \r, form feeds and the like, which reading
+                # the plain file doesn't
+                for line in data[:cut].decode('utf-8').split('\n')[:-1]:
+                    yield line + '\n'
+
+            if len(pending) != 0:
+                yield pending.decode('utf-8')
+        finally:
+            # If we stopped early the thread may be waiting on a full queue
+            stop.set()
+            while thread.is_alive():
+                try:
+                    blocks.get_nowait()
+                except queue.Empty:
+                    pass
+                thread.join(0.01)
@@ -25,8 +25,15 @@ from gtld_data import DomainStatus
 class Config(object):
     def __init__(self):
         self.upstream_resolvers = ["127.0.0.1"]
+        self.upstream_port = 53
+        self.max_in_flight_queries = 100
+        self.resolver_cache_size = 1000000
+        self.resolver_negative_ttl = 300
+        self.database_backend = 'firebird'
         self.database_path = 'db/default.fdb'
         self.database_username = 'SYSDBA'
         self.database_password = ''
+        self.bulk_batch_size = 10000
+        self.id_block_size = 1000
 
 gtld_lookup_config = Config()
@@ -20,42 +20,195 @@
 
 '''Holds the record of a domain'''
 
-import fdb
+import contextlib
+import os
+import re
 
+from gtld_data.backends import get_backend
 from gtld_data.config import gtld_lookup_config
+from gtld_data.instrumentation import gtld_instrumentation
 
-CREATION_FILES = [
-    'sql/0001_base.sql'
-]
+MIGRATION_FILE_RE = re.compile(r'^(\d{4})_\w+\.sql$')
+
+def migration_files(directory):
+    '''Returns (version, path) for every numbered schema file, oldest first'''
+    migrations = []
+    for file_name in os.listdir(directory):
+        match = MIGRATION_FILE_RE.match(file_name)
+        if match is not None:
+            migrations.append((int(match.group(1)), os.path.join(directory, file_name)))
+
+    migrations.sort()
+    return migrations
+
+class IdAllocator(object):
+    '''Hands out primary keys from blocks reserved through the backend'''
+    def __init__(self, table, block_size):
+        self.table = table
+        self.block_size = block_size
+        self._next_id = 1
+        self._last_id = 0
+
+    def next_id(self, backend, connection):
+        '''Returns an unused id, reserving a new block when the current one runs out'''
+        if self._next_id > self._last_id:
+            self._last_id = backend.reserve_ids(connection, self.table, self.block_size)
+            self._next_id = self._last_id - self.block_size + 1
+
+        db_id = self._next_id
+        self._next_id = self._next_id + 1
+        return db_id
 
 class Database(object):
     def __init__(self):
         self.database_connection = None
+        self.backend = None
+        self._id_allocators = {}
 
-    def connect(self):
-        '''Connects to an existing database'''
-        self.database_connection = fdb.connect(database=gtld_lookup_config.database_path,
-                                               user=gtld_lookup_config.database_username,
-                                               password=gtld_lookup_config.database_password)
+    def connect(self, upgrade=True):
+        '''Connects to an existing database, bringing its schema up to date'''
+        self._id_allocators = {}
+        self.backend = get_backend(gtld_lookup_config.database_backend)
+        connection = self.backend.connect(gtld_lookup_config.database_path,
+                                          gtld_lookup_config.database_username,
+                                          gtld_lookup_config.database_password)
+        self.database_connection = gtld_instrumentation.wrap_connection(connection)
+        if upgrade is True:
+            self.upgrade()
 
-    def create_database(self):
+    def create_database(self, target_version=None):
         '''Creates a new database from scratch'''
-        self.database_connection = fdb.create_database(database=gtld_lookup_config.database_path,
-                                                       user=gtld_lookup_config.database_username,
-                                                       password=gtld_lookup_config.database_password)
-
-        # Load in the schema files and execute them
-        for file in CREATION_FILES:
-            with open(file, 'r') as f:
-                sql_cmds = f.read()
-
-                # FSQL will only accept a single statement per execute() which is annoying
-                self.database_connection.begin()
-                for statement in sql_cmds.split(';'):
-                    if statement.rstrip() == "":
-                        continue # Skip blanks, and trailing newline at the end
-                    cursor = self.database_connection.cursor()
-                    cursor.execute(statement.rstrip())
-                self.database_connection.commit()
-
-gtld_db = Database()
\ No newline at end of file
+        self._id_allocators = {}
+        self.backend = get_backend(gtld_lookup_config.database_backend)
+        connection = self.backend.create_database(gtld_lookup_config.database_path,
+                                                  gtld_lookup_config.database_username,
+                                                  gtld_lookup_config.database_password)
+        self.database_connection = gtld_instrumentation.wrap_connection(connection)
+        self.upgrade(target_version)
+
+    def migrations(self):
+        '''Returns (version, path) for each of the backend's schema files'''
+        return migration_files(self.backend.schema_dir)
+
+    def schema_version(self):
+        '''Returns the version of the last migration applied to the database'''
+        self.database_connection.begin()
+        cursor = self.database_connection.cursor()
+        if not self.backend.table_exists(cursor, 'schema_version'):
+            version = self.backend.legacy_schema_version(cursor)
+        else:
+            cursor.execute("""SELECT version FROM schema_version""")
+            version = int(cursor.fetchone()[0])
+        self.database_connection.commit()
+        return version
+
+    def _run_sql_file(self, cursor, file):
+        with open(file, 'r') as f:
+            sql_cmds = f.read()
+
+        # FSQL will only accept a single statement per execute() which is annoying
+        for statement in sql_cmds.split(';'):
+            if statement.rstrip() == "":
+                continue # Skip blanks, and trailing newline at the end
+            cursor.execute(statement.rstrip())
+
+    def upgrade(self, target_version=None):
+        '''Applies any migrations the database doesn't have yet
+
+        Each migration runs and is recorded in its own transaction, so a
+        failed one can be fixed and the upgrade run again. Returns the
+        versions that were applied.'''
+        current_version = self.schema_version()
+
+        # The version table has to be committed before anything can write to it
+        self.database_connection.begin()
+        cursor = self.database_connection.cursor()
+        if not self.backend.table_exists(cursor, 'schema_version'):
+            cursor.execute("""CREATE TABLE schema_version (version int NOT NULL)""")
+            self.database_connection.commit()
+            self.database_connection.begin()
+            cursor = self.database_connection.cursor()
+            cursor.execute("""INSERT INTO schema_version (version) VALUES (?)""", [current_version])
+        self.database_connection.commit()
+
+        applied = []
+        for version, file in self.migrations():
+            if version <= current_version:
+                continue
+            if target_version is not None and version > target_version:
+                break
+
+            self.database_connection.begin()
+            cursor = self.database_connection.cursor()
+            self._run_sql_file(cursor, file)
+            cursor.execute("""UPDATE schema_version SET version = ?""", [version])
+            self.database_connection.commit()
+            applied.append(version)
+
+        return applied
+
+    def check_integrity(self):
+        '''Checks the database for damage, raising the backend's IntegrityError on any problems'''
+        self.backend.check_integrity(self.database_connection)
+
+    @contextlib.contextmanager
+    def bulk_load(self):
+        '''Loads data with index maintenance and durability relaxed
+
+        Meant for filling a fresh database. The backend turns off secondary
+        indexes and syncing to disk for the duration. Afterwards the indexes
+        are rebuilt, their statistics recomputed and the database checked.'''
+        undo = self.backend.begin_bulk_load(self.database_connection)
+
+        try:
+            yield
+        except BaseException:
+            # begin() below would otherwise commit whatever half got loaded
+            self.database_connection.rollback()
+            raise
+        else:
+            self.database_connection.commit()
+        finally:
+            # Even a failed load has to leave the indexes usable
+            with gtld_instrumentation.phase('rebuild_indexes'):
+                self.backend.end_bulk_load(self.database_connection, undo)
+
+        with gtld_instrumentation.phase('update_statistics'):
+            self.backend.update_statistics(self.database_connection)
+        with gtld_instrumentation.phase('check_integrity'):
+            self.check_integrity()
+
+    def next_id(self, table):
+        '''Returns a new primary key for a table
+
+        Ids come out of blocks reserved through the backend, so rows can be
+        written (and batched) without asking the server for each id'''
+        allocator = self._id_allocators.get(table, None)
+        if allocator is None:
+            allocator = IdAllocator(table, gtld_lookup_config.id_block_size)
+            self._id_allocators[table] = allocator
+        return allocator.next_id(self.backend, self.database_connection)
+
+    def upsert(self, table, columns, matching):
+        '''Returns the backend's statement for inserting a row, or updating the one matching on some columns'''
+        return self.backend.upsert(table, columns, matching)
+
+    def executemany(self, cursor, statement, rows, batch_size=None):
+        '''Runs a statement for every row, sending batch_size rows per executemany
+
+        The statement is prepared once and reused for every batch'''
+        if batch_size is None:
+            batch_size = gtld_lookup_config.bulk_batch_size
+
+        prepared_statement = self.backend.prepare(cursor, statement)
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(prepared_statement, batch)
+                batch = []
+
+        if len(batch) != 0:
+            cursor.executemany(prepared_statement, batch)
+
+gtld_db = Database()
@@ -20,6 +20,8 @@
 
 '''Holds domain records'''
 
+import sys
+
 from gtld_data.config import gtld_lookup_config
 from gtld_data.domain_status import DomainStatus
 from gtld_data.db import gtld_db
@@ -29,18 +31,44 @@ import dns.rdatatype
 import dns.reversename
 
 class DomainRData(object):
+    __slots__ = ('_domain_id', 'db_id', '_rrtype', '_rdata', '_hash')
+
     def __hash__(self):
-        return hash(self.rrtype + self.rdata)
+        return self._hash
 
     def __eq__(self, other):
-        return self.__hash__() == other.__hash__()
+        if not isinstance(other, DomainRData):
+            return NotImplemented
+        return (self._hash == other._hash and self._rrtype == other._rrtype and
+                self._rdata == other._rdata)
 
     def __init__(self):
         self._domain_id = None
         self.db_id = None
-        self.rrtype = None
+        self._rrtype = None
         self.rdata = None
-    
+
+    @property
+    def rrtype(self):
+        return self._rrtype
+
+    @rrtype.setter
+    def rrtype(self, rrtype):
+        # Only a handful of types, so every record can share the same few strings
+        if rrtype is not None:
+            rrtype = sys.intern(rrtype)
+        self._rrtype = rrtype
+        self._hash = hash((rrtype, self._rdata))
+
+    @property
+    def rdata(self):
+        return self._rdata
+
+    @rdata.setter
+    def rdata(self, rdata):
+        self._rdata = rdata
+        self._hash = hash((self._rrtype, rdata))
+
     @classmethod
     def from_db(cls, cursor, db_id):
         ptr_select = """SELECT id, domain_id, rrtype, rdata FROM domain_rdata WHERE id=?"""
@@ -75,9 +103,24 @@ class DomainRData(object):
         self.rrtype = db_dict[2]
         self.rdata = db_dict[3]
 
+    @classmethod
+    def bulk_to_db(cls, cursor, rdata_objs):
+        '''Stores rdata for many domains of a zonefile at once
+
+        _domain_id must already be set on every object'''
+        rdata_insert = """INSERT INTO domain_rdata (id, domain_id, rrtype, rdata) VALUES (?, ?, ?, ?)"""
+
+        def rows():
+            for rdata_obj in rdata_objs:
+                if rdata_obj.db_id is None:
+                    rdata_obj.db_id = gtld_db.next_id('domain_rdata')
+                    yield (rdata_obj.db_id, rdata_obj._domain_id, rdata_obj.rrtype, rdata_obj.rdata)
+
+        gtld_db.executemany(cursor, rdata_insert, rows())
+
     def to_db(self, cursor):
         '''Stores nameserver in the database'''
         # Load the list of nameservers and append a database id to the dict
-        nameserver_insert = """INSERT INTO domain_rdata (domain_id, rrtype, rdata) VALUES (?, ?, ?) RETURNING id"""
-        cursor.execute(nameserver_insert, (self._domain_id, self.rrtype, self.rdata))
-        self.db_id = int(cursor.fetchone()[0])
+        nameserver_insert = """INSERT INTO domain_rdata (id, domain_id, rrtype, rdata) VALUES (?, ?, ?, ?)"""
+        self.db_id = gtld_db.next_id('domain_rdata')
+        cursor.execute(nameserver_insert, (self.db_id, self._domain_id, self.rrtype, self.rdata))
@@ -21,17 +21,64 @@
 '''Holds the record of a domain'''
 
 from gtld_data.config import gtld_lookup_config
+from gtld_data.db import gtld_db
 from gtld_data.domain_status import DomainStatus
+from gtld_data.identity_map import IdentityMap
 from gtld_data.nameserver_record import NameserverRecord
 from gtld_data.ptr_record import PtrRecord
 from gtld_data.domain_rdata import DomainRData
+from gtld_data.instrumentation import gtld_instrumentation
+from gtld_data.resolver_cache import gtld_resolver_cache
 
+import dns.exception
 import dns.resolver
 import dns.rdatatype
 import dns.reversename
 
+# Address records reverse lookups start from
+ADDRESS_RRTYPES = ("A", "AAAA")
+
+def lookup_rdata(name, record_type):
+    '''Looks up a name, returning its rdata as text
+
+    Gives [] when there are no such records, and None if the servers failed
+    or never answered, which is worth asking again later'''
+
+    # Go get the records, unless someone else already asked this run
+    rdata_texts = gtld_resolver_cache.get(name, record_type)
+    if rdata_texts is not None:
+        return rdata_texts
+
+    try:
+        resolver = dns.resolver.Resolver(configure=False)
+        resolver.nameservers = gtld_lookup_config.upstream_resolvers
+        resolver.port = gtld_lookup_config.upstream_port
+        gtld_instrumentation.count_dns_query(record_type)
+        answers = resolver.query(name, record_type)
+    except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN) as e:
+        # Record doesn't exist, which is an answer too
+        return gtld_resolver_cache.put_negative(name, record_type, e)
+    except (dns.resolver.NoNameservers, dns.exception.Timeout):
+        # The servers failed or never answered, so don't remember it
+        gtld_instrumentation.count_dns_failure(record_type)
+        return None
+
+    return gtld_resolver_cache.put_answer(name, record_type, answers)
+
+def reverse_queries_for(addresses):
+    '''Returns (ip, reverse name) tuples for a list of addresses'''
+    queries = set()
+    for address in addresses:
+        queries.add((address, dns.reversename.from_address(address).to_text()))
+    return queries
+
 class DomainRecord(object):
+    # There's one of these per domain in the zone, so they don't get a __dict__
+    __slots__ = ('_zonefile_id', 'db_id', 'domain_name', 'nameservers', 'status',
+                 'records', 'reverse_lookup_ptrs')
+
     def __hash__(self):
+        # str caches its own hash, so there's nothing to gain keeping another copy
         return hash(self.domain_name)
 
     def __init__(self, name, zonefile_id=None):
@@ -45,12 +92,12 @@ class DomainRecord(object):
 
     def to_db(self, cursor):
         '''Stores domain record in the database'''
-        domain_insert = """INSERT INTO domains (zone_file_id, domain_name, status) VALUES (?, ?, ?) RETURNING id"""
+        domain_insert = """INSERT INTO domains (id, zone_file_id, domain_name, status) VALUES (?, ?, ?, ?)"""
         domain_nameservers = """INSERT INTO domain_nameservers(domain_id, nameserver_id) VALUES (?, ?)"""
 
         # Save the domain record
-        cursor.execute(domain_insert, (self._zonefile_id, self.domain_name, self.status.value))
-        self.db_id = int(cursor.fetchone()[0])
+        self.db_id = gtld_db.next_id('domains')
+        cursor.execute(domain_insert, (self.db_id, self._zonefile_id, self.domain_name, self.status.value))
 
         # And link nameserver records
         for nameserver in self.nameservers:
@@ -68,7 +115,51 @@ class DomainRecord(object):
                 record.to_db(cursor)
 
     @classmethod
-    def from_db(cls, cursor, db_id):
+    def bulk_to_db(cls, cursor, zonefile_id, domains):
+        '''Stores many domains of a zonefile, with their nameserver links and rdata
+
+        Rows go out in executemany batches rather than a few statements per
+        domain. Nameservers must already be in the database.'''
+        domain_insert = """INSERT INTO domains (id, zone_file_id, domain_name, status) VALUES (?, ?, ?, ?)"""
+        domain_nameservers = """INSERT INTO domain_nameservers(domain_id, nameserver_id) VALUES (?, ?)"""
+
+        # Ids are handed out up front, so nothing has to wait on the server for them
+        pending = []
+        for domain in domains:
+            if domain.db_id is None:
+                domain._zonefile_id = zonefile_id
+                domain.db_id = gtld_db.next_id('domains')
+                pending.append(domain)
+
+        gtld_db.executemany(cursor, domain_insert,
+                            ((d.db_id, zonefile_id, d.domain_name, d.status.value) for d in pending))
+        gtld_db.executemany(cursor, domain_nameservers,
+                            ((d.db_id, ns.db_id) for d in pending for ns in d.nameservers))
+
+        rdata_objs = []
+        for domain in pending:
+            for _, record_type in domain.records.items():
+                for record in record_type:
+                    record._domain_id = domain.db_id
+                    rdata_objs.append(record)
+        DomainRData.bulk_to_db(cursor, rdata_objs)
+
+        # PTRs are normally only found after the zone is stored, so keep these simple
+        for domain in pending:
+            for ptr in domain.reverse_lookup_ptrs:
+                ptr._zonefile_id = zonefile_id
+                ptr._domain_id = domain.db_id
+                ptr.to_db(cursor)
+
+    @classmethod
+    def from_db(cls, cursor, db_id, identity_map=None):
+        '''Reads a domain and everything linked to it
+
+        Pass an identity_map when reading many domains so they share
+        nameserver and PTR objects'''
+        if identity_map is None:
+            identity_map = IdentityMap()
+
         domain_select = """SELECT id, zone_file_id, domain_name, status FROM domains WHERE id = ?"""
         domain_nameserver_ids = """SELECT nameserver_id FROM domain_nameservers WHERE domain_id = ?"""
         domain_ptr_ids = """SELECT ptr_record_id FROM domain_ptr_records WHERE domain_id = ?"""
@@ -84,7 +175,7 @@ class DomainRecord(object):
         rows = cursor.fetchall()
         for row in rows:
             domain_obj.nameservers.add(
-                NameserverRecord.from_db(cursor, row[0])
+                identity_map.get_or_load(NameserverRecord, cursor, row[0])
             )
 
         # Read in domain records
@@ -92,7 +183,7 @@ class DomainRecord(object):
         rows = cursor.fetchall()
         for row in rows:
             domain_obj.reverse_lookup_ptrs.add(
-                PtrRecord.from_db(cursor, row[0])
+                identity_map.get_or_load(PtrRecord, cursor, row[0])
             )
 
         # Read in RData
@@ -103,20 +194,96 @@ class DomainRecord(object):
         return domain_obj
 
     @classmethod
-    def read_all_from_db(cls, cursor, zonefile_id):
-        '''Reads all nameservers for a given zonefile id'''
-        domain_all_select = """SELECT id FROM domains WHERE zone_file_id = ?"""
-
-        # This isn't a great way to do this, but I'm lazy
+    def read_all_from_db(cls, cursor, zonefile_id, identity_map=None):
+        '''Reads all domains for a given zonefile id, returning a dict keyed by name
+
+        Each table is read with one query for the whole zone and the objects
+        are linked up in memory, so the number of queries doesn't grow with
+        the zone. Nameservers and PTRs are shared through identity_map, and
+        nameservers it doesn't already hold are read in as needed.'''
+        domain_all_select = """SELECT id, zone_file_id, domain_name, status FROM domains WHERE zone_file_id = ?"""
+        domain_nameservers_select = """SELECT dn.domain_id, dn.nameserver_id FROM domain_nameservers dn
+                                       JOIN domains d ON d.id = dn.domain_id WHERE d.zone_file_id = ?"""
+        domain_ptrs_select = """SELECT dp.domain_id, p.id, p.zone_file_id, p.ip_address, p.reverse_lookup_name
+                                FROM domain_ptr_records dp
+                                JOIN domains d ON d.id = dp.domain_id
+                                JOIN ptr_records p ON p.id = dp.ptr_record_id WHERE d.zone_file_id = ?"""
+        domain_rdata_select = """SELECT r.id, r.domain_id, r.rrtype, r.rdata FROM domain_rdata r
+                                 JOIN domains d ON d.id = r.domain_id WHERE d.zone_file_id = ?"""
+
+        if identity_map is None:
+            identity_map = IdentityMap()
+
+        domains_by_id = {}
         cursor.execute(domain_all_select, [int(zonefile_id)])
+        for row in cursor:
+            domain_obj = cls(None)
+            domain_obj._db_row_to_self(row)
+            domains_by_id[domain_obj.db_id] = domain_obj
+
+        # Nameservers from another zone file are rare, so pick them up afterwards
+        missing_links = []
+        cursor.execute(domain_nameservers_select, [int(zonefile_id)])
+        for row in cursor:
+            nameserver_obj = identity_map.get(NameserverRecord, row[1])
+            if nameserver_obj is None:
+                missing_links.append(row)
+                continue
+            domains_by_id[row[0]].nameservers.add(nameserver_obj)
 
-        domain_set = set()
-        rows = cursor.fetchall()
+        for domain_id, nameserver_id in missing_links:
+            domains_by_id[domain_id].nameservers.add(
+                identity_map.get_or_load(NameserverRecord, cursor, nameserver_id)
+            )
 
-        for row in rows:
-            domain_obj = cls.from_db(cursor, int(row[0]))
-            domain_set.add(domain_obj)
-        return domain_set
+        # PTRs are usually shared by many domains, so only make one of each
+        cursor.execute(domain_ptrs_select, [int(zonefile_id)])
+        for row in cursor:
+            ptr_obj = identity_map.get(PtrRecord, row[1])
+            if ptr_obj is None:
+                ptr_obj = PtrRecord(None, None)
+                ptr_obj._db_row_to_self(row[1:])
+                identity_map.add(ptr_obj)
+            domains_by_id[row[0]].reverse_lookup_ptrs.add(ptr_obj)
+
+        cursor.execute(domain_rdata_select, [int(zonefile_id)])
+        for row in cursor:
+            rdata_obj = DomainRData()
+            rdata_obj._db_row_to_self(row)
+            domains_by_id[rdata_obj._domain_id].add_record(cursor, rdata_obj)
+
+        domains = {}
+        for domain_obj in domains_by_id.values():
+            domains[domain_obj.domain_name] = domain_obj
+        return domains
+
+    @classmethod
+    def read_unresolved_from_db(cls, cursor, zonefile_id):
+        '''Reads the domains of a zonefile that haven't been reverse looked up yet
+
+        Only the domain row itself is loaded, which is all resolution needs'''
+        domain_unresolved_select = """SELECT id, zone_file_id, domain_name, status FROM domains WHERE zone_file_id = ? AND resolved = 0"""
+        cursor.execute(domain_unresolved_select, [int(zonefile_id)])
+
+        domains = []
+        for row in cursor.fetchall():
+            domain_obj = cls(None)
+            domain_obj._db_row_to_self(row)
+            domains.append(domain_obj)
+        return domains
+
+    @classmethod
+    def count_resolved(cls, cursor, zonefile_id):
+        '''Returns (resolved, total) domain counts for a zonefile'''
+        domain_count_select = """SELECT COUNT(id), SUM(resolved) FROM domains WHERE zone_file_id = ?"""
+        cursor.execute(domain_count_select, [int(zonefile_id)])
+        row = cursor.fetchone()
+        return (int(row[1] or 0), int(row[0]))
+
+    def mark_resolved(self, cursor):
+        '''Records that reverse lookups for this domain are done'''
+        domain_resolved_update = """UPDATE domains SET resolved = 1 WHERE id = ?"""
+        cursor.execute(domain_resolved_update, [self.db_id])
 
     def _db_row_to_self(self, db_dict):
         '''Converts db_dict to class data'''
@@ -134,7 +301,9 @@ class DomainRecord(object):
 
         resolver = dns.resolver.Resolver(configure=False)
         resolver.nameservers = gtld_lookup_config.upstream_resolvers
+        resolver.port = gtld_lookup_config.upstream_port
 
+        gtld_instrumentation.count_dns_query('NS')
         answers = resolver.query(self.domain_name, 'NS')
         for rdata in answers:
             self.nameservers.add(NameserverRecord(self.domain_name, zonefile_id=self._zonefile_id))
@@ -154,9 +323,9 @@ class DomainRecord(object):
 
     def get_records(self, cursor, record_type, refresh=False):
         '''Gets a record type for this domain
-        
-        Returns True if the records were looked up, False if cached responses
-        were given
+
+        Returns the records, or None if the servers failed to answer, in
+        which case nothing is stored
         '''
 
         # If we already have records, ignore the request unless forced
@@ -165,27 +334,70 @@ class DomainRecord(object):
             if records is not None:
                 return records
 
-        # Go get the records
-        self.records[record_type] = set()
+        rdata_texts = lookup_rdata(self.domain_name, record_type)
+        if rdata_texts is None:
+            return None
+        return self.store_records(cursor, record_type, rdata_texts)
 
-        try:
-            resolver = dns.resolver.Resolver(configure=False)
-            resolver.nameservers = gtld_lookup_config.upstream_resolvers
-            answers = resolver.query(self.domain_name, record_type)
-        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN, dns.resolver.NoNameservers):
-            # Record doesn't exist, return an empty set
-            return self.records[record_type]
+    def store_records(self, cursor, record_type, rdata_texts):
+        '''Replaces the records of a type with the rdata from a lookup'''
+        self.records[record_type] = set()
 
-        for rdata in answers:
+        for rdata in rdata_texts:
             rdata_obj = DomainRData()
             rdata_obj.rrtype = record_type
-            rdata_obj.rdata = rdata.to_text()
+            rdata_obj.rdata = rdata
             self.add_record(cursor, rdata_obj)
 
         return self.records[record_type]
 
+    def reverse_queries(self):
+        '''Returns (ip, reverse name) tuples for every A and AAAA record we hold'''
+        return reverse_queries_for(self.held_addresses(ADDRESS_RRTYPES))
+
+    def held_addresses(self, record_types):
+        '''Returns the addresses of the given record types we already hold'''
+        addresses = []
+        for record_type in record_types:
+            for record in self.records.get(record_type, set()):
+                addresses.append(record.rdata)
+        return addresses
+
+    def store_lookups(self, cursor, records, ptr_lookups, ptr_map=None):
+        '''Stores a finished reverse lookup
+
+        records maps a record type to the rdata looked up for it, and
+        ptr_lookups is (ip, PTR names) for each of the addresses'''
+        for record_type, rdata_texts in records.items():
+            self.store_records(cursor, record_type, rdata_texts)
+        for ip_address, ptr_names in ptr_lookups:
+            self.store_ptrs(cursor, ip_address, ptr_names, ptr_map=ptr_map)
+
+    def store_ptrs(self, cursor, ip_address, ptr_names, ptr_map=None):
+        '''Adds the PTR names found for one of our addresses
+
+        With a PtrRecordMap, records are shared and their writes are left
+        for the map to flush'''
+        for ptr_name in ptr_names:
+            if ptr_map is not None:
+                ptr_obj = ptr_map.add(self._zonefile_id, self.db_id, ip_address, ptr_name)
+                self.reverse_lookup_ptrs.add(ptr_obj)
+                continue
+
+            ptr_obj = PtrRecord(ip_address, ptr_name)
+
+            # If we're attached to a database, create the PtrRecord in the DB
+            if self._zonefile_id is not None:
+                ptr_obj._zonefile_id = self._zonefile_id
+                ptr_obj._domain_id = self.db_id
+                ptr_obj.to_db(cursor)
+            self.reverse_lookup_ptrs.add(ptr_obj)
+
     def reverse_lookup(self, cursor, refresh=False):
-        '''Does a reverse lookup of this domain; all A and AAAA records are pulled, and ptrs are populated'''
+        '''Does a reverse lookup of this domain; all A and AAAA records are pulled, and ptrs are populated
+
+        Returns the PTRs, or None if any lookup failed. Nothing is stored
+        unless every lookup was answered, so a failed domain can be tried again'''
 
         # If we already have reverse records, ignore the request unless refresh is set
         if refresh is False:
@@ -193,40 +405,23 @@ class DomainRecord(object):
                 return self.reverse_lookup_ptrs
 
         # A/AAAA records may not exist
-        a_records = self.get_records(cursor, "A")
-        aaaa_records = self.get_records(cursor, "AAAA")
-
-        resolver = dns.resolver.Resolver(configure=False)
-        resolver.nameservers = gtld_lookup_config.upstream_resolvers
-
-        queries = set()
-
-        # Create tuples with the ip and reverse lookup zone for the reverse lookups
-        for record in a_records:
-            queries.add((record.rdata, (dns.reversename.from_address(record.rdata).to_text())))
-        for record in aaaa_records:
-            queries.add((record.rdata, (dns.reversename.from_address(record.rdata).to_text())))
-
-        for query in queries:
-            # We may get NXDOMAIN responses here
-            try:
-                # Create a DomainRecord for the reverse zone
-                reverse_record = DomainRecord(query[1], zonefile_id=self._zonefile_id)
-
-                records = reverse_record.get_records(cursor, "PTR")
-                for record in records:
-                    ptr_obj = PtrRecord(query[0], record.rdata)
-        
-                    # If we're attached to a database, create the PtrRecord in the DB
-                    if self._zonefile_id is not None:
-                        ptr_obj._zonefile_id = self._zonefile_id
-                        ptr_obj._domain_id = self.db_id
-                        ptr_obj.to_db(cursor)
-                    self.reverse_lookup_ptrs.add(ptr_obj)
-
-            except dns.resolver.NoAnswer:
-                continue
-            except dns.resolver.NXDOMAIN:
-                continue
-        
+        record_types = [t for t in ADDRESS_RRTYPES if refresh is True or t not in self.records]
+        addresses = self.held_addresses([t for t in ADDRESS_RRTYPES if t not in record_types])
+        records = {}
+        for record_type in record_types:
+            rdata_texts = lookup_rdata(self.domain_name, record_type)
+            if rdata_texts is None:
+                return None
+            records[record_type] = rdata_texts
+            addresses.extend(rdata_texts)
+
+        # NXDOMAIN and friends give an empty set of PTRs
+        ptr_lookups = []
+        for ip_address, reverse_name in reverse_queries_for(addresses):
+            ptr_names = lookup_rdata(reverse_name, "PTR")
+            if ptr_names is None:
+                return None
+            ptr_lookups.append((ip_address, ptr_names))
+
+        self.store_lookups(cursor, records, ptr_lookups)
         return self.reverse_lookup_ptrs
@@ -26,6 +26,10 @@ class DomainStatus(Enum):
     UNKNOWN = "UNKNOWN"
     PARKED = "PARKED"
     BLOCKED = "BLOCKED"
+    PTR_PARKED = "PTR_PARKED"
+    PTR_EXPIRED = "PTR_EXPIRED"
+    OTHER_INACTIVE = "OTHER_INACTIVE"
+    NO_RDATA = "NO_RDATA"
     CNAME = "CNAME"
     CNAME_TO_OTHER_TLD = "CNAME_TO_OTHER_TLD"
     NXDOMAIN = "NXDOMAIN"
@@ -0,0 +1,50 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Keeps one object per database row while loading'''
+
+class IdentityMap(object):
+    '''Maps (class, db_id) to the one object loaded for that row
+
+    A map lives for a single loading session. Everything read through it
+    shares objects, so a nameserver linked to 100,000 domains is held once
+    rather than once per link.'''
+
+    def __init__(self):
+        self._objects = {}
+
+    def __len__(self):
+        return len(self._objects)
+
+    def get(self, cls, db_id):
+        '''Returns the object already loaded for a row, or None'''
+        return self._objects.get((cls, db_id), None)
+
+    def add(self, obj):
+        '''Registers an object, returning the one already held if there is one'''
+        return self._objects.setdefault((type(obj), obj.db_id), obj)
+
+    def get_or_load(self, cls, cursor, db_id):
+        '''Returns the object for a row, reading it with cls.from_db if needed'''
+        obj = self._objects.get((cls, db_id), None)
+        if obj is None:
+            obj = cls.from_db(cursor, db_id)
+            self._objects[(cls, db_id)] = obj
+        return obj
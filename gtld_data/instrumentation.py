@@ -0,0 +1,234 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Times the phases of a run and counts the work done in them'''
+
+import collections
+import contextlib
+import json
+import re
+import time
+
+# Where the table name is in each kind of statement we run
+STATEMENT_TABLE_RES = {
+    'SELECT': re.compile(r'\bFROM\s+(\w+)', re.IGNORECASE),
+    'DELETE': re.compile(r'\bFROM\s+(\w+)', re.IGNORECASE),
+    'INSERT': re.compile(r'\bINTO\s+(\w+)', re.IGNORECASE),
+    'UPDATE': re.compile(r'^\s*UPDATE\s+(?:OR\s+INSERT\s+INTO\s+)?(\w+)', re.IGNORECASE),
+}
+
+# Schema files have comments ahead of some statements
+LEADING_COMMENTS_RE = re.compile(r'^(?:\s*--[^\n]*\n)*')
+
+# Dynamically built statements (IN lists and the like) aren't worth remembering forever
+MAX_STATEMENT_TYPES = 10000
+
+def statement_type(statement):
+    '''Returns what kind of statement this is and the table it's on, i.e. "INSERT domains"'''
+    statement = statement[LEADING_COMMENTS_RE.match(statement).end():]
+    words = statement.split(None, 1)
+    if len(words) == 0:
+        return ''
+
+    verb = words[0].upper()
+    table_re = STATEMENT_TABLE_RES.get(verb, None)
+    if table_re is None:
+        return verb
+
+    match = table_re.search(statement)
+    if match is None:
+        return verb
+    return verb + " " + match.group(1).lower()
+
+class InstrumentedCursor(object):
+    '''Wraps a DB-API cursor, counting statements and the rows they touch
+
+    Rows fetched are counted against the last statement executed.
+    Everything else goes straight through to the cursor.'''
+    def __init__(self, cursor, instrumentation):
+        self.cursor = cursor
+        self.instrumentation = instrumentation
+        self._statement_type = None
+
+    def _count(self, statement, rows):
+        # fdb hands back prepared statements, which keep their SQL
+        if not isinstance(statement, str):
+            statement = getattr(statement, 'sql', '')
+        self._statement_type = self.instrumentation.count_statement(statement, rows)
+
+    def execute(self, statement, *args):
+        result = self.cursor.execute(statement, *args)
+        self._count(statement, 0)
+
+        # A SELECT's rows are counted as they're fetched
+        if not self._statement_type.startswith('SELECT'):
+            rows = self.cursor.rowcount
+            if rows is not None and rows > 0:
+                self.instrumentation.count_rows(self._statement_type, rows)
+        return result
+
+    def executemany(self, statement, rows):
+        if not isinstance(rows, (list, tuple)):
+            rows = list(rows)
+        result = self.cursor.executemany(statement, rows)
+        self._count(statement, len(rows))
+        return result
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            self.instrumentation.count_rows(self._statement_type, 1)
+        return row
+
+    def fetchmany(self, *args):
+        rows = self.cursor.fetchmany(*args)
+        self.instrumentation.count_rows(self._statement_type, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self.instrumentation.count_rows(self._statement_type, len(rows))
+        return rows
+
+    def __iter__(self):
+        fetched = 0
+        try:
+            for row in self.cursor:
+                fetched = fetched + 1
+                yield row
+        finally:
+            self.instrumentation.count_rows(self._statement_type, fetched)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+class InstrumentedConnection(object):
+    '''Wraps a database connection so every cursor it hands out is an InstrumentedCursor'''
+    def __init__(self, connection, instrumentation):
+        self.connection = connection
+        self.instrumentation = instrumentation
+
+    def cursor(self, *args):
+        return InstrumentedCursor(self.connection.cursor(*args), self.instrumentation)
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+class Instrumentation(object):
+    '''Collects phase timings, SQL statement counts and DNS query counts for a run
+
+    Phases, DNS queries and cache statistics are always kept as they cost
+    next to nothing. SQL statements are only counted on connections made
+    while enabled is True, since every statement and fetched row goes
+    through a wrapper. Phases can nest, in which case the outer phase's
+    time includes the inner one's.'''
+
+    def __init__(self):
+        self.enabled = False
+        self._caches = collections.OrderedDict()
+        self._statement_types = {}
+        self.reset()
+
+    def reset(self):
+        '''Drops everything collected so far'''
+        self.started = time.perf_counter()
+        self.phases = collections.OrderedDict()
+        self.statements = {}
+        self.dns_queries = {}
+        self.dns_failures = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        '''Adds the wall time spent in the with block to a phase'''
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            phase = self.phases.get(name, None)
+            if phase is None:
+                phase = {'seconds': 0.0, 'calls': 0}
+                self.phases[name] = phase
+            phase['seconds'] = phase['seconds'] + time.perf_counter() - started
+            phase['calls'] = phase['calls'] + 1
+
+    def count_statement(self, statement, rows):
+        '''Counts a statement and the rows it wrote, returning its statement type'''
+        kind = self._statement_types.get(statement, None)
+        if kind is None:
+            kind = statement_type(statement)
+            if len(self._statement_types) < MAX_STATEMENT_TYPES:
+                self._statement_types[statement] = kind
+
+        counts = self.statements.get(kind, None)
+        if counts is None:
+            counts = {'executes': 0, 'rows': 0}
+            self.statements[kind] = counts
+        counts['executes'] = counts['executes'] + 1
+        counts['rows'] = counts['rows'] + rows
+        return kind
+
+    def count_rows(self, kind, rows):
+        '''Counts rows read by a statement already counted'''
+        counts = self.statements.get(kind, None)
+        if counts is not None:
+            counts['rows'] = counts['rows'] + rows
+
+    def count_dns_query(self, rrtype):
+        '''Counts a query sent upstream'''
+        self.dns_queries[rrtype] = self.dns_queries.get(rrtype, 0) + 1
+
+    def count_dns_failure(self, rrtype):
+        '''Counts a query the servers failed to answer'''
+        self.dns_failures[rrtype] = self.dns_failures.get(rrtype, 0) + 1
+
+    def register_cache(self, name, stats):
+        '''Adds a cache to the report; stats is called for its counters as a dict'''
+        self._caches[name] = stats
+
+    def wrap_connection(self, connection):
+        '''Returns the connection wrapped for counting statements if enabled, or as it is'''
+        if self.enabled is False:
+            return connection
+        return InstrumentedConnection(connection, self)
+
+    def report(self):
+        '''Returns everything collected as a dict that can be written out as JSON'''
+        caches = {}
+        for name, stats in self._caches.items():
+            caches[name] = stats()
+
+        return {
+            'elapsed': time.perf_counter() - self.started,
+            'phases': dict(self.phases),
+            'statements': self.statements,
+            'dns_queries': self.dns_queries,
+            'dns_failures': self.dns_failures,
+            'caches': caches,
+        }
+
+    def write_report(self, file_name, report=None):
+        '''Writes a report, this run's by default, to a file as JSON'''
+        if report is None:
+            report = self.report()
+        with open(file_name, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+gtld_instrumentation = Instrumentation()
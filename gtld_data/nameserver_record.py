@@ -20,6 +20,8 @@
 
 '''Holds the record of a domain'''
 
+import sys
+
 from gtld_data.config import gtld_lookup_config
 from gtld_data.domain_status import DomainStatus
 from gtld_data.db import gtld_db
@@ -29,18 +31,34 @@ import dns.rdatatype
 import dns.reversename
 
 class NameserverRecord(object):
+    __slots__ = ('_zonefile_id', 'db_id', '_nameserver', 'count', 'domain_count')
+
     def __hash__(self):
-        return hash(self.nameserver)
+        return hash(self._nameserver)
 
     def __eq__(self, other):
-        return self.nameserver == other.nameserver
+        if not isinstance(other, NameserverRecord):
+            return NotImplemented
+        return self._nameserver == other._nameserver
 
     def __init__(self, name, zonefile_id=None):
         self._zonefile_id = zonefile_id
         self.db_id = None
         self.nameserver = name
         self.count = 0
-    
+        self.domain_count = None
+
+    @property
+    def nameserver(self):
+        return self._nameserver
+
+    @nameserver.setter
+    def nameserver(self, name):
+        # The same few names come back for every domain read from the database
+        if name is not None:
+            name = sys.intern(name)
+        self._nameserver = name
+
     def increment_count(self):
         self.count = self.count+1
 
@@ -54,8 +72,10 @@ class NameserverRecord(object):
         return nameserver_obj
 
     @classmethod
-    def read_all_from_db(cls, cursor, zonefile_id):
-        '''Reads all nameservers for a given zonefile id'''
+    def read_all_from_db(cls, cursor, zonefile_id, identity_map=None):
+        '''Reads all nameservers for a given zonefile id
+
+        Objects are shared through identity_map if one is given'''
         nameserver_select = """SELECT id, zone_file_id, nameserver, domain_count FROM nameservers WHERE zone_file_id=?"""
         cursor.execute(nameserver_select, [int(zonefile_id)])
 
@@ -67,6 +87,8 @@ class NameserverRecord(object):
 
             nameserver_obj = cls(None)
             nameserver_obj._db_row_to_self(row)
+            if identity_map is not None:
+                nameserver_obj = identity_map.add(nameserver_obj)
             ns_set.add(nameserver_obj)
         
         return ns_set
@@ -77,12 +99,27 @@ class NameserverRecord(object):
         self._zonefile_id = db_dict[1]
         self.nameserver = db_dict[2]
         self.domain_count = db_dict[3]
+        self.count = self.domain_count
+
+    @classmethod
+    def bulk_to_db(cls, cursor, zonefile_id, nameservers):
+        '''Stores many nameservers of a zonefile at once'''
+        nameserver_insert = """INSERT INTO nameservers (id, zone_file_id, nameserver, domain_count) VALUES (?, ?, ?, ?)"""
+
+        def rows():
+            for nameserver in nameservers:
+                if nameserver.db_id is None:
+                    nameserver._zonefile_id = zonefile_id
+                    nameserver.db_id = gtld_db.next_id('nameservers')
+                    yield (nameserver.db_id, zonefile_id, nameserver.nameserver, nameserver.count)
+
+        gtld_db.executemany(cursor, nameserver_insert, rows())
 
     def to_db(self, cursor, only_if_exists=False):
         '''Stores nameserver in the database'''
         # Load the list of nameservers and append a database id to the dict
         nameserver_select = """SELECT id FROM nameservers WHERE nameserver = ?"""
-        nameserver_insert = """INSERT INTO nameservers (zone_file_id, nameserver, domain_count) VALUES (?, ?, ?) RETURNING id"""
+        nameserver_insert = """INSERT INTO nameservers (id, zone_file_id, nameserver, domain_count) VALUES (?, ?, ?, ?)"""
 
         # Try doing a SELECT before inserting
         if only_if_exists is True:
@@ -92,5 +129,5 @@ class NameserverRecord(object):
                 self.db_id = int(row[0])
                 return # We got our DB ID
 
-        cursor.execute(nameserver_insert, (self._zonefile_id, self.nameserver, self.count))
-        self.db_id = int(cursor.fetchone()[0])
+        self.db_id = gtld_db.next_id('nameservers')
+        cursor.execute(nameserver_insert, (self.db_id, self._zonefile_id, self.nameserver, self.count))
@@ -20,6 +20,8 @@
 
 '''Holds the record of a domain'''
 
+import sys
+
 from gtld_data.config import gtld_lookup_config
 from gtld_data.domain_status import DomainStatus
 from gtld_data.db import gtld_db
@@ -29,19 +31,44 @@ import dns.rdatatype
 import dns.reversename
 
 class PtrRecord(object):
+    __slots__ = ('_zonefile_id', '_domain_id', 'db_id', '_ip_address', '_reverse_lookup_name', '_hash')
+
     def __hash__(self):
-        return hash(self.reverse_lookup_name + self.ip_address)
+        return self._hash
 
     def __eq__(self, other):
-        return self.__hash__() == other.__hash__()
+        if not isinstance(other, PtrRecord):
+            return NotImplemented
+        return (self._hash == other._hash and self._ip_address == other._ip_address and
+                self._reverse_lookup_name == other._reverse_lookup_name)
 
     def __init__(self, ip_address, name):
         self._zonefile_id = None
         self._domain_id = None
         self.db_id = None
-        self.ip_address = ip_address
+        self._ip_address = ip_address
         self.reverse_lookup_name = name
-    
+
+    @property
+    def ip_address(self):
+        return self._ip_address
+
+    @ip_address.setter
+    def ip_address(self, ip_address):
+        self._ip_address = ip_address
+        self._hash = hash((ip_address, self._reverse_lookup_name))
+
+    @property
+    def reverse_lookup_name(self):
+        return self._reverse_lookup_name
+
+    @reverse_lookup_name.setter
+    def reverse_lookup_name(self, name):
+        if name is not None:
+            name = sys.intern(name)
+        self._reverse_lookup_name = name
+        self._hash = hash((self._ip_address, name))
+
     @classmethod
     def from_db(cls, cursor, db_id):
         ptr_select = """SELECT id, zone_file_id, ip_address, reverse_lookup_name FROM ptr_records WHERE id=?"""
@@ -52,8 +79,10 @@ class PtrRecord(object):
         return ptr_obj
 
     @classmethod
-    def read_all_from_db(cls, cursor, zonefile_id):
-        '''Reads all nameservers for a given zonefile id'''
+    def read_all_from_db(cls, cursor, zonefile_id, identity_map=None):
+        '''Reads all PTR records for a given zonefile id
+
+        Objects are shared through identity_map if one is given'''
         ptr_select_all = """SELECT id, zone_file_id, ip_address, reverse_lookup_name FROM ptr_records WHERE zone_file_id=?"""
         cursor.execute(ptr_select_all, [int(zonefile_id)])
 
@@ -65,6 +94,8 @@ class PtrRecord(object):
 
             ptr_obj = cls(None, None)
             ptr_obj._db_row_to_self(row)
+            if identity_map is not None:
+                ptr_obj = identity_map.add(ptr_obj)
             ptr_set.add(ptr_obj)
         
         return ptr_set
@@ -79,7 +110,7 @@ class PtrRecord(object):
     def to_db(self, cursor):
         '''Stores nameserver in the database'''
         # Load the list of nameservers and append a database id to the dict
-        ptr_insert = """INSERT INTO ptr_records (zone_file_id, ip_address, reverse_lookup_name) VALUES (?, ?, ?) RETURNING id"""
+        ptr_insert = """INSERT INTO ptr_records (id, zone_file_id, ip_address, reverse_lookup_name) VALUES (?, ?, ?, ?)"""
         ptr_select = """SELECT id FROM ptr_records WHERE ip_address = ? AND reverse_lookup_name = ?"""
 
         domain_ptr_select = """SELECT id FROM domain_ptr_records WHERE domain_id = ? AND ptr_record_id = ?"""
@@ -91,8 +122,8 @@ class PtrRecord(object):
         if row is not None:
             self.db_id = int(row[0])
         else:
-            cursor.execute(ptr_insert, (self._zonefile_id, self.ip_address, self.reverse_lookup_name))
-            self.db_id = int(cursor.fetchone()[0])
+            self.db_id = gtld_db.next_id('ptr_records')
+            cursor.execute(ptr_insert, (self.db_id, self._zonefile_id, self.ip_address, self.reverse_lookup_name))
 
         # Now try to link it to the domain table if possible
         if self._domain_id is not None:
@@ -100,3 +131,59 @@ class PtrRecord(object):
             row = cursor.fetchone()
             if row is None:
                 cursor.execute(domain_ptrs_insert, [self._domain_id, self.db_id])
+
+class PtrRecordMap(object):
+    '''Interns PtrRecords for a run so each one is only read or written once
+
+    Existing rows are loaded in a single query; ptr_records is unique on
+    (ip_address, reverse_lookup_name) across zone files, so that means all
+    of them. New PTRs and domain links are queued by add() and written with
+    batched statements by flush(), so nothing needs a SELECT first.'''
+
+    def __init__(self):
+        self.ptrs = {}
+        self._new_ptrs = []
+        self._new_links = set()
+
+    def __len__(self):
+        return len(self.ptrs)
+
+    def load(self, cursor):
+        '''Reads every known PTR record into the map'''
+        ptr_select_all = """SELECT id, zone_file_id, ip_address, reverse_lookup_name FROM ptr_records"""
+        cursor.execute(ptr_select_all)
+
+        for row in cursor.fetchall():
+            ptr_obj = PtrRecord(None, None)
+            ptr_obj._db_row_to_self(row)
+            self.ptrs[(ptr_obj.ip_address, ptr_obj.reverse_lookup_name)] = ptr_obj
+
+    def add(self, zonefile_id, domain_id, ip_address, name):
+        '''Returns the PtrRecord for an address and name, queueing any writes it needs'''
+        key = (ip_address, name)
+        ptr_obj = self.ptrs.get(key, None)
+        if ptr_obj is None:
+            ptr_obj = PtrRecord(ip_address, name)
+            ptr_obj._zonefile_id = zonefile_id
+            ptr_obj.db_id = gtld_db.next_id('ptr_records')
+            self.ptrs[key] = ptr_obj
+            self._new_ptrs.append(ptr_obj)
+
+        if domain_id is not None:
+            self._new_links.add((domain_id, ptr_obj.db_id))
+        return ptr_obj
+
+    def flush(self, cursor):
+        '''Writes queued PTRs and domain links to the database'''
+        ptr_insert = """INSERT INTO ptr_records (id, zone_file_id, ip_address, reverse_lookup_name) VALUES (?, ?, ?, ?)"""
+
+        # The link may already be there if a domain is looked up again
+        domain_ptrs_upsert = gtld_db.upsert('domain_ptr_records', ['domain_id', 'ptr_record_id'],
+                                            ['domain_id', 'ptr_record_id'])
+
+        gtld_db.executemany(cursor, ptr_insert,
+                            ((p.db_id, p._zonefile_id, p.ip_address, p.reverse_lookup_name) for p in self._new_ptrs))
+        gtld_db.executemany(cursor, domain_ptrs_upsert, self._new_links)
+
+        self._new_ptrs = []
+        self._new_links = set()
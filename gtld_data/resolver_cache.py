@@ -0,0 +1,165 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Caches DNS answers for the whole run'''
+
+import collections
+import time
+
+import dns.rcode
+import dns.rdatatype
+import dns.resolver
+
+from gtld_data.config import gtld_lookup_config
+from gtld_data.instrumentation import gtld_instrumentation
+from gtld_data.response_store import ResponseStore
+
+class ResolverCache(object):
+    '''Holds DNS answers keyed by (qname, rrtype), shared by every lookup
+
+    Entries expire with the TTL of the answer, and the least recently used
+    entry is evicted once the cache is full. NXDOMAIN and NoAnswer are cached
+    as empty answers so dead names aren't asked about again.
+
+    If a ResponseStore is attached, misses fall through to it and new answers
+    are written through to it, so they survive into the next run.'''
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.backing_store = None
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def open_store(self, path):
+        '''Attaches an on-disk response store'''
+        self.close_store()
+        self.backing_store = ResponseStore(path)
+
+    def close_store(self):
+        if self.backing_store is not None:
+            self.backing_store.close()
+            self.backing_store = None
+
+    def clear(self):
+        '''Drops all in-memory entries and resets the counters'''
+        self._entries.clear()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def _key(self, qname, rrtype):
+        return (qname.lower(), rrtype)
+
+    def get(self, qname, rrtype, now=None):
+        '''Returns the cached rdata as text ([] for negative answers), or None on a miss'''
+        if now is None:
+            now = time.monotonic()
+
+        key = self._key(qname, rrtype)
+        entry = self._entries.get(key, None)
+        if entry is None or entry[0] <= now:
+            if entry is not None:
+                del self._entries[key]
+
+            if self.backing_store is not None:
+                stored = self.backing_store.get(qname, rrtype)
+                if stored is not None:
+                    self.store_hits = self.store_hits + 1
+                    self._put_memory(key, stored[0], stored[1], now)
+                    return stored[0]
+
+            self.misses = self.misses + 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits = self.hits + 1
+        return entry[1]
+
+    def put(self, qname, rrtype, rdata_texts, ttl, rcode=dns.rcode.NOERROR, now=None):
+        '''Caches an answer for ttl seconds'''
+        if now is None:
+            now = time.monotonic()
+
+        self._put_memory(self._key(qname, rrtype), rdata_texts, ttl, now)
+        if self.backing_store is not None:
+            self.backing_store.put(qname, rrtype, rdata_texts, ttl, rcode=rcode)
+
+    def _put_memory(self, key, rdata_texts, ttl, now):
+        self._entries[key] = (now + ttl, rdata_texts)
+        self._entries.move_to_end(key)
+
+        max_entries = self.max_entries
+        if max_entries is None:
+            max_entries = gtld_lookup_config.resolver_cache_size
+        while len(self._entries) > max_entries:
+            self._entries.popitem(last=False)
+
+    def put_answer(self, qname, rrtype, answers):
+        '''Caches a dnspython Answer, returning its rdata as text'''
+        rdata_texts = [rdata.to_text() for rdata in answers]
+        self.put(qname, rrtype, rdata_texts, answers.rrset.ttl)
+        return rdata_texts
+
+    def put_negative(self, qname, rrtype, exception):
+        '''Caches an NXDOMAIN or NoAnswer, using the SOA minimum when the response has one'''
+        rcode = dns.rcode.NOERROR
+        if isinstance(exception, dns.resolver.NXDOMAIN):
+            rcode = dns.rcode.NXDOMAIN
+
+        self.put(qname, rrtype, [], negative_ttl(exception), rcode=rcode)
+        return []
+
+    def stats(self):
+        '''Returns the hit/miss counters as a dict'''
+        lookups = self.hits + self.store_hits + self.misses
+        hit_rate = 0.0
+        if lookups != 0:
+            hit_rate = (self.hits + self.store_hits) / lookups
+
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'store_hits': self.store_hits,
+            'misses': self.misses,
+            'hit_rate': hit_rate,
+        }
+
+def negative_ttl(exception):
+    '''Works out how long a negative answer can be cached for (RFC 2308)'''
+    responses = []
+    kwargs = getattr(exception, 'kwargs', None) or {}
+    if kwargs.get('response', None) is not None:
+        responses.append(kwargs['response'])
+    responses.extend(kwargs.get('responses', {}).values())
+
+    for response in responses:
+        for rrset in response.authority:
+            if rrset.rdtype == dns.rdatatype.SOA:
+                return min(rrset.ttl, rrset[0].minimum)
+
+    return gtld_lookup_config.resolver_negative_ttl
+
+gtld_resolver_cache = ResolverCache()
+gtld_instrumentation.register_cache('resolver', gtld_resolver_cache.stats)
@@ -0,0 +1,93 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Keeps DNS responses on disk between runs'''
+
+import json
+import sqlite3
+import time
+
+import dns.rcode
+
+class ResponseStore(object):
+    '''A sidecar SQLite file holding DNS responses and when they expire
+
+    It sits underneath the in-memory ResolverCache, so a re-run of a tool only
+    goes to the network for names that were never asked about or whose answer
+    has since expired.'''
+
+    def __init__(self, path, commit_interval=1000):
+        self.path = path
+        self.commit_interval = commit_interval
+        self._uncommitted = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS dns_responses
+            (
+                qname TEXT NOT NULL,
+                rrtype TEXT NOT NULL,
+                rcode INTEGER NOT NULL,
+                rdata TEXT NOT NULL,
+                expires REAL NOT NULL,
+                PRIMARY KEY (qname, rrtype)
+            )""")
+        self.connection.commit()
+
+    def get(self, qname, rrtype, now=None):
+        '''Returns (rdata texts, seconds left) for a live response, or None'''
+        if now is None:
+            now = time.time()
+
+        cursor = self.connection.execute(
+            """SELECT rdata, expires FROM dns_responses WHERE qname = ? AND rrtype = ?""",
+            (qname.lower(), rrtype))
+        row = cursor.fetchone()
+        if row is None or row[1] <= now:
+            return None
+
+        return json.loads(row[0]), row[1] - now
+
+    def put(self, qname, rrtype, rdata_texts, ttl, rcode=dns.rcode.NOERROR, now=None):
+        '''Stores a response, replacing anything older'''
+        if now is None:
+            now = time.time()
+
+        self.connection.execute(
+            """INSERT OR REPLACE INTO dns_responses (qname, rrtype, rcode, rdata, expires) VALUES (?, ?, ?, ?, ?)""",
+            (qname.lower(), rrtype, int(rcode), json.dumps(rdata_texts), now + ttl))
+
+        # Committing every write is slow, but we don't want to lose a long run either
+        self._uncommitted = self._uncommitted + 1
+        if self._uncommitted >= self.commit_interval:
+            self.commit()
+
+    def commit(self):
+        self.connection.commit()
+        self._uncommitted = 0
+
+    def expire(self, now=None):
+        '''Deletes responses that are past their expiry'''
+        if now is None:
+            now = time.time()
+        self.connection.execute("""DELETE FROM dns_responses WHERE expires <= ?""", (now,))
+        self.commit()
+
+    def close(self):
+        self.commit()
+        self.connection.close()
@@ -0,0 +1,131 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Matches names against a list of patterns in one go'''
+
+import re
+
+# \.example\.com\.$ -- anything strictly below a literal suffix
+SUFFIX_RULE = re.compile(r'^(?:\\\.[A-Za-z0-9_-]+)+\\\.\$$')
+
+# ^ns1\.example\.com\.$ -- a single literal name
+EXACT_RULE = re.compile(r'^\^[A-Za-z0-9_-]+(?:\\\.[A-Za-z0-9_-]+)*\\\.\$$')
+
+# Constructs that change meaning (or fail to compile) when joined into one alternation
+UNCOMBINABLE_RULE = re.compile(r'\\[1-9]|\(\?P=|\(\?[aiLmsux-]+\)')
+
+class RuleMatcher(object):
+    '''Holds a list of regex patterns compiled into a single matcher
+
+    Anchored literal suffixes such as \\.sedoparking\\.com\\.$ go into a trie of
+    reversed labels, literal names into a set, and everything else is joined
+    into one alternation. search() answers the same as running re.search()
+    with each pattern in turn.'''
+
+    def __init__(self, patterns=None):
+        self.patterns = []
+        self._suffix_trie = {}
+        self._exact_names = set()
+        self._regex_patterns = []
+        self._separate_patterns = []
+        self._combined = None
+
+        if patterns is not None:
+            for pattern in patterns:
+                self.add(pattern)
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def __iter__(self):
+        return iter(self.patterns)
+
+    def add(self, pattern):
+        '''Adds a pattern to the matcher'''
+        self.patterns.append(pattern)
+
+        if SUFFIX_RULE.match(pattern) is not None:
+            # Drop the trailing \.$ and split into labels; the leading \. gives us an empty label
+            labels = pattern[:-3].split('\\.')[1:]
+            node = self._suffix_trie
+            for label in reversed(labels):
+                node = node.setdefault(label, {})
+            node[None] = True
+            return
+
+        if EXACT_RULE.match(pattern) is not None:
+            self._exact_names.add(pattern[1:-1].replace('\\.', '.'))
+            return
+
+        compiled = re.compile(pattern)
+        if UNCOMBINABLE_RULE.search(pattern) is not None:
+            self._separate_patterns.append(compiled)
+        else:
+            self._regex_patterns.append(pattern)
+            self._combined = None
+
+    def _compile(self):
+        '''Joins the remaining regex patterns into a single alternation'''
+        try:
+            self._combined = re.compile("|".join("(?:" + p + ")" for p in self._regex_patterns))
+        except re.error:
+            # Something like duplicated group names; fall back to one regex per pattern
+            self._separate_patterns.extend(re.compile(p) for p in self._regex_patterns)
+            self._regex_patterns = []
+            self._combined = None
+
+    def _search_suffix_trie(self, name):
+        '''Walks the reversed labels of a name through the suffix trie'''
+        # The trailing dot of an absolute name gives an empty last label, which
+        # lines up with the \.$ every suffix rule ends with
+        labels = name.split('.')
+        if labels[-1] != '':
+            return False
+        node = self._suffix_trie
+        depth = 0
+        for label in reversed(labels[:-1]):
+            node = node.get(label, None)
+            if node is None:
+                return False
+            depth = depth + 1
+            # There must be something in front of the suffix for the leading \. to match
+            if None in node and depth < len(labels) - 1:
+                return True
+        return False
+
+    def search(self, name):
+        '''Returns True if any pattern matches the name'''
+        if name in self._exact_names:
+            return True
+
+        if len(self._suffix_trie) != 0 and self._search_suffix_trie(name) is True:
+            return True
+
+        if len(self._regex_patterns) != 0:
+            if self._combined is None:
+                self._compile()
+            if self._combined is not None and self._combined.search(name) is not None:
+                return True
+
+        for pattern in self._separate_patterns:
+            if pattern.search(name) is not None:
+                return True
+
+        return False
@@ -26,28 +26,127 @@ import operator
 
 from gtld_data import gtld_db
 import gtld_data
+from gtld_data.backends import BACKENDS
+from gtld_data.zone_diff import UnsortedZoneError, ZoneDiff
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('zonefile', help='Zonefile to load')
+    parser.add_argument('zonefile', nargs='?', help='Zonefile to load')
     parser.add_argument('--origin', help="Origin of the zone file")
-
+    parser.add_argument('--max-in-flight', type=int, help='Maximum DNS queries outstanding at once')
+    parser.add_argument('--response-cache', help='File to keep DNS responses in between runs')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Domains to resolve between commits')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue resolving the last zone loaded into an existing database')
+    parser.add_argument('--parse-workers', type=int, help='Processes to parse the zone file with')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Update the last zone loaded into an existing database from a newer, sorted, zone file')
+    parser.add_argument('--backend', choices=sorted(BACKENDS.keys()), help='Database backend, firebird by default')
+    parser.add_argument('--database', help='Database file to use')
+    parser.add_argument('--stats-report', help='File to write timings and counts for the run to, as JSON')
     args = parser.parse_args()
 
-    print("Creating database ...")
-    gtld_data.gtld_db.create_database()
+    if args.backend is not None:
+        gtld_data.gtld_lookup_config.database_backend = args.backend
+    if args.database is not None:
+        gtld_data.gtld_lookup_config.database_path = args.database
+
+    if args.zonefile is None and args.resume is False:
+        parser.error("a zonefile is needed unless --resume is given")
+    if args.incremental is True and (args.zonefile is None or args.resume is True):
+        parser.error("--incremental needs a zonefile, and can't be used with --resume")
+
+    if args.stats_report is not None:
+        gtld_data.gtld_instrumentation.enabled = True
+
+    if args.response_cache is not None:
+        gtld_data.gtld_resolver_cache.open_store(args.response_cache)
+
+    try:
+        load_and_resolve(args)
+    finally:
+        # Responses so far are kept even if loading or resolving fails
+        gtld_data.gtld_resolver_cache.close_store()
+
+        # A partial report is still worth having when a run dies or is cut short
+        if args.stats_report is not None:
+            gtld_data.gtld_instrumentation.write_report(args.stats_report)
+
+def load_and_resolve(args):
+    '''Loads the zone, or picks up an earlier load, and resolves its domains'''
+    if args.incremental is True:
+        print("Connecting database ...")
+        gtld_data.gtld_db.connect()
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+
+        zonefile_id = gtld_data.ZoneData.latest_db_id(cursor, origin=args.origin)
+        if zonefile_id is None:
+            print("No zone has been loaded into this database, load one without --incremental first")
+            return
+
+        print("Comparing zone data, this may take a moment")
+        try:
+            diff = ZoneDiff.from_file(cursor, zonefile_id, args.zonefile)
+        except UnsortedZoneError as e:
+            gtld_db.database_connection.rollback()
+            print(str(e) + ", sort the zone file (LC_ALL=C sort) or load it without --incremental")
+            return
+
+        if diff.up_to_date is True:
+            print("Serial " + str(diff.old_soa) + " is already loaded")
+        else:
+            print("Serial " + str(diff.old_soa) + " -> " + str(diff.new_soa) + ": " +
+                  str(len(diff.added)) + " added, " + str(len(diff.removed)) + " removed, " +
+                  str(len(diff.changed)) + " changed, " + str(diff.unchanged) + " unchanged")
+            diff.apply(cursor)
+            gtld_db.database_connection.commit()
+
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+        domains = gtld_data.DomainRecord.read_unresolved_from_db(cursor, zonefile_id)
+    elif args.resume is True:
+        print("Connecting database ...")
+        gtld_data.gtld_db.connect()
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+
+        zonefile_id = gtld_data.ZoneData.latest_db_id(cursor, origin=args.origin)
+        if zonefile_id is None:
+            print("No zone has been loaded into this database")
+            return
+        domains = gtld_data.DomainRecord.read_unresolved_from_db(cursor, zonefile_id)
+    else:
+        print("Creating database ...")
+        gtld_data.gtld_db.create_database()
+
+        print("Loading zone data, this may take a moment")
+        with gtld_db.bulk_load():
+            cursor = gtld_db.database_connection.cursor()
+            zone_data = gtld_data.ZoneData.load_from_file(cursor, args.zonefile, origin=args.origin,
+                                                          workers=args.parse_workers)
 
-    gtld_db.database_connection.begin()
-    cursor = gtld_db.database_connection.cursor()
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+        print("Unique domains: " + str(len(zone_data.domains)))
+        zonefile_id = zone_data.db_id
+        domains = list(zone_data.domains.values())
 
-    print("Loading zone data, this may take a moment")
-    zone_data = gtld_data.ZoneData.load_from_file(cursor, args.zonefile, origin=args.origin)
+    resolved, total = gtld_data.DomainRecord.count_resolved(cursor, zonefile_id)
+    print("Resolved " + str(resolved) + " of " + str(total) + " domains so far, " + str(len(domains)) + " to go")
 
+    zone_processor = gtld_data.ZoneProcessor(None)
+    try:
+        zone_processor.resolve_in_batches(gtld_db.database_connection, cursor, domains,
+                                          batch_size=args.batch_size,
+                                          max_in_flight=args.max_in_flight)
+    except KeyboardInterrupt:
+        # Anything in the current batch is thrown away and picked up on resume
+        gtld_db.database_connection.rollback()
+        print("Interrupted, re-run with --resume to continue")
 
-    print("Unique domains: " + str(len(zone_data.domains)))
-    zone_processor = gtld_data.ZoneProcessor(zone_data)
-    zone_processor.get_reverse_zone_information(cursor, zone_data.domains)
-    zone_data.to_db(cursor)
+    resolved, total = gtld_data.DomainRecord.count_resolved(cursor, zonefile_id)
+    print("Resolved " + str(resolved) + " of " + str(total) + " domains")
     gtld_db.database_connection.commit()
     cursor.close()
 
@@ -31,11 +31,24 @@ def main():
     parser.add_argument('zonefile', help='Zonefile to load')
     parser.add_argument('outfile', help="Output File (in CSV)")
     parser.add_argument('--origin', help="Origin of the zone file")
+    parser.add_argument('--stats-report', help='File to write timings and counts for the run to, as JSON')
 
     args = parser.parse_args()
 
+    if args.stats_report is not None:
+        gtld_data.gtld_instrumentation.enabled = True
+
+    try:
+        write_nameservers(args)
+    finally:
+        # A partial report is still worth having when a run dies or is cut short
+        if args.stats_report is not None:
+            gtld_data.gtld_instrumentation.write_report(args.stats_report)
+
+def write_nameservers(args):
+    '''Loads the zone and writes each nameserver with its domain count'''
     print("Loading zone data, this may take a moment")
-    zd = gtld_data.ZoneData.load_from_file(args.zonefile, args.origin)
+    zd = gtld_data.ZoneData.load_from_file(None, args.zonefile, origin=args.origin)
 
     print("Processing zone into useful data")
 
@@ -43,7 +56,7 @@ def main():
 
     # Create a temp dict for dumping the nameservers
     nameservers_dict = {}
-    for nameserver in zd.known_nameservers:
+    for nameserver in zd.known_nameservers.values():
         nameservers_dict[nameserver.nameserver] = nameserver.count
 
     sorted_d = sorted(nameservers_dict.items(), key=lambda kv: kv[1], reverse=True)
@@ -32,14 +32,36 @@ def main():
     parser.add_argument('outfile', help='Output file')
     parser.add_argument('--origin', help="Origin of the zone file")
     parser.add_argument('--parking-nameservers', help='Parking nameservers', default='data/parking_nameservers.txt')
+    parser.add_argument('--max-in-flight', type=int, help='Maximum DNS queries outstanding at once')
+    parser.add_argument('--response-cache', help='File to keep DNS responses in between runs')
+    parser.add_argument('--stats-report', help='File to write timings and counts for the run to, as JSON')
 
     args = parser.parse_args()
 
+    if args.stats_report is not None:
+        gtld_data.gtld_instrumentation.enabled = True
+
+    if args.response_cache is not None:
+        gtld_data.gtld_resolver_cache.open_store(args.response_cache)
+
+    try:
+        write_reverse_zone(args)
+    finally:
+        # Responses so far are kept even if loading or resolving fails
+        gtld_data.gtld_resolver_cache.close_store()
+
+        # A partial report is still worth having when a run dies or is cut short
+        if args.stats_report is not None:
+            gtld_data.gtld_instrumentation.write_report(args.stats_report)
+
+def write_reverse_zone(args):
+    '''Loads the zone, reverse looks up its domains and writes their PTRs'''
     print("Loading zone data, this may take a moment")
-    zone_data = gtld_data.ZoneData.load_from_file(args.zonefile, origin=args.origin)
+    zone_data = gtld_data.ZoneData.load_from_file(None, args.zonefile, origin=args.origin)
 
     zone_processor = gtld_data.ZoneProcessor(zone_data)
-    reverse_zones = zone_processor.get_reverse_zone_information(zone_data.domains)
+    reverse_zones = zone_processor.get_reverse_zone_information(None, zone_data.domains,
+                                                                 max_in_flight=args.max_in_flight)
 
     print("Unique domains: " + str(len(zone_data.domains)))
 
@@ -50,7 +72,7 @@ def main():
                 continue
             f.write(domain)
             for ptr in rlookup:
-                f.write("," + ptr)
+                f.write("," + ptr.reverse_lookup_name)
             f.write("\n")
 
 if __name__ == "__main__":
@@ -0,0 +1,258 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Loads a batch of zone files in parallel, one database per zone
+
+Each zone is handled by a worker process doing what create_data_from_zonefile
+does for a single zone: create the zone's own database, load the zone into it
+and reverse look up its domains. The zone is then classified the same way
+process_zone_file would, and the worker reports how long each step took.'''
+
+import argparse
+import concurrent.futures
+import os
+import time
+import traceback
+
+from gtld_data import gtld_db
+import gtld_data
+from gtld_data.backends import BACKENDS, get_backend
+
+def find_zone_files(paths):
+    '''Expands directories in a list of paths to the zone files inside them'''
+    zone_files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            zone_files.append(path)
+            continue
+
+        for file_name in sorted(os.listdir(path)):
+            file_path = os.path.join(path, file_name)
+            if not file_name.startswith('.') and os.path.isfile(file_path):
+                zone_files.append(file_path)
+    return zone_files
+
+# Suffixes zone files are published or stored with, outermost first
+COMPRESSION_SUFFIXES = ['.gz', '.bz2', '.xz']
+ZONE_FILE_SUFFIXES = ['.zone', '.txt']
+
+def zone_name(zone_file):
+    '''Names a zone after its file, i.e. co.uk.zone.gz is co.uk
+
+    The name is only used for the zone's database and in reports, the
+    origin comes from the zone file itself. Only the known suffixes come
+    off, so the rest of the name is kept whole and each file in a batch
+    gets its own database'''
+    name = os.path.basename(zone_file)
+    for suffixes in (COMPRESSION_SUFFIXES, ZONE_FILE_SUFFIXES):
+        for suffix in suffixes:
+            if name.lower().endswith(suffix) and len(name) > len(suffix):
+                name = name[:-len(suffix)]
+                break
+    return name
+
+def ingest_zone(zone_file, name, database_path, settings):
+    '''Loads, resolves and classifies one zone into its own database
+
+    Runs in a worker process, so it sets up the process's database and
+    config singletons itself. Returns a dict describing how it went.'''
+    result = {
+        'zone_file': zone_file,
+        'zone': name,
+        'database': database_path,
+        'domains': 0,
+        'statuses': {},
+        'timings': {},
+        'stats': None,
+        'error': None,
+    }
+    timings = result['timings']
+    started = time.perf_counter()
+
+    # Workers are reused, so each zone starts its counts afresh
+    gtld_data.gtld_instrumentation.reset()
+    gtld_data.gtld_instrumentation.enabled = settings['stats']
+
+    gtld_data.gtld_lookup_config.database_backend = settings['backend']
+    gtld_data.gtld_lookup_config.database_path = database_path
+    try:
+        gtld_db.create_database()
+
+        step_started = time.perf_counter()
+        with gtld_db.bulk_load():
+            cursor = gtld_db.database_connection.cursor()
+            zone_data = gtld_data.ZoneData.load_from_file(cursor, zone_file)
+        result['domains'] = len(zone_data.domains)
+        timings['load'] = time.perf_counter() - step_started
+
+        if settings['resolve'] is True:
+            step_started = time.perf_counter()
+            gtld_db.database_connection.begin()
+            cursor = gtld_db.database_connection.cursor()
+            zone_processor = gtld_data.ZoneProcessor(None)
+            zone_processor.resolve_in_batches(gtld_db.database_connection, cursor,
+                                              list(zone_data.domains.values()),
+                                              batch_size=settings['batch_size'],
+                                              max_in_flight=settings['max_in_flight'])
+            gtld_db.database_connection.commit()
+            timings['resolve'] = time.perf_counter() - step_started
+
+        # Resolution fills in the same objects, so there's no need to read the zone back
+        step_started = time.perf_counter()
+        zone_processor = gtld_data.ZoneProcessor(zone_data)
+        zone_processor.load_parked_domains_list(settings['parking_nameservers'])
+        zone_processor.load_blocked_domains_list(settings['blocking_nameservers'])
+        zone_processor.load_known_expired_ptrs(settings['reverse_expired_ptrs'])
+        zone_processor.load_known_parked_ptrs(settings['reverse_parking_ptrs'])
+        zone_processor.load_other_inactive_list(settings['other_inactive_nameservers'])
+        zone_processor.process_zone_data()
+        for domain in zone_data.domains.values():
+            result['statuses'][domain.status.value] = result['statuses'].get(domain.status.value, 0) + 1
+        timings['classify'] = time.perf_counter() - step_started
+    except Exception:
+        # One broken zone shouldn't take the rest of the batch down with it
+        result['error'] = traceback.format_exc()
+    finally:
+        if gtld_db.database_connection is not None:
+            gtld_db.database_connection.close()
+            gtld_db.database_connection = None
+
+    timings['total'] = time.perf_counter() - started
+    if settings['stats'] is True:
+        result['stats'] = gtld_data.gtld_instrumentation.report()
+    return result
+
+def ingest_zones(jobs, settings, workers=None, report=None):
+    '''Runs ingest_zone for each (zone_file, name, database_path) job in a process pool
+
+    report is called with each result as its zone finishes. Returns the
+    results in the order the jobs were given.'''
+    results = [None] * len(jobs)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for i, (zone_file, name, database_path) in enumerate(jobs):
+            futures[executor.submit(ingest_zone, zone_file, name, database_path, settings)] = i
+
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if report is not None:
+                report(result)
+    return results
+
+def print_result(result):
+    if result['error'] is not None:
+        print(result['zone'] + ": failed after " + ("%.1f" % result['timings']['total']) + "s")
+        print(result['error'])
+        return
+
+    steps = ", ".join(step + " " + ("%.1f" % seconds) + "s" for step, seconds in result['timings'].items())
+    print(result['zone'] + ": " + str(result['domains']) + " domains, " + steps)
+
+def write_stats_report(file_name, results):
+    '''Writes this process's report, with each zone's own report under "zones"'''
+    report = gtld_data.gtld_instrumentation.report()
+    report['zones'] = {}
+    for result in results:
+        report['zones'][result['zone']] = result['stats']
+    gtld_data.gtld_instrumentation.write_report(file_name, report=report)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('zonefiles', nargs='+', help='Zone files, or directories of them, to load')
+    parser.add_argument('--database-dir', default='db', help='Directory to create each zone\'s database in')
+    parser.add_argument('--backend', choices=sorted(BACKENDS.keys()), help='Database backend, firebird by default')
+    parser.add_argument('--workers', type=int, help='Zones to load at once, one per CPU by default')
+    parser.add_argument('--skip-resolve', action='store_true', help='Load and classify without reverse lookups')
+    parser.add_argument('--max-in-flight', type=int, help='Maximum DNS queries outstanding at once, per zone')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Domains to resolve between commits')
+    parser.add_argument('--parking-nameservers', help='Parking nameservers', default='data/parking_nameservers.txt')
+    parser.add_argument('--blocking-nameservers', help='Blocking nameservers', default='data/blocking_nameservers.txt')
+    parser.add_argument('--reverse-parking-ptrs', help='Parking PTR Domains', default='data/reverse_parking_ptrs.txt')
+    parser.add_argument('--reverse-expired-ptrs', help='Expired PTR Domains', default='data/reverse_expired_ptrs.txt')
+    parser.add_argument('--other-inactive-nameservers', help='Other Inactive nameservers list', default='data/other_inactive_nameservers.txt')
+    parser.add_argument('--stats-report', help='File to write timings and counts for each zone to, as JSON')
+    args = parser.parse_args()
+
+    backend = args.backend
+    if backend is None:
+        backend = gtld_data.gtld_lookup_config.database_backend
+
+    settings = {
+        'backend': backend,
+        'resolve': not args.skip_resolve,
+        'batch_size': args.batch_size,
+        'max_in_flight': args.max_in_flight,
+        'parking_nameservers': args.parking_nameservers,
+        'blocking_nameservers': args.blocking_nameservers,
+        'reverse_parking_ptrs': args.reverse_parking_ptrs,
+        'reverse_expired_ptrs': args.reverse_expired_ptrs,
+        'other_inactive_nameservers': args.other_inactive_nameservers,
+        'stats': args.stats_report is not None,
+    }
+
+    jobs = []
+    extension = get_backend(backend).file_extension
+    zone_files_by_name = {}
+    for zone_file in find_zone_files(args.zonefiles):
+        name = zone_name(zone_file)
+
+        # Two workers loading into the same database would clobber each other
+        if name in zone_files_by_name:
+            parser.error(zone_file + " and " + zone_files_by_name[name] + " are both zone " + name)
+        zone_files_by_name[name] = zone_file
+        jobs.append((zone_file, name, os.path.join(args.database_dir, name + extension)))
+    if len(jobs) == 0:
+        parser.error("no zone files found")
+
+    # Zones go in the stats report as they finish, so a batch that dies still reports the ones that made it
+    finished = []
+    def report_result(result):
+        finished.append(result)
+        print_result(result)
+
+    print("Loading " + str(len(jobs)) + " zones ...")
+    started = time.perf_counter()
+    try:
+        results = ingest_zones(jobs, settings, workers=args.workers, report=report_result)
+    finally:
+        if args.stats_report is not None:
+            write_stats_report(args.stats_report, finished)
+    elapsed = time.perf_counter() - started
+
+    failed = [r for r in results if r['error'] is not None]
+    zone_time = sum(r['timings']['total'] for r in results)
+    print()
+    print("Loaded " + str(len(results) - len(failed)) + " of " + str(len(results)) + " zones in " +
+          ("%.1f" % elapsed) + "s (" + ("%.1f" % zone_time) + "s of zone time)")
+    for result in failed:
+        print("  failed: " + result['zone_file'])
+
+    print()
+    print("Domain Report:")
+    totals = {}
+    for result in results:
+        for status, count in result['statuses'].items():
+            totals[status] = totals.get(status, 0) + count
+    for status in sorted(totals):
+        print("  " + status + ": " + str(totals[status]))
+
+if __name__ == "__main__":
+    main()
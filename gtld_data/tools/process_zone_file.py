@@ -25,6 +25,7 @@ import argparse
 import operator
 
 import gtld_data
+from gtld_data.backends import BACKENDS
 from gtld_data import gtld_db
 
 def main():
@@ -36,15 +37,44 @@ def main():
     parser.add_argument('--reverse-parking-ptrs', help='Parking PTR Domains', default='data/reverse_parking_ptrs.txt')
     parser.add_argument('--reverse-expired-ptrs', help='Expired PTR Domains', default='data/reverse_expired_ptrs.txt')
     parser.add_argument('--other-inactive-nameservers', help='Other Inactive nameservers list', default='data/other_inactive_nameservers.txt')
+    parser.add_argument('--backend', choices=sorted(BACKENDS.keys()), help='Database backend, firebird by default')
+    parser.add_argument('--database', help='Database file to use')
+    parser.add_argument('--snapshot', help='Read the zone from a snapshot file instead of the database')
+    parser.add_argument('--save-snapshot', help='Write the zone loaded from the database to a snapshot file')
+    parser.add_argument('--graph', action='store_true', help='Classify domains through the zone graph')
+    parser.add_argument('--stats-report', help='File to write timings and counts for the run to, as JSON')
     args = parser.parse_args()
 
-    print("Connecting database ...")
-    gtld_data.gtld_db.connect()
+    if args.stats_report is not None:
+        gtld_data.gtld_instrumentation.enabled = True
 
-    print("Loading zone data, this may take a moment")
-    gtld_db.database_connection.begin()
-    cursor = gtld_db.database_connection.cursor()
-    zone_data = gtld_data.ZoneData.load_from_db(cursor, 1)
+    try:
+        classify_zone(args)
+    finally:
+        # A partial report is still worth having when a run dies or is cut short
+        if args.stats_report is not None:
+            gtld_data.gtld_instrumentation.write_report(args.stats_report)
+
+def classify_zone(args):
+    '''Loads the zone and prints how many of its domains have each status'''
+    if args.backend is not None:
+        gtld_data.gtld_lookup_config.database_backend = args.backend
+    if args.database is not None:
+        gtld_data.gtld_lookup_config.database_path = args.database
+
+    if args.snapshot is not None:
+        zone_data = gtld_data.ZoneData.load_snapshot(args.snapshot)
+    else:
+        print("Connecting database ...")
+        gtld_data.gtld_db.connect()
+
+        print("Loading zone data, this may take a moment")
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+        zone_data = gtld_data.ZoneData.load_from_db(cursor, 1)
+
+        if args.save_snapshot is not None:
+            zone_data.save_snapshot(args.save_snapshot)
 
 
     zone_processor = gtld_data.ZoneProcessor(zone_data)
@@ -53,7 +83,19 @@ def main():
     zone_processor.load_known_expired_ptrs(args.reverse_expired_ptrs)
     zone_processor.load_known_parked_ptrs(args.reverse_parking_ptrs)
     zone_processor.load_other_inactive_list(args.other_inactive_nameservers)
-    zone_processor.process_zone_data()
+    if args.graph is True:
+        status_ids = zone_processor.process_zone_graph(zone_data.graph())
+    else:
+        zone_processor.process_zone_data()
+        status_ids = {
+            gtld_data.DomainStatus.NO_RDATA: zone_processor.no_ns_rdata,
+            gtld_data.DomainStatus.PARKED: zone_processor.parked_domains,
+            gtld_data.DomainStatus.PTR_PARKED: zone_processor.reverse_parked_domains,
+            gtld_data.DomainStatus.PTR_EXPIRED: zone_processor.reverse_expired_domains,
+            gtld_data.DomainStatus.BLOCKED: zone_processor.blocked_domains,
+            gtld_data.DomainStatus.OTHER_INACTIVE: zone_processor.other_inactive_nameservers,
+            gtld_data.DomainStatus.UNKNOWN: zone_processor.unknown_status_domains,
+        }
 
     print("Unique domains: " + str(len(zone_data.domains)))
     print("Loaded " + str(len(zone_processor.known_parked_nameservers)) + " Known Parked Domains")
@@ -62,13 +104,13 @@ def main():
     print("Loaded " + str(len(zone_processor.known_expired_ptrs)) + " Known Expired PTRs")
     print()
     print("Domain Report:")
-    print("  NO_RDATA: " +str(len(zone_processor.no_ns_rdata)))
-    print("  PARKED:  " + str(len(zone_processor.parked_domains)))
-    print("  PTR_PARKED: " + str(len(zone_processor.reverse_parked_domains)))
-    print("  PTR_EXPIRED: " + str(len(zone_processor.reverse_expired_domains)))
-    print("  BLOCKED: " + str(len(zone_processor.blocked_domains)))
-    print("  OTHER_INACTIVE: " + str(len(zone_processor.other_inactive_nameservers)))
-    print("  UNKNOWN: " + str(len(zone_processor.unknown_status_domains)))
+    print("  NO_RDATA: " +str(len(status_ids[gtld_data.DomainStatus.NO_RDATA])))
+    print("  PARKED:  " + str(len(status_ids[gtld_data.DomainStatus.PARKED])))
+    print("  PTR_PARKED: " + str(len(status_ids[gtld_data.DomainStatus.PTR_PARKED])))
+    print("  PTR_EXPIRED: " + str(len(status_ids[gtld_data.DomainStatus.PTR_EXPIRED])))
+    print("  BLOCKED: " + str(len(status_ids[gtld_data.DomainStatus.BLOCKED])))
+    print("  OTHER_INACTIVE: " + str(len(status_ids[gtld_data.DomainStatus.OTHER_INACTIVE])))
+    print("  UNKNOWN: " + str(len(status_ids[gtld_data.DomainStatus.UNKNOWN])))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,204 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Parses one large zone file in several processes at once
+
+The file is cut into byte ranges that start on a line with a new owner
+name, so each range can be parsed without knowing what came before it.
+Workers hand back plain domain to nameserver maps, which are folded into
+a single ZoneData in file order, so the result is the same as a serial
+parse. Files that change $ORIGIN part way through can't be split like
+this, and neither can compressed files, so those are parsed serially instead.'''
+
+import concurrent.futures
+import os
+
+import dns.exception
+import dns.name
+import dns.rdatatype
+
+from gtld_data.compression import compression_opener
+from gtld_data.zone_reader import ZoneReader
+
+class SerialParseRequired(Exception):
+    '''Raised when a zone file can't be parsed in pieces and has to be read serially'''
+
+# More chunks than workers, so one slow chunk doesn't leave the others idle
+CHUNKS_PER_WORKER = 4
+
+def header_origin(path, origin=None):
+    '''Returns the origin in effect at the first record, following any $ORIGIN lines before it'''
+    if origin is not None and not isinstance(origin, dns.name.Name):
+        origin = dns.name.from_text(origin)
+
+    with open(path, 'r', encoding='utf-8', newline='\n') as f:
+        for line in f:
+            tokens = line.split(';', 1)[0].split()
+            if len(tokens) == 0:
+                continue
+            if tokens[0].upper() == '$ORIGIN':
+                origin = dns.name.from_text(tokens[1], origin)
+            elif tokens[0][0] != '$':
+                break
+
+    if origin is None:
+        return None
+    return origin.to_text()
+
+def find_chunks(path, count):
+    '''Splits a zone file into at most count (start, end) byte ranges
+
+    Each range after the first starts on a line with an owner name that
+    differs from the owner before it, so a domain's records aren't split
+    between chunks.'''
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, count):
+            target = size * i // count
+            if target <= boundaries[-1]:
+                continue
+
+            # Start from the first whole line, then look for the next change of owner
+            f.seek(target - 1)
+            f.readline()
+            previous_owner = None
+            in_parentheses = False
+            boundary = None
+            while boundary is None:
+                position = f.tell()
+                line = f.readline()
+                if len(line) == 0:
+                    break
+
+                line = line.split(b';', 1)[0]
+                opened = line.count(b'(') - line.count(b')')
+                if opened < 0:
+                    # Closing a record we came in part way through; nothing before is trustworthy
+                    in_parentheses = False
+                    previous_owner = None
+                    continue
+                if in_parentheses is True or len(line.strip()) == 0 or line[0:1].isspace() or line[0:1] == b'$':
+                    in_parentheses = in_parentheses or opened > 0
+                    continue
+
+                owner = line.split(None, 1)[0]
+                if previous_owner is not None and owner != previous_owner:
+                    boundary = position
+                previous_owner = owner
+                in_parentheses = opened > 0
+
+            if boundary is not None and boundary > boundaries[-1]:
+                boundaries.append(boundary)
+
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+def read_range(path, start, end):
+    '''Yields the lines of a file starting in the byte range [start, end)'''
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position = start
+        while position < end:
+            line = f.readline()
+            if len(line) == 0:
+                break
+            position = position + len(line)
+            yield line.decode('utf-8')
+
+def parse_chunk(path, start, end, origin):
+    '''Parses a byte range of a zone file in a worker process
+
+    Returns the nameservers of each domain and glue addresses, both in the
+    order they were seen, along with the SOA serial if the chunk had one.
+    Also returns the origin at the end of the chunk, so the caller can
+    check no $ORIGIN line changed it under the chunks that follow.'''
+    reader = ZoneReader(read_range(path, start, end), origin=origin)
+    domains = {}
+    glue_records = {}
+    soa = None
+
+    for owner, rrtype, rdata in reader:
+        if rrtype == dns.rdatatype.NS:
+            nameservers = domains.get(owner, None)
+            if nameservers is None:
+                nameservers = []
+                domains[owner] = nameservers
+            nameservers.append(rdata.to_text())
+        elif rrtype == dns.rdatatype.A or rrtype == dns.rdatatype.AAAA:
+            addresses = glue_records.get(owner, None)
+            if addresses is None:
+                addresses = []
+                glue_records[owner] = addresses
+            addresses.append(rdata.to_text())
+        elif rrtype == dns.rdatatype.SOA:
+            if soa is None:
+                soa = int(rdata.serial)
+
+    end_origin = None
+    if reader.origin is not None:
+        end_origin = reader.origin.to_text()
+    return {'domains': domains, 'glue_records': glue_records, 'soa': soa, 'origin': end_origin}
+
+def parse_in_parallel(zone_data, path, origin=None, workers=None):
+    '''Parses a zone file across worker processes into zone_data
+
+    Returns the origin in effect at the end of the file, or raises
+    SerialParseRequired if the file can't be parsed in pieces.'''
+    if compression_opener(path) is not None:
+        raise SerialParseRequired("compressed zone files can't be split")
+
+    if workers is None:
+        workers = os.cpu_count()
+    # The first chunk reads the $ORIGIN lines itself, the rest start from where they leave it
+    body_origin = header_origin(path, origin)
+    chunks = find_chunks(path, workers * CHUNKS_PER_WORKER)
+
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for start, end in chunks:
+                chunk_origin = body_origin
+                if start == 0:
+                    chunk_origin = origin
+                futures.append(executor.submit(parse_chunk, path, start, end, chunk_origin))
+            results = [future.result() for future in futures]
+    except dns.exception.SyntaxError:
+        # Could be a bad split inside a multi-line record; a serial read will say for sure
+        raise SerialParseRequired("zone file couldn't be parsed in chunks")
+
+    for result in results[:-1]:
+        if result['origin'] != body_origin:
+            raise SerialParseRequired("$ORIGIN changes part way through the zone file")
+
+    # Merging in file order keeps the zone the same as a serial parse would make it
+    for result in results:
+        for owner, nameservers in result['domains'].items():
+            for nameserver_txt in nameservers:
+                zone_data.add_delegation(owner, nameserver_txt)
+        for owner, addresses in result['glue_records'].items():
+            for address in addresses:
+                zone_data.add_glue(owner, address)
+        if zone_data.soa is None and result['soa'] is not None:
+            zone_data.soa = result['soa']
+
+    if results[-1]['origin'] is None:
+        return None
+    return dns.name.from_text(results[-1]['origin'])
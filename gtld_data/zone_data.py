@@ -18,12 +18,17 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import dns.zone
 import dns.rdatatype
 
 from gtld_data.domain_status import DomainStatus
 from gtld_data.domain_record import DomainRecord
+from gtld_data.identity_map import IdentityMap
+from gtld_data.instrumentation import gtld_instrumentation
+from gtld_data.zone_graph import ZoneGraph
 from gtld_data.nameserver_record import NameserverRecord
+from gtld_data.zone_chunks import SerialParseRequired, parse_in_parallel
+from gtld_data.zone_reader import ZoneReader
+from gtld_data.zone_snapshot import SnapshotDomains, ZoneSnapshot, write_snapshot
 
 from gtld_data.db import gtld_db
 
@@ -33,86 +38,158 @@ class ZoneData(object):
         self.db_id = None
         self.origin = None
         self.soa = None
-        self.parsed_zone = None
         self.domains = {}
         self.known_nameservers = {}
+        self.glue_records = {}
+        self.snapshot = None
+        self._graph = None
 
     @classmethod
-    def load_from_file(cls, cursor, file_name, origin=None):
-        zd = ZoneData()
-        zd.parsed_zone = dns.zone.from_file(file_name, origin=origin, relativize=False)
+    def load_from_file(cls, cursor, file_name, origin=None, workers=None):
+        '''Streams a zone file in, writing it to the database if a cursor is given
+
+        With more than one worker, a zone file on disk is split up and parsed
+        in that many processes. Files that can't be split are read serially.'''
+        zd = cls()
+        parallel = workers is not None and workers > 1 and isinstance(file_name, str)
+        with gtld_instrumentation.phase('parse'):
+            if parallel is True:
+                try:
+                    final_origin = parse_in_parallel(zd, file_name, origin=origin, workers=workers)
+                except SerialParseRequired:
+                    # Chunks are only merged once they've all parsed, so zd is still empty
+                    parallel = False
+
+            if parallel is False:
+                reader = ZoneReader(file_name, origin=origin)
+                for owner, rrtype, rdata in reader:
+                    zd.process_record(owner, rrtype, rdata)
+                final_origin = reader.origin
+
         zd.origin = origin
-        zd.process_loaded_zone(cursor)
+        if zd.origin is None and final_origin is not None:
+            zd.origin = final_origin.to_text(omit_final_dot=True)
+
+        if cursor is not None:
+            zd.process_loaded_zone(cursor)
         return zd
 
     @classmethod
     def load_from_db(cls, cursor, db_id):
+        '''Loads a zone file and everything linked to it back from the database'''
         zd = cls()
-        zone_file_select = """SELECT id, origin, soa FROM zone_files WHERE id = ?"""
-        cursor.execute(zone_file_select, [db_id])
+        with gtld_instrumentation.phase('db_load'):
+            zone_file_select = """SELECT id, origin, soa FROM zone_files WHERE id = ?"""
+            cursor.execute(zone_file_select, [db_id])
 
-        row = cursor.fetchone()
-        zd.db_id = row[0]
-        zd.origin = row[1]
-        zd.soa = row[2]
+            row = cursor.fetchone()
+            zd.db_id = row[0]
+            zd.origin = row[1]
+            zd.soa = row[2]
+
+            # Domains link against the same nameserver objects we keep here
+            identity_map = IdentityMap()
+            for nameserver_obj in NameserverRecord.read_all_from_db(cursor, zd.db_id, identity_map=identity_map):
+                zd.known_nameservers[nameserver_obj.nameserver] = nameserver_obj
 
-        zd.known_nameservers = NameserverRecord.read_all_from_db(cursor, zd.db_id)
-        zd.domains = DomainRecord.read_all_from_db(cursor, zd.db_id)
+            zd.domains = DomainRecord.read_all_from_db(cursor, zd.db_id, identity_map=identity_map)
+        return zd
+
+    @classmethod
+    def load_snapshot(cls, file_name):
+        '''Opens a snapshot written by save_snapshot
+
+        The file is memory mapped and domains are only read as they're used.
+        The zone is read-only, and glue records aren't kept in snapshots.'''
+        zd = cls()
+        zd.snapshot = ZoneSnapshot(file_name)
+        zd.origin = zd.snapshot.origin
+        zd.soa = zd.snapshot.soa
+        zd.known_nameservers = zd.snapshot.known_nameservers()
+        zd.domains = SnapshotDomains(zd.snapshot)
         return zd
 
+    def save_snapshot(self, file_name):
+        '''Writes the zone, its domains, nameservers, PTRs and rdata to a snapshot file'''
+        write_snapshot(self, file_name)
+
+    def graph(self, rebuild=False):
+        '''Returns the zone's domains and nameservers as a ZoneGraph
+
+        The graph is built on first use and kept, so pass rebuild=True if
+        the domains have changed since'''
+        if self._graph is None or rebuild is True:
+            self._graph = ZoneGraph.from_zone_data(self)
+        return self._graph
+
+    @classmethod
+    def latest_db_id(cls, cursor, origin=None):
+        '''Returns the id of the most recently loaded zone file, optionally for a given origin'''
+        if origin is None:
+            cursor.execute("""SELECT MAX(id) FROM zone_files""")
+        else:
+            cursor.execute("""SELECT MAX(id) FROM zone_files WHERE origin = ?""", [origin])
+
+        row = cursor.fetchone()
+        if row is None or row[0] is None:
+            return None
+        return int(row[0])
+
     def to_db(self, cursor):
         '''Stores zone data in the database'''
 
         # Create zone file entry and our PK entry
         print("Writing to database ...")
-        zone_file_insert = """INSERT INTO zone_files (origin, soa) VALUES (?, ?) RETURNING id"""
-        cursor.execute(zone_file_insert, (self.origin, self.soa))
-        self.db_id = int(cursor.fetchone()[0])
+        zone_file_insert = """INSERT INTO zone_files (id, origin, soa) VALUES (?, ?, ?)"""
+        self.db_id = gtld_db.next_id('zone_files')
+        cursor.execute(zone_file_insert, (self.db_id, self.origin, self.soa))
         
-    def process_loaded_zone(self, cursor):
-        '''Processes parsed zone data'''
-        # Get our SOA
-        soa_record = list(self.parsed_zone.iterate_rdatas(dns.rdatatype.SOA))[0]
-        self.soa = int(soa_record[2].serial)
-        records = list(self.parsed_zone.iterate_rdatas(dns.rdatatype.NS))
-
-        # Write the zonefile record to the database
-        cursor = gtld_db.database_connection.cursor()
-        gtld_db.database_connection.begin()
-        self.to_db(cursor)
-
-        # We loop twice to handle adding the nameservers in a single go
-        for rr in records:
-            # See if we've seen this nameserver, and increment its count
-            nameserver_txt = rr[2].to_text()
-            nameserver_obj = self.known_nameservers.get(nameserver_txt, None)
-            if nameserver_obj is None:
-                nameserver_obj = NameserverRecord(nameserver_txt)
-                nameserver_obj._zonefile_id = self.db_id
-                self.known_nameservers[nameserver_txt] = nameserver_obj
-            self.known_nameservers[nameserver_txt].increment_count()
-
-        # Add all nameservers to the database
-        for _, nameserver in self.known_nameservers.items():
-            nameserver._zonefile_id = self.db_id
-            nameserver.to_db(cursor)
-
-        # Now process the domains
-        for rr in records:
-            full_domain_name = rr[0].to_text()
-            nameserver_txt = rr[2].to_text()
-
-            # First document the domains
-            domain = self.domains.get(full_domain_name, None)
-            if domain is None:
-                self.domains[full_domain_name] = DomainRecord(full_domain_name)
-                domain = self.domains[full_domain_name]
-
-            # This is ugly, but we need the nameserver record from above.
-            nameserver_obj = self.known_nameservers[nameserver_txt]
+    def process_record(self, owner, rrtype, rdata):
+        '''Folds a single record from the zone file into the zone data'''
+        if rrtype == dns.rdatatype.NS:
+            self.add_delegation(owner, rdata.to_text())
+
+        elif rrtype == dns.rdatatype.A or rrtype == dns.rdatatype.AAAA:
+            # Glue for in-zone nameservers
+            self.add_glue(owner, rdata.to_text())
+
+        elif rrtype == dns.rdatatype.SOA:
+            if self.soa is None:
+                self.soa = int(rdata.serial)
+
+    def add_delegation(self, owner, nameserver_txt):
+        '''Links a domain to a nameserver, creating either as needed'''
+
+        # See if we've seen this nameserver, and increment its count
+        nameserver_obj = self.known_nameservers.get(nameserver_txt, None)
+        if nameserver_obj is None:
+            nameserver_obj = NameserverRecord(nameserver_txt)
+            self.known_nameservers[nameserver_txt] = nameserver_obj
+
+        # Document the domain and link it to the nameserver
+        domain = self.domains.get(owner, None)
+        if domain is None:
+            domain = DomainRecord(owner)
+            self.domains[owner] = domain
+
+        # Repeated NS lines only count once, same as a parsed rdataset
+        if nameserver_obj not in domain.nameservers:
+            nameserver_obj.increment_count()
             domain.nameservers.add(nameserver_obj)
 
-        # Write our list of domains to the database
-        for _, value in self.domains.items():
-            value._zonefile_id = self.db_id
-            value.to_db(cursor)
+    def add_glue(self, owner, address):
+        '''Records an address for an in-zone nameserver'''
+        addresses = self.glue_records.get(owner, None)
+        if addresses is None:
+            addresses = set()
+            self.glue_records[owner] = addresses
+        addresses.add(address)
+
+    def process_loaded_zone(self, cursor):
+        '''Writes the loaded zone, its nameservers and domains to the database'''
+        with gtld_instrumentation.phase('db_write'):
+            self.to_db(cursor)
+
+            # Add all nameservers to the database, then the domains that link to them
+            NameserverRecord.bulk_to_db(cursor, self.db_id, self.known_nameservers.values())
+            DomainRecord.bulk_to_db(cursor, self.db_id, self.domains.values())
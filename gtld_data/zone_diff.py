@@ -0,0 +1,277 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Works out what changed between a stored zone and a newer zone file
+
+Registries publish a new zone every day and only a small part of it
+changes, so rather than loading it from scratch the new file is merged
+against the domains already in the database and only the differences are
+written. Both sides are read in owner name order, which relies on the zone
+file being sorted (LC_ALL=C sort order of the owner names; the apex can be
+anywhere).'''
+
+import itertools
+
+import dns.rdatatype
+
+from gtld_data.db import gtld_db
+from gtld_data.domain_record import DomainRecord
+from gtld_data.domain_status import DomainStatus
+from gtld_data.nameserver_record import NameserverRecord
+from gtld_data.zone_reader import ZoneReader
+
+# Glue and everything else is skipped without being parsed
+DIFF_RRTYPES = frozenset([dns.rdatatype.SOA, dns.rdatatype.NS])
+
+class UnsortedZoneError(ValueError):
+    '''Raised when domains don't come in owner name order'''
+
+class ZoneDiff(object):
+    '''The delegations added, removed and changed between a stored zone and a new zone file
+
+    added holds (name, nameservers) and removed holds (domain id,
+    nameservers). changed holds (domain id, old nameservers, new
+    nameservers). The nameservers are frozensets of names.'''
+
+    def __init__(self, zonefile_id, origin, old_soa):
+        self.zonefile_id = zonefile_id
+        self.origin = origin
+        self.old_soa = old_soa
+        self.new_soa = None
+        self.added = []
+        self.removed = []
+        self.changed = []
+        self.unchanged = 0
+
+        self.apex = origin
+        if not self.apex.endswith('.'):
+            self.apex = self.apex + '.'
+        self._apex_nameservers = None
+
+    def __len__(self):
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    @property
+    def up_to_date(self):
+        '''True if the zone file has the serial already in the database'''
+        return self.new_soa is not None and self.new_soa == self.old_soa
+
+    @classmethod
+    def from_file(cls, cursor, zonefile_id, zone_file):
+        '''Compares a zone file against the zone stored as zonefile_id'''
+        cursor.execute("""SELECT origin, soa FROM zone_files WHERE id = ?""", [int(zonefile_id)])
+        row = cursor.fetchone()
+
+        diff = cls(int(zonefile_id), row[0], int(row[1]))
+        diff.compare(cursor, ZoneReader(zone_file, origin=diff.origin, rrtypes=DIFF_RRTYPES))
+        return diff
+
+    def compare(self, cursor, records):
+        '''Merges the zone's records against the database
+
+        Nothing is compared if the SOA serial hasn't changed. The SOA
+        normally comes first, so an unchanged zone is only read that far.'''
+        records = iter(records)
+        seen = []
+        for owner, rrtype, rdata in records:
+            seen.append((owner, rrtype, rdata))
+            if rrtype == dns.rdatatype.SOA or rrtype == dns.rdatatype.NS:
+                break
+        if self._check_soa(seen):
+            return
+        records = itertools.chain(seen, records)
+
+        file_domains = self._file_delegations(records)
+        db_domains = self._db_delegations(cursor)
+        file_domain = next(file_domains, None)
+        db_domain = next(db_domains, None)
+        while file_domain is not None or db_domain is not None:
+            if db_domain is None or (file_domain is not None and file_domain[0] < db_domain[0]):
+                self.added.append(file_domain)
+                file_domain = next(file_domains, None)
+            elif file_domain is None or db_domain[0] < file_domain[0]:
+                self.removed.append((db_domain[1], db_domain[2]))
+                db_domain = next(db_domains, None)
+            else:
+                self._compare_domain(db_domain[1], db_domain[2], file_domain[1])
+                file_domain = next(file_domains, None)
+                db_domain = next(db_domains, None)
+
+        # The apex is kept out of the merge since it's rarely where sorting would put it
+        db_apex = self._db_apex(cursor)
+        if db_apex is None and self._apex_nameservers is not None:
+            self.added.append((self.apex, self._apex_nameservers))
+        elif db_apex is not None and self._apex_nameservers is None:
+            self.removed.append(db_apex)
+        elif db_apex is not None:
+            self._compare_domain(db_apex[0], db_apex[1], self._apex_nameservers)
+
+    def _check_soa(self, records):
+        for _, rrtype, rdata in records:
+            if rrtype == dns.rdatatype.SOA:
+                self.new_soa = int(rdata.serial)
+        return self.up_to_date
+
+    def _compare_domain(self, domain_id, old_nameservers, new_nameservers):
+        if old_nameservers == new_nameservers:
+            self.unchanged = self.unchanged + 1
+        else:
+            self.changed.append((domain_id, old_nameservers, new_nameservers))
+
+    def _file_delegations(self, records):
+        '''Yields (name, nameservers) for each delegation in the zone file'''
+        last_owner = None
+        nameservers = None
+        for owner, rrtype, rdata in records:
+            if rrtype == dns.rdatatype.SOA:
+                if self.new_soa is None:
+                    self.new_soa = int(rdata.serial)
+                continue
+
+            if owner == self.apex:
+                if self._apex_nameservers is None:
+                    self._apex_nameservers = set()
+                self._apex_nameservers.add(rdata.to_text())
+                continue
+
+            if owner != last_owner:
+                if last_owner is not None:
+                    if owner < last_owner:
+                        raise UnsortedZoneError(owner + " comes after " + last_owner + " in the zone file")
+                    yield (last_owner, frozenset(nameservers))
+                last_owner = owner
+                nameservers = set()
+            nameservers.add(rdata.to_text())
+
+        if last_owner is not None:
+            yield (last_owner, frozenset(nameservers))
+
+        if self._apex_nameservers is not None:
+            self._apex_nameservers = frozenset(self._apex_nameservers)
+
+    def _db_delegations(self, cursor):
+        '''Yields (name, domain id, nameservers) for each stored domain, in name order'''
+        domain_nameservers_select = """SELECT d.id, d.domain_name, n.nameserver FROM domains d
+                                       LEFT JOIN domain_nameservers dn ON dn.domain_id = d.id
+                                       LEFT JOIN nameservers n ON n.id = dn.nameserver_id
+                                       WHERE d.zone_file_id = ? AND d.domain_name <> ?
+                                       ORDER BY d.domain_name"""
+        cursor.execute(domain_nameservers_select, [self.zonefile_id, self.apex])
+
+        last_name = None
+        last_id = None
+        nameservers = None
+        for row in cursor:
+            if row[1] != last_name:
+                if last_name is not None:
+                    if row[1] < last_name:
+                        raise UnsortedZoneError("the database doesn't sort domain names the way Python does")
+                    yield (last_name, last_id, frozenset(nameservers))
+                last_name = row[1]
+                last_id = int(row[0])
+                nameservers = set()
+            if row[2] is not None:
+                nameservers.add(row[2])
+
+        if last_name is not None:
+            yield (last_name, last_id, frozenset(nameservers))
+
+    def _db_apex(self, cursor):
+        '''Returns (domain id, nameservers) for the apex if it's stored as a domain'''
+        apex_nameservers_select = """SELECT d.id, n.nameserver FROM domains d
+                                     LEFT JOIN domain_nameservers dn ON dn.domain_id = d.id
+                                     LEFT JOIN nameservers n ON n.id = dn.nameserver_id
+                                     WHERE d.zone_file_id = ? AND d.domain_name = ?"""
+        cursor.execute(apex_nameservers_select, [self.zonefile_id, self.apex])
+        rows = cursor.fetchall()
+        if len(rows) == 0:
+            return None
+        return (int(rows[0][0]), frozenset(row[1] for row in rows if row[1] is not None))
+
+    def apply(self, cursor):
+        '''Writes the differences to the database
+
+        Removed domains go along with their rdata and PTR links. Changed
+        domains lose their old results and are marked unresolved, so only
+        they and the added domains need looking up again.'''
+        domain_delete = """DELETE FROM domains WHERE id = ?"""
+        domain_nameservers_delete = """DELETE FROM domain_nameservers WHERE domain_id = ?"""
+        domain_rdata_delete = """DELETE FROM domain_rdata WHERE domain_id = ?"""
+        domain_ptrs_delete = """DELETE FROM domain_ptr_records WHERE domain_id = ?"""
+        domain_nameservers_insert = """INSERT INTO domain_nameservers(domain_id, nameserver_id) VALUES (?, ?)"""
+        domain_reset = """UPDATE domains SET resolved = 0, status = ? WHERE id = ?"""
+        nameserver_count_update = """UPDATE nameservers SET domain_count =
+                                     (SELECT COUNT(*) FROM domain_nameservers WHERE nameserver_id = ?) WHERE id = ?"""
+        soa_update = """UPDATE zone_files SET soa = ? WHERE id = ?"""
+
+        nameservers = self._nameserver_records(cursor)
+        touched = set()
+        for _, old_nameservers in self.removed:
+            touched.update(old_nameservers)
+        for _, old_nameservers, new_nameservers in self.changed:
+            touched.update(old_nameservers)
+            touched.update(new_nameservers)
+        for _, new_nameservers in self.added:
+            touched.update(new_nameservers)
+
+        # Children go first, rather than counting on cascades
+        gone = [(domain_id,) for domain_id, _ in self.removed]
+        redone = [(domain_id,) for domain_id, _, _ in self.changed]
+        for statement in (domain_nameservers_delete, domain_rdata_delete, domain_ptrs_delete):
+            gtld_db.executemany(cursor, statement, gone + redone)
+        gtld_db.executemany(cursor, domain_delete, gone)
+
+        gtld_db.executemany(cursor, domain_nameservers_insert,
+                            ((domain_id, nameservers[name].db_id)
+                             for domain_id, _, new_nameservers in self.changed for name in new_nameservers))
+        gtld_db.executemany(cursor, domain_reset,
+                            ((DomainStatus.UNKNOWN.value, domain_id) for domain_id, _, _ in self.changed))
+
+        domains = []
+        for name, new_nameservers in self.added:
+            domain = DomainRecord(name)
+            for nameserver in new_nameservers:
+                domain.nameservers.add(nameservers[nameserver])
+            domains.append(domain)
+        DomainRecord.bulk_to_db(cursor, self.zonefile_id, domains)
+
+        gtld_db.executemany(cursor, nameserver_count_update,
+                            ((nameservers[name].db_id, nameservers[name].db_id) for name in touched))
+        cursor.execute(soa_update, [self.new_soa, self.zonefile_id])
+
+    def _nameserver_records(self, cursor):
+        '''Returns NameserverRecords for every nameserver, adding any the zone now uses'''
+        cursor.execute("""SELECT id, zone_file_id, nameserver, domain_count FROM nameservers""")
+        nameservers = {}
+        for row in cursor.fetchall():
+            nameserver_obj = NameserverRecord(None)
+            nameserver_obj._db_row_to_self(row)
+            nameservers[nameserver_obj.nameserver] = nameserver_obj
+
+        unknown = []
+        wanted = [n for _, n in self.added] + [n for _, _, n in self.changed]
+        for name in itertools.chain.from_iterable(wanted):
+            if name not in nameservers:
+                nameservers[name] = NameserverRecord(name)
+                unknown.append(nameservers[name])
+
+        # Counts are filled in along with the rest once the links are written
+        NameserverRecord.bulk_to_db(cursor, self.zonefile_id, unknown)
+        return nameservers
@@ -0,0 +1,322 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Domain to nameserver and PTR links held as integer arrays
+
+Domains, nameservers and PTRs are numbered, and the links between them are
+kept in CSR form: an offsets array with an entry per domain and an index
+array with the ids it links to. That replaces a set per domain, and lets
+counts and classification run over whole arrays at once. NumPy is used
+for those when it's installed (pip install gtld-innovation-health[graph]),
+otherwise the same operations run as plain loops.'''
+
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from gtld_data.zone_reader import ZoneReader
+
+import dns.rdatatype
+
+def build_csr(row_count, rows, columns):
+    '''Builds offset and index arrays from a list of (row, column) edges
+
+    Columns within a row come out sorted, with duplicate edges removed'''
+    if numpy is not None:
+        rows = numpy.asarray(rows, dtype=numpy.uint32)
+        columns = numpy.asarray(columns, dtype=numpy.uint32)
+        order = numpy.lexsort((columns, rows))
+        rows = rows[order]
+        columns = columns[order]
+
+        keep = numpy.ones(len(rows), dtype=bool)
+        keep[1:] = (rows[1:] != rows[:-1]) | (columns[1:] != columns[:-1])
+        rows = rows[keep]
+
+        offsets = numpy.zeros(row_count + 1, dtype=numpy.uint64)
+        numpy.cumsum(numpy.bincount(rows, minlength=row_count), out=offsets[1:])
+        return array.array('Q', offsets.tobytes()), array.array('I', columns[keep].tobytes())
+
+    # Counting sort the edges into rows, then tidy each row up
+    counts = array.array('Q', [0]) * (row_count + 1)
+    for row in rows:
+        counts[row + 1] = counts[row + 1] + 1
+    for i in range(row_count):
+        counts[i + 1] = counts[i + 1] + counts[i]
+
+    unsorted = array.array('I', [0]) * len(rows)
+    fill = array.array('Q', counts)
+    for row, column in zip(rows, columns):
+        unsorted[fill[row]] = column
+        fill[row] = fill[row] + 1
+
+    offsets = array.array('Q', [0])
+    index = array.array('I')
+    for i in range(row_count):
+        index.extend(sorted(set(unsorted[counts[i]:counts[i + 1]])))
+        offsets.append(len(index))
+    return offsets, index
+
+class ZoneGraph(object):
+    '''Domains with their nameservers and PTRs as CSR adjacency arrays
+
+    Domain, nameserver and PTR ids are positions in domain_names,
+    nameserver_names and ptr_names. record_offsets only says how many
+    records each domain has, which is all classification needs.'''
+
+    def __init__(self, domain_names, nameserver_names, nameserver_offsets, nameserver_index,
+                 ptr_names=(), ptr_offsets=None, ptr_index=None, record_offsets=None):
+        self.domain_names = domain_names
+        self.nameserver_names = nameserver_names
+        self.nameserver_offsets = nameserver_offsets
+        self.nameserver_index = nameserver_index
+        self.ptr_names = ptr_names
+
+        # No PTRs or records just means every row is empty
+        if ptr_offsets is None:
+            ptr_offsets = array.array('Q', [0]) * (len(domain_names) + 1)
+            ptr_index = array.array('I')
+        if record_offsets is None:
+            record_offsets = array.array('Q', [0]) * (len(domain_names) + 1)
+
+        self.ptr_offsets = ptr_offsets
+        self.ptr_index = ptr_index
+        self.record_offsets = record_offsets
+        self._nameserver_ids = None
+        self._nameserver_domains = None
+
+    def __len__(self):
+        return len(self.domain_names)
+
+    @classmethod
+    def from_zone_data(cls, zone_data):
+        '''Builds a graph from loaded zone data
+
+        Zones opened from a snapshot use the snapshot's own arrays'''
+        if zone_data.snapshot is not None:
+            return cls.from_snapshot(zone_data.snapshot)
+
+        nameserver_ids = {}
+        nameserver_names = []
+        for name in zone_data.known_nameservers:
+            nameserver_ids[name] = len(nameserver_names)
+            nameserver_names.append(name)
+
+        ptr_ids = {}
+        ptr_names = []
+        domain_names = []
+        nameserver_offsets = array.array('Q', [0])
+        nameserver_index = array.array('I')
+        ptr_offsets = array.array('Q', [0])
+        ptr_index = array.array('I')
+        record_offsets = array.array('Q', [0])
+
+        for domain in zone_data.domains.values():
+            domain_names.append(domain.domain_name)
+
+            for nameserver in domain.nameservers:
+                nameserver_id = nameserver_ids.get(nameserver.nameserver, None)
+                if nameserver_id is None:
+                    nameserver_id = len(nameserver_names)
+                    nameserver_ids[nameserver.nameserver] = nameserver_id
+                    nameserver_names.append(nameserver.nameserver)
+                nameserver_index.append(nameserver_id)
+            nameserver_offsets.append(len(nameserver_index))
+
+            for ptr in domain.reverse_lookup_ptrs:
+                key = (ptr.ip_address, ptr.reverse_lookup_name)
+                ptr_id = ptr_ids.get(key, None)
+                if ptr_id is None:
+                    ptr_id = len(ptr_names)
+                    ptr_ids[key] = ptr_id
+                    ptr_names.append(ptr.reverse_lookup_name)
+                ptr_index.append(ptr_id)
+            ptr_offsets.append(len(ptr_index))
+
+            record_count = 0
+            for records in domain.records.values():
+                record_count = record_count + len(records)
+            record_offsets.append(record_offsets[-1] + record_count)
+
+        graph = cls(domain_names, nameserver_names, nameserver_offsets, nameserver_index,
+                    ptr_names, ptr_offsets, ptr_index, record_offsets)
+        graph._nameserver_ids = nameserver_ids
+        return graph
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        '''Builds a graph straight on top of an open ZoneSnapshot, without copying it'''
+        return cls(snapshot.domain_names, snapshot.nameserver_names,
+                   snapshot.domain_nameservers.offsets, snapshot.domain_nameservers.index,
+                   snapshot.ptr_names, snapshot.domain_ptrs.offsets, snapshot.domain_ptrs.index,
+                   snapshot.domain_rdata.offsets)
+
+    @classmethod
+    def from_file(cls, file_name, origin=None):
+        '''Reads the NS records of a zone file straight into a graph
+
+        No DomainRecord or NameserverRecord objects are made, so this is
+        the cheap way to get nameserver counts for a large zone'''
+        domain_ids = {}
+        domain_names = []
+        nameserver_ids = {}
+        nameserver_names = []
+        rows = array.array('I')
+        columns = array.array('I')
+
+        for owner, rrtype, rdata in ZoneReader(file_name, origin=origin):
+            if rrtype != dns.rdatatype.NS:
+                continue
+
+            domain_id = domain_ids.get(owner, None)
+            if domain_id is None:
+                domain_id = len(domain_names)
+                domain_ids[owner] = domain_id
+                domain_names.append(owner)
+
+            nameserver_txt = rdata.to_text()
+            nameserver_id = nameserver_ids.get(nameserver_txt, None)
+            if nameserver_id is None:
+                nameserver_id = len(nameserver_names)
+                nameserver_ids[nameserver_txt] = nameserver_id
+                nameserver_names.append(nameserver_txt)
+
+            rows.append(domain_id)
+            columns.append(nameserver_id)
+
+        nameserver_offsets, nameserver_index = build_csr(len(domain_names), rows, columns)
+        graph = cls(domain_names, nameserver_names, nameserver_offsets, nameserver_index)
+        graph._nameserver_ids = nameserver_ids
+        return graph
+
+    def nameserver_id(self, name):
+        '''Returns the id of a nameserver, or None'''
+        if self._nameserver_ids is None:
+            self._nameserver_ids = {}
+            for i in range(len(self.nameserver_names)):
+                self._nameserver_ids[self.nameserver_names[i]] = i
+        return self._nameserver_ids.get(name, None)
+
+    def nameserver_counts(self):
+        '''Returns a dict of nameserver name to the number of domains using it'''
+        if numpy is not None:
+            counts = numpy.bincount(numpy.asarray(self.nameserver_index),
+                                    minlength=len(self.nameserver_names)).tolist()
+        else:
+            counts = [0] * len(self.nameserver_names)
+            for nameserver_id in self.nameserver_index:
+                counts[nameserver_id] = counts[nameserver_id] + 1
+
+        return {self.nameserver_names[i]: count for i, count in enumerate(counts)}
+
+    def domains_on_nameserver(self, name):
+        '''Returns the names of every domain using a nameserver'''
+        nameserver_id = self.nameserver_id(name)
+        if nameserver_id is None:
+            return []
+
+        # The reverse direction is the same CSR built with rows and columns swapped
+        if self._nameserver_domains is None:
+            if numpy is not None:
+                rows = numpy.repeat(numpy.arange(len(self.domain_names), dtype=numpy.uint32),
+                                    numpy.diff(numpy.asarray(self.nameserver_offsets)).astype(numpy.intp))
+            else:
+                rows = array.array('I')
+                for i in range(len(self.domain_names)):
+                    rows.extend([i] * (self.nameserver_offsets[i + 1] - self.nameserver_offsets[i]))
+            self._nameserver_domains = build_csr(len(self.nameserver_names), self.nameserver_index, rows)
+
+        offsets, index = self._nameserver_domains
+        return [self.domain_names[i] for i in index[offsets[nameserver_id]:offsets[nameserver_id + 1]]]
+
+    def _reduce_flags(self, offsets, index, verdicts):
+        '''ORs together the verdicts of everything each domain links to'''
+        if numpy is not None:
+            offsets = numpy.asarray(offsets).astype(numpy.intp)
+            values = numpy.asarray(verdicts, dtype=numpy.uint8)[numpy.asarray(index)]
+            flags = numpy.zeros(len(self.domain_names), dtype=numpy.uint8)
+
+            # reduceat gives empty rows the next row's first value, so leave them out
+            starts = offsets[:-1]
+            not_empty = offsets[1:] > starts
+            if len(values) != 0:
+                flags[not_empty] = numpy.bitwise_or.reduceat(values, starts[not_empty])
+            return flags
+
+        flags = array.array('B', [0]) * len(self.domain_names)
+        for i in range(len(self.domain_names)):
+            flag = 0
+            for j in index[offsets[i]:offsets[i + 1]]:
+                flag = flag | verdicts[j]
+            flags[i] = flag
+        return flags
+
+    def nameserver_flags(self, verdicts):
+        '''Returns, per domain, the OR of verdicts[nameserver id] over its nameservers'''
+        return self._reduce_flags(self.nameserver_offsets, self.nameserver_index, verdicts)
+
+    def ptr_flags(self, verdicts):
+        '''Returns, per domain, the OR of verdicts[PTR id] over its PTRs'''
+        return self._reduce_flags(self.ptr_offsets, self.ptr_index, verdicts)
+
+    def no_records(self):
+        '''Returns 1 for each domain without any records, 0 for the rest'''
+        if numpy is not None:
+            return (numpy.diff(numpy.asarray(self.record_offsets)) == 0).astype(numpy.uint8)
+
+        flags = array.array('B', [0]) * len(self.domain_names)
+        for i in range(len(self.domain_names)):
+            if self.record_offsets[i + 1] == self.record_offsets[i]:
+                flags[i] = 1
+        return flags
+
+    def first_match(self, rules, default):
+        '''Returns, per domain, the position of the first (flags, mask) rule it matches
+
+        Domains matching none of them get default'''
+        if numpy is not None:
+            result = numpy.full(len(self.domain_names), default, dtype=numpy.uint8)
+            # Later rules are written first so earlier ones win
+            for position in reversed(range(len(rules))):
+                flags, mask = rules[position]
+                result[(numpy.asarray(flags) & mask) != 0] = position
+            return result
+
+        result = array.array('B', [default]) * len(self.domain_names)
+        for i in range(len(self.domain_names)):
+            for position, (flags, mask) in enumerate(rules):
+                if flags[i] & mask:
+                    result[i] = position
+                    break
+        return result
+
+    def group_ids(self, values, count):
+        '''Returns a list, for each value from 0 to count - 1, of the domain ids having it'''
+        if numpy is not None:
+            values = numpy.asarray(values)
+            return [numpy.flatnonzero(values == value) for value in range(count)]
+
+        groups = [array.array('I') for _ in range(count)]
+        for i, value in enumerate(values):
+            groups[value].append(i)
+        return groups
@@ -20,11 +20,20 @@
 
 '''Holds the record of a domain'''
 
-import copy
-import re
-
-import dns.resolver
+from gtld_data.async_resolver import AsyncReverseResolver
 from gtld_data.domain_status import DomainStatus
+from gtld_data.instrumentation import gtld_instrumentation
+from gtld_data.ptr_record import PtrRecordMap
+from gtld_data.rule_matcher import RuleMatcher
+
+# Flags recording which lists a nameserver matched
+PARKED_NAMESERVER = 1
+BLOCKED_NAMESERVER = 2
+OTHER_INACTIVE_NAMESERVER = 4
+
+# Flags recording which lists a PTR matched
+PARKED_PTR = 1
+EXPIRED_PTR = 2
 
 class ZoneProcessor(object):
     '''Processes a zone file looking for parked or blocked domains'''
@@ -37,15 +46,17 @@ class ZoneProcessor(object):
         self.reverse_expired_domains = set()
         self.other_inactive_nameservers = set()
         self.unknown_status_domains = set()
-        self.known_parked_nameservers = []
-        self.known_blocked_nameservers = []
-        self.known_other_inactive_nameservers = []
-        self.known_expired_ptrs = []
-        self.known_parked_ptrs = []
+        self.known_parked_nameservers = RuleMatcher()
+        self.known_blocked_nameservers = RuleMatcher()
+        self.known_other_inactive_nameservers = RuleMatcher()
+        self.known_expired_ptrs = RuleMatcher()
+        self.known_parked_ptrs = RuleMatcher()
+        self.nameserver_verdicts = {}
+        self.ptr_verdicts = {}
 
     def process_domain_list(self, domain_list_file):
-        '''Parses and loads the domain list'''
-        domain_list = []
+        '''Parses and loads the domain list into a single matcher'''
+        domain_list = RuleMatcher()
 
         with open(domain_list_file, 'r') as f:
             for line in f:
@@ -53,7 +64,7 @@ class ZoneProcessor(object):
                 if len(line.rstrip()) == 0 or line[0] == "#":
                     continue
 
-                domain_list.append(re.compile(line.rstrip()))
+                domain_list.add(line.rstrip())
         return domain_list
 
     def load_parked_domains_list(self, known_parked_ns_file):
@@ -73,95 +84,186 @@ class ZoneProcessor(object):
     def load_other_inactive_list(self, known_other_inactive_file):
         self.known_other_inactive_nameservers = self.process_domain_list(known_other_inactive_file)
 
+    def nameserver_verdict(self, nameserver):
+        '''Returns the flags for every nameserver list the name matches
+
+        Each distinct nameserver is only checked against the lists once per run'''
+        verdict = self.nameserver_verdicts.get(nameserver, None)
+        if verdict is not None:
+            return verdict
+
+        verdict = 0
+        if self.known_parked_nameservers.search(nameserver) is True:
+            verdict = verdict | PARKED_NAMESERVER
+        if self.known_blocked_nameservers.search(nameserver) is True:
+            verdict = verdict | BLOCKED_NAMESERVER
+        if self.known_other_inactive_nameservers.search(nameserver) is True:
+            verdict = verdict | OTHER_INACTIVE_NAMESERVER
+
+        self.nameserver_verdicts[nameserver] = verdict
+        return verdict
+
+    def ptr_verdict(self, reverse_lookup_name):
+        '''Returns the flags for every PTR list the name matches'''
+        verdict = self.ptr_verdicts.get(reverse_lookup_name, None)
+        if verdict is not None:
+            return verdict
+
+        verdict = 0
+        if self.known_parked_ptrs.search(reverse_lookup_name) is True:
+            verdict = verdict | PARKED_PTR
+        if self.known_expired_ptrs.search(reverse_lookup_name) is True:
+            verdict = verdict | EXPIRED_PTR
+
+        self.ptr_verdicts[reverse_lookup_name] = verdict
+        return verdict
+
+    def classify_domain(self, domain):
+        '''Works out the status of a single domain from the verdict tables
+
+        The order this is handled in is determined to be most accurate/specific reason we can handle
+        In general, we'll handle known domains (via seen NS records), then PTRs, the other list, then
+        anything that didn't return rdata (since we might know something from the master zone file)'''
+        nameserver_verdict = 0
+        for nameserver in domain.nameservers:
+            nameserver_verdict = nameserver_verdict | self.nameserver_verdict(nameserver.nameserver)
+
+        if nameserver_verdict & PARKED_NAMESERVER:
+            return DomainStatus.PARKED
+        if nameserver_verdict & BLOCKED_NAMESERVER:
+            return DomainStatus.BLOCKED
+
+        ptr_verdict = 0
+        for ptr in domain.reverse_lookup_ptrs:
+            ptr_verdict = ptr_verdict | self.ptr_verdict(ptr.reverse_lookup_name)
+
+        if ptr_verdict & PARKED_PTR:
+            return DomainStatus.PTR_PARKED
+        if ptr_verdict & EXPIRED_PTR:
+            return DomainStatus.PTR_EXPIRED
+        if nameserver_verdict & OTHER_INACTIVE_NAMESERVER:
+            return DomainStatus.OTHER_INACTIVE
+
+        # Some results are determined directly from the master zonefile list, and not through domain rdata
+        if len(domain.records) == 0:
+            return DomainStatus.NO_RDATA
+
+        return DomainStatus.UNKNOWN
+
     def process_zone_data(self):
-        '''Processes the zone data file'''
+        '''Processes the zone data file
 
-        def check_nameserver_against_list(domain_list, nameserver):
-            for domain in domain_list:
-                if domain.search(nameserver) is not None:
-                    return True
-            
-            return False
+        Every domain is classified once and its status set in place; the
+        per-category sets hold the same DomainRecord objects as the zone data'''
 
-        # Let's walk the domain list, and see what we need to still process
-        domains = copy.deepcopy(self.zone_data.domains)
+        # Verdicts only hold for the lists loaded right now
+        self.nameserver_verdicts = {}
+        self.ptr_verdicts = {}
 
-        # The order this is handled in is determined to be most accurate/specific reason we can handle
-        # In general, we'll handle known domains (via seen NS records), then PTRs, the other list, then
-        # anything that didn't return rdata (since we might know something from the master zone file)
+        status_sets = {
+            DomainStatus.PARKED: set(),
+            DomainStatus.BLOCKED: set(),
+            DomainStatus.PTR_PARKED: set(),
+            DomainStatus.PTR_EXPIRED: set(),
+            DomainStatus.OTHER_INACTIVE: set(),
+            DomainStatus.NO_RDATA: set(),
+            DomainStatus.UNKNOWN: set(),
+        }
 
-        # Handle Parked Domains
-        for domain in domains:
-            for nameserver in domain.nameservers:
-                if check_nameserver_against_list(self.known_parked_nameservers, nameserver.nameserver) is True:
-                    self.parked_domains.add(domain)
-                    break
-        
-        # Remove the domains we don't need process further
-        for domain in self.parked_domains:
-            domains.remove(domain)
-
-        # Handle blocked domains
-        for domain in domains:
-            for nameserver in domain.nameservers:
-                if check_nameserver_against_list(self.known_blocked_nameservers, nameserver.nameserver) is True:
-                    self.blocked_domains.add(domain)
-                    break
+        with gtld_instrumentation.phase('classify'):
+            for domain in self.zone_data.domains.values():
+                domain.status = self.classify_domain(domain)
+                status_sets[domain.status].add(domain)
 
-        for domain in self.blocked_domains:
-            domains.remove(domain)
+        self.parked_domains = status_sets[DomainStatus.PARKED]
+        self.blocked_domains = status_sets[DomainStatus.BLOCKED]
+        self.reverse_parked_domains = status_sets[DomainStatus.PTR_PARKED]
+        self.reverse_expired_domains = status_sets[DomainStatus.PTR_EXPIRED]
+        self.other_inactive_nameservers = status_sets[DomainStatus.OTHER_INACTIVE]
+        self.no_ns_rdata = status_sets[DomainStatus.NO_RDATA]
+        self.unknown_status_domains = status_sets[DomainStatus.UNKNOWN]
 
-        # Handle Reverse Parked PTRs
-        for domain in domains:
-            for ptr in domain.reverse_lookup_ptrs:
-                if check_nameserver_against_list(self.known_parked_ptrs, ptr.reverse_lookup_name) is True:
-                    self.reverse_parked_domains.add(domain)
-                    break
+    def process_zone_graph(self, graph):
+        '''Classifies every domain of a ZoneGraph in one pass over its arrays
 
-        for domain in self.reverse_parked_domains:
-            domains.remove(domain)
+        Gives the same answers as process_zone_data, in the same order of
+        precedence, but each nameserver and PTR is only checked once and the
+        per-domain work is done on integer flags. Returns a dict of
+        DomainStatus to the ids of the graph's domains with that status.'''
+        self.nameserver_verdicts = {}
+        self.ptr_verdicts = {}
 
-        # Handle Expired PTRs
-        for domain in domains:
-            for ptr in domain.reverse_lookup_ptrs:
-                if check_nameserver_against_list(self.known_expired_ptrs, ptr.reverse_lookup_name) is True:
-                    self.reverse_expired_domains.add(domain)
-                    break
+        with gtld_instrumentation.phase('classify'):
+            nameserver_verdicts = [self.nameserver_verdict(graph.nameserver_names[i])
+                                   for i in range(len(graph.nameserver_names))]
+            ptr_verdicts = [self.ptr_verdict(graph.ptr_names[i]) for i in range(len(graph.ptr_names))]
+            nameserver_flags = graph.nameserver_flags(nameserver_verdicts)
+            ptr_flags = graph.ptr_flags(ptr_verdicts)
 
-        for domain in self.reverse_expired_domains:
-            domains.remove(domain)
+            rules = [
+                (DomainStatus.PARKED, nameserver_flags, PARKED_NAMESERVER),
+                (DomainStatus.BLOCKED, nameserver_flags, BLOCKED_NAMESERVER),
+                (DomainStatus.PTR_PARKED, ptr_flags, PARKED_PTR),
+                (DomainStatus.PTR_EXPIRED, ptr_flags, EXPIRED_PTR),
+                (DomainStatus.OTHER_INACTIVE, nameserver_flags, OTHER_INACTIVE_NAMESERVER),
+                (DomainStatus.NO_RDATA, graph.no_records(), 1),
+            ]
+            statuses = [status for status, _, _ in rules] + [DomainStatus.UNKNOWN]
+            matches = graph.first_match([(flags, mask) for _, flags, mask in rules], len(rules))
 
-        # Remove anything from the other list now
-        for domain in domains:
-            for nameserver in domain.nameservers:
-                if check_nameserver_against_list(self.known_other_inactive_nameservers, nameserver.nameserver) is True:
-                    self.other_inactive_nameservers.add(domain)
-                    break
-        
-        # Remove the domains we don't need process further
-        for domain in self.other_inactive_nameservers:
-            domains.remove(domain)
-
-        # Get rid of anything that didn't return a nameserver; we do this now because some results
-        # are determined directly from the master zonefile list, and not through domain rdata
+            return dict(zip(statuses, graph.group_ids(matches, len(statuses))))
+
+    def get_reverse_zone_information(self, cursor, domains, max_in_flight=None):
+        '''Returns all reverse zone information for a given domain
+
+        Lookups run concurrently, with up to max_in_flight queries outstanding'''
+        resolver = AsyncReverseResolver(cursor, max_in_flight=max_in_flight)
+        with gtld_instrumentation.phase('resolve'):
+            return resolver.resolve(domains.values())
+
+    def resolve_in_batches(self, connection, cursor, domains, batch_size=1000, max_in_flight=None):
+        '''Reverse looks up domains, committing after every batch_size domains
+
+        Each domain is marked resolved in the same transaction as its results,
+        so a run that dies part way through can pick up where it left off.
+        Domains where the servers failed to answer are left unresolved, with
+        nothing stored, for a resumed run to try again. PTRs are written once
+        per batch through a PtrRecordMap. Returns the number of domains resolved.'''
+        ptr_map = PtrRecordMap()
+        ptr_map.load(cursor)
+        resolver = AsyncReverseResolver(cursor, max_in_flight=max_in_flight, ptr_map=ptr_map)
+        resolved = 0
+
+        batch = []
         for domain in domains:
-            if len(domain.records) == 0:
-                self.no_ns_rdata.add(domain)
-
-        for domain in self.no_ns_rdata:
-            domains.remove(domain)
-
-        self.unknown_status_domains = domains
-        return
-
-    def get_reverse_zone_information(self, cursor, domains):
-        '''Returns all reverse zone information for a given domain'''
-        reverse_zones = {}
-        for domain in domains.values():
-            try:
-                print("Resolving " + domain.domain_name + " ...")
-                reverse_zones[domain.domain_name] = domain.reverse_lookup(cursor)
-            except dns.resolver.NoAnswer:
+            batch.append(domain)
+            if len(batch) < batch_size:
                 continue
 
-        return reverse_zones
+            resolved = resolved + self._resolve_batch(resolver, connection, cursor, batch)
+            print("Committed " + str(resolved) + " resolved domains")
+            batch = []
+
+        if len(batch) != 0:
+            resolved = resolved + self._resolve_batch(resolver, connection, cursor, batch)
+            print("Committed " + str(resolved) + " resolved domains")
+
+        return resolved
+
+    def _resolve_batch(self, resolver, connection, cursor, batch):
+        with gtld_instrumentation.phase('resolve'):
+            resolver.resolve(batch)
+
+        if len(resolver.failed) != 0:
+            print(str(len(resolver.failed)) + " domains failed to resolve, resume to retry them")
+
+        with gtld_instrumentation.phase('resolve_commit'):
+            resolver.ptr_map.flush(cursor)
+            resolved = 0
+            for domain in batch:
+                if domain.domain_name in resolver.failed:
+                    continue
+                domain.mark_resolved(cursor)
+                resolved = resolved + 1
+            connection.commit()
+        return resolved
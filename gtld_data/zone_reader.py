@@ -0,0 +1,223 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Streams records out of a master zone file'''
+
+import dns.exception
+import dns.name
+import dns.rdata
+import dns.rdataclass
+import dns.rdatatype
+
+from gtld_data.compression import DecompressedLines, compression_opener
+
+# The only record types we care about when building ZoneData; everything else
+# is skipped without parsing its rdata
+DEFAULT_RRTYPES = frozenset([
+    dns.rdatatype.SOA,
+    dns.rdatatype.NS,
+    dns.rdatatype.A,
+    dns.rdatatype.AAAA,
+])
+
+class ZoneReader(object):
+    '''Reads a zone file line by line, yielding (owner, rrtype, rdata) tuples
+
+    Unlike dns.zone.from_file, nothing is kept beyond the record currently being
+    parsed, so memory use is constant regardless of the size of the zone. Owners
+    are returned as absolute names in text form, rrtype as a dns.rdatatype value
+    and rdata as a dnspython Rdata object. Paths to gzip, bzip2 or xz compressed
+    files are decompressed as they're read.'''
+
+    def __init__(self, zone_file, origin=None, rrtypes=DEFAULT_RRTYPES):
+        self.zone_file = zone_file
+        self.rrtypes = rrtypes
+        self.origin = None
+        self.last_owner = None
+        self.set_origin(origin)
+
+    def set_origin(self, origin):
+        '''Sets the origin used to make relative names absolute'''
+        if origin is None:
+            self.origin = None
+            self._origin_text = None
+            return
+
+        if not isinstance(origin, dns.name.Name):
+            origin = dns.name.from_text(origin)
+        self.origin = origin
+        self._origin_text = origin.to_text()
+
+    def __iter__(self):
+        if isinstance(self.zone_file, str):
+            opener = compression_opener(self.zone_file)
+            if opener is not None:
+                for record in self.read_lines(DecompressedLines(self.zone_file, opener)):
+                    yield record
+                return
+
+            # Lines end on \n alone, as they do for compressed files and chunks
+            with open(self.zone_file, 'r', encoding='utf-8', newline='\n') as f:
+                for record in self.read_lines(f):
+                    yield record
+        else:
+            for record in self.read_lines(self.zone_file):
+                yield record
+
+    def read_lines(self, lines):
+        '''Parses an iterable of zone file lines'''
+        pending = None
+        depth = 0
+
+        for line in lines:
+            line, opened = self._strip_line(line)
+
+            # Records can span multiple lines with parentheses; glue them back together
+            if pending is not None:
+                pending = pending + " " + line
+            else:
+                pending = line
+            depth = depth + opened
+            if depth > 0:
+                continue
+            if depth < 0:
+                raise dns.exception.SyntaxError("unbalanced parentheses in zone file")
+
+            line = pending
+            pending = None
+
+            record = self._parse_line(line)
+            if record is not None:
+                yield record
+
+        if pending is not None and depth != 0:
+            raise dns.exception.SyntaxError("unbalanced parentheses at end of zone file")
+
+    def _strip_line(self, line):
+        '''Removes comments and parentheses, returning the line and the change in nesting'''
+
+        # Fast path for the common case; nothing quoted or escaped
+        if '"' not in line and '\\' not in line:
+            comment = line.find(';')
+            if comment != -1:
+                line = line[:comment]
+            opened = line.count('(') - line.count(')')
+            if opened != 0 or '(' in line:
+                line = line.replace('(', ' ').replace(')', ' ')
+            return line.rstrip(), opened
+
+        stripped = []
+        opened = 0
+        quoted = False
+        escaped = False
+        for char in line:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                quoted = not quoted
+            elif not quoted:
+                if char == ';':
+                    break
+                if char == '(':
+                    opened = opened + 1
+                    char = ' '
+                elif char == ')':
+                    opened = opened - 1
+                    char = ' '
+            stripped.append(char)
+        return "".join(stripped).rstrip(), opened
+
+    def _absolute_name(self, name):
+        '''Converts a name from the zone file to absolute text form'''
+        if name == '@':
+            if self.origin is None:
+                raise dns.exception.SyntaxError("@ used without an origin")
+            return self._origin_text
+
+        if '\\' in name:
+            return dns.name.from_text(name, self.origin).to_text()
+
+        if name.endswith('.'):
+            return name
+
+        if self.origin is None:
+            raise dns.exception.SyntaxError("relative name " + name + " used without an origin")
+
+        if self._origin_text == '.':
+            return name + '.'
+        return name + '.' + self._origin_text
+
+    def _parse_line(self, line):
+        '''Parses a single logical line, returning a record tuple or None'''
+        if len(line) == 0:
+            return None
+
+        tokens = line.split()
+        if len(tokens) == 0:
+            return None
+
+        # Handle control entries
+        if tokens[0][0] == '$':
+            directive = tokens[0].upper()
+            if directive == '$ORIGIN':
+                self.set_origin(dns.name.from_text(tokens[1], self.origin))
+            elif directive == '$TTL':
+                pass # TTLs aren't tracked
+            else:
+                raise dns.exception.SyntaxError(directive + " is not supported when streaming a zone")
+            return None
+
+        # A leading blank means we're continuing the previous owner
+        if line[0] == ' ' or line[0] == '\t':
+            owner = self.last_owner
+            if owner is None:
+                raise dns.exception.SyntaxError("record without an owner name")
+            position = 0
+        else:
+            owner = self._absolute_name(tokens[0])
+            self.last_owner = owner
+            position = 1
+
+        # TTL and class can appear in either order before the type
+        rdclass = dns.rdataclass.IN
+        while position < len(tokens):
+            token = tokens[position]
+            if token[0].isdigit():
+                position = position + 1
+                continue
+            try:
+                rdclass = dns.rdataclass.from_text(token)
+                position = position + 1
+                continue
+            except dns.rdataclass.UnknownRdataclass:
+                break
+
+        if position >= len(tokens):
+            raise dns.exception.SyntaxError("record for " + owner + " has no type")
+
+        rrtype = dns.rdatatype.from_text(tokens[position])
+        if rrtype not in self.rrtypes:
+            return None
+
+        rdata = dns.rdata.from_text(rdclass, rrtype, " ".join(tokens[position+1:]),
+                                    origin=self.origin, relativize=False)
+        return (owner, rrtype, rdata)
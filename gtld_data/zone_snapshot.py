@@ -0,0 +1,348 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Compact on-disk snapshots of zone data that load with mmap'''
+
+import array
+import collections.abc
+import json
+import mmap
+import struct
+import sys
+
+from gtld_data.domain_rdata import DomainRData
+from gtld_data.domain_record import DomainRecord
+from gtld_data.domain_status import DomainStatus
+from gtld_data.nameserver_record import NameserverRecord
+from gtld_data.ptr_record import PtrRecord
+
+SNAPSHOT_MAGIC = b'GTLDSNP1'
+
+# Trailer at the end of the file: offset and length of the JSON directory
+TRAILER = struct.Struct('<QQ')
+
+STATUSES = list(DomainStatus)
+
+class SnapshotWriter(object):
+    '''Writes named sections to a snapshot file, each aligned to 8 bytes'''
+    def __init__(self, f):
+        self.f = f
+        self.sections = {}
+        self.offset = 0
+        self._write(SNAPSHOT_MAGIC)
+
+    def _write(self, data):
+        self.f.write(data)
+        self.offset = self.offset + len(data)
+
+    def add(self, name, data):
+        '''Adds raw bytes (or an array) as a section'''
+        if isinstance(data, array.array):
+            data = data.tobytes()
+        padding = -self.offset % 8
+        self._write(b'\0' * padding)
+        self.sections[name] = [self.offset, len(data)]
+        self._write(data)
+
+    def add_strings(self, name, strings):
+        '''Adds a string table, as utf-8 data and the offset each string starts at'''
+        offsets = array.array('Q', [0])
+        data = bytearray()
+        for string in strings:
+            data.extend(string.encode('utf-8'))
+            offsets.append(len(data))
+        self.add(name + '_offsets', offsets)
+        self.add(name + '_data', bytes(data))
+
+    def add_edges(self, name, adjacency):
+        '''Adds lists of integers as CSR offset and index arrays'''
+        offsets = array.array('Q', [0])
+        index = array.array('I')
+        for targets in adjacency:
+            index.extend(targets)
+            offsets.append(len(index))
+        self.add(name + '_offsets', offsets)
+        self.add(name + '_index', index)
+
+    def finish(self, metadata):
+        metadata = dict(metadata)
+        metadata['byteorder'] = sys.byteorder
+        metadata['sections'] = self.sections
+        directory = json.dumps(metadata).encode('utf-8')
+        directory_offset = self.offset
+        self._write(directory)
+        self._write(TRAILER.pack(directory_offset, len(directory)))
+
+class StringTable(object):
+    '''Read-only view of a string table in a snapshot'''
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+class Edges(object):
+    '''Read-only view of CSR adjacency in a snapshot'''
+    def __init__(self, offsets, index):
+        self.offsets = offsets
+        self.index = index
+
+    def __getitem__(self, i):
+        return self.index[self.offsets[i]:self.offsets[i + 1]]
+
+def write_snapshot(zone_data, path):
+    '''Writes zone data to a snapshot file'''
+    domains = sorted(zone_data.domains.values(), key=lambda d: d.domain_name)
+
+    # Nameservers on a domain but missing from known_nameservers still get an entry
+    nameserver_ids = {}
+    nameservers = []
+    for nameserver in list(zone_data.known_nameservers.values()) + [ns for d in domains for ns in d.nameservers]:
+        if nameserver.nameserver not in nameserver_ids:
+            nameserver_ids[nameserver.nameserver] = len(nameservers)
+            nameservers.append(nameserver)
+
+    ptr_ids = {}
+    ptrs = []
+    rrtype_ids = {}
+    rrtypes = []
+    domain_nameservers = []
+    domain_ptrs = []
+    domain_rdata_types = []
+    rdata_values = []
+    for domain in domains:
+        domain_nameservers.append(sorted(nameserver_ids[ns.nameserver] for ns in domain.nameservers))
+
+        ptr_list = []
+        for ptr in domain.reverse_lookup_ptrs:
+            key = (ptr.ip_address, ptr.reverse_lookup_name)
+            if key not in ptr_ids:
+                ptr_ids[key] = len(ptrs)
+                ptrs.append(ptr)
+            ptr_list.append(ptr_ids[key])
+        domain_ptrs.append(sorted(ptr_list))
+
+        types = []
+        for rrtype, records in sorted(domain.records.items()):
+            if rrtype not in rrtype_ids:
+                rrtype_ids[rrtype] = len(rrtypes)
+                rrtypes.append(rrtype)
+            for record in sorted(records, key=lambda r: r.rdata):
+                types.append(rrtype_ids[rrtype])
+                rdata_values.append(record.rdata)
+        domain_rdata_types.append(types)
+
+    with open(path, 'wb') as f:
+        writer = SnapshotWriter(f)
+        writer.add_strings('domain_names', [d.domain_name for d in domains])
+        writer.add('domain_status', bytes(STATUSES.index(d.status) for d in domains))
+        writer.add_strings('nameserver_names', [ns.nameserver for ns in nameservers])
+        writer.add('nameserver_counts', array.array('Q', [ns.count for ns in nameservers]))
+        writer.add_strings('ptr_ips', [p.ip_address for p in ptrs])
+        writer.add_strings('ptr_names', [p.reverse_lookup_name for p in ptrs])
+        writer.add_strings('rrtypes', rrtypes)
+        writer.add_edges('domain_nameservers', domain_nameservers)
+        writer.add_edges('domain_ptrs', domain_ptrs)
+        writer.add_edges('domain_rdata', domain_rdata_types)
+        writer.add_strings('rdata', rdata_values)
+        writer.finish({
+            'origin': zone_data.origin,
+            'soa': zone_data.soa,
+            'statuses': [status.value for status in STATUSES],
+        })
+
+class ZoneSnapshot(object):
+    '''A snapshot file opened with mmap
+
+    Nothing is decoded until it is asked for: domains are found by binary
+    search over the sorted name table, and DomainRecords are only built
+    (once each) when looked up.'''
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        if self._view[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            self.close()
+            raise ValueError(path + " is not a zone snapshot")
+
+        directory_offset, directory_length = TRAILER.unpack_from(self._mmap, len(self._mmap) - TRAILER.size)
+        self.metadata = json.loads(str(self._view[directory_offset:directory_offset + directory_length], 'utf-8'))
+        if self.metadata['byteorder'] != sys.byteorder:
+            self.close()
+            raise ValueError(path + " was written on a " + self.metadata['byteorder'] + " endian machine")
+        self._sections = self.metadata['sections']
+        self.statuses = [DomainStatus(value) for value in self.metadata['statuses']]
+
+        self.domain_names = self._strings('domain_names')
+        self.domain_status = self._section('domain_status')
+        self.nameserver_names = self._strings('nameserver_names')
+        self.nameserver_counts = self._section('nameserver_counts', 'Q')
+        self.ptr_ips = self._strings('ptr_ips')
+        self.ptr_names = self._strings('ptr_names')
+        self.rrtypes = self._strings('rrtypes')
+        self.domain_nameservers = self._edges('domain_nameservers')
+        self.domain_ptrs = self._edges('domain_ptrs')
+        self.domain_rdata = self._edges('domain_rdata')
+        self.rdata = self._strings('rdata')
+
+        self._nameservers = [None] * len(self.nameserver_names)
+        self._ptrs = [None] * len(self.ptr_names)
+
+    def _section(self, name, format=None):
+        offset, length = self._sections[name]
+        view = self._view[offset:offset + length]
+        if format is not None:
+            view = view.cast(format)
+        return view
+
+    def _strings(self, name):
+        return StringTable(self._section(name + '_offsets', 'Q'), self._section(name + '_data'))
+
+    def _edges(self, name):
+        return Edges(self._section(name + '_offsets', 'Q'), self._section(name + '_index', 'I'))
+
+    def close(self):
+        # Views into the map have to go before it can be closed
+        self.domain_names = self.nameserver_names = self.ptr_ips = self.ptr_names = None
+        self.rrtypes = self.domain_nameservers = self.domain_ptrs = self.domain_rdata = self.rdata = None
+        self.domain_status = self.nameserver_counts = None
+        self._sections = {}
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    @property
+    def origin(self):
+        return self.metadata['origin']
+
+    @property
+    def soa(self):
+        return self.metadata['soa']
+
+    def find_domain(self, name):
+        '''Returns the index of a domain name, or None'''
+        low = 0
+        high = len(self.domain_names)
+        while low < high:
+            middle = (low + high) // 2
+            if self.domain_names[middle] < name:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < len(self.domain_names) and self.domain_names[low] == name:
+            return low
+        return None
+
+    def nameserver(self, i):
+        '''Returns the shared NameserverRecord for a nameserver index'''
+        nameserver_obj = self._nameservers[i]
+        if nameserver_obj is None:
+            nameserver_obj = NameserverRecord(self.nameserver_names[i])
+            nameserver_obj.count = self.nameserver_counts[i]
+            self._nameservers[i] = nameserver_obj
+        return nameserver_obj
+
+    def ptr(self, i):
+        '''Returns the shared PtrRecord for a PTR index'''
+        ptr_obj = self._ptrs[i]
+        if ptr_obj is None:
+            ptr_obj = PtrRecord(self.ptr_ips[i], self.ptr_names[i])
+            self._ptrs[i] = ptr_obj
+        return ptr_obj
+
+    def build_domain(self, i):
+        '''Builds the DomainRecord for a domain index'''
+        domain_obj = DomainRecord(self.domain_names[i])
+        domain_obj.status = self.statuses[self.domain_status[i]]
+        for j in self.domain_nameservers[i]:
+            domain_obj.nameservers.add(self.nameserver(j))
+        for j in self.domain_ptrs[i]:
+            domain_obj.reverse_lookup_ptrs.add(self.ptr(j))
+
+        rdata_start = self.domain_rdata.offsets[i]
+        for k, rrtype_id in enumerate(self.domain_rdata[i]):
+            rdata_obj = DomainRData()
+            rdata_obj.rrtype = self.rrtypes[rrtype_id]
+            rdata_obj.rdata = self.rdata[rdata_start + k]
+            domain_obj.add_record(None, rdata_obj)
+        return domain_obj
+
+    def known_nameservers(self):
+        '''Returns a dict of name to NameserverRecord for every nameserver'''
+        nameservers = {}
+        for i in range(len(self.nameserver_names)):
+            nameserver_obj = self.nameserver(i)
+            nameservers[nameserver_obj.nameserver] = nameserver_obj
+        return nameservers
+
+class SnapshotDomainValues(collections.abc.ValuesView):
+    def __iter__(self):
+        for i in range(len(self._mapping)):
+            yield self._mapping.domain(i)
+
+class SnapshotDomainItems(collections.abc.ItemsView):
+    def __iter__(self):
+        for i in range(len(self._mapping)):
+            domain_obj = self._mapping.domain(i)
+            yield (domain_obj.domain_name, domain_obj)
+
+class SnapshotDomains(collections.abc.Mapping):
+    '''Domain name to DomainRecord mapping backed by a snapshot
+
+    Records are built the first time they're looked up and kept, so the
+    same name always gives back the same object.'''
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._domains = {}
+
+    def __len__(self):
+        return len(self.snapshot.domain_names)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.snapshot.domain_names[i]
+
+    def __getitem__(self, name):
+        i = self.snapshot.find_domain(name)
+        if i is None:
+            raise KeyError(name)
+        return self.domain(i)
+
+    def domain(self, i):
+        domain_obj = self._domains.get(i, None)
+        if domain_obj is None:
+            domain_obj = self.snapshot.build_domain(i)
+            self._domains[i] = domain_obj
+        return domain_obj
+
+    def values(self):
+        return SnapshotDomainValues(self)
+
+    def items(self):
+        return SnapshotDomainItems(self)
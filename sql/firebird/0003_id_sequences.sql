@@ -0,0 +1,7 @@
+-- Sequences the loaders reserve blocks of primary keys from, so ids can be
+-- assigned client side instead of waiting on RETURNING for every row
+CREATE SEQUENCE zone_files_id_seq;
+CREATE SEQUENCE domains_id_seq;
+CREATE SEQUENCE nameservers_id_seq;
+CREATE SEQUENCE ptr_records_id_seq;
+CREATE SEQUENCE domain_rdata_id_seq;
@@ -0,0 +1,9 @@
+-- The sequences from 0003 have to be committed before anything can use them,
+-- so starting them past the ids a database upgraded in place already holds
+-- is done here. ALTER SEQUENCE only takes a literal, but stepping each one on
+-- by however far it is behind the largest id does the same
+SELECT GEN_ID(zone_files_id_seq, MAXVALUE((SELECT COALESCE(MAX(id), 0) FROM zone_files) - GEN_ID(zone_files_id_seq, 0), 0)) FROM RDB$DATABASE;
+SELECT GEN_ID(domains_id_seq, MAXVALUE((SELECT COALESCE(MAX(id), 0) FROM domains) - GEN_ID(domains_id_seq, 0), 0)) FROM RDB$DATABASE;
+SELECT GEN_ID(nameservers_id_seq, MAXVALUE((SELECT COALESCE(MAX(id), 0) FROM nameservers) - GEN_ID(nameservers_id_seq, 0), 0)) FROM RDB$DATABASE;
+SELECT GEN_ID(ptr_records_id_seq, MAXVALUE((SELECT COALESCE(MAX(id), 0) FROM ptr_records) - GEN_ID(ptr_records_id_seq, 0), 0)) FROM RDB$DATABASE;
+SELECT GEN_ID(domain_rdata_id_seq, MAXVALUE((SELECT COALESCE(MAX(id), 0) FROM domain_rdata) - GEN_ID(domain_rdata_id_seq, 0), 0)) FROM RDB$DATABASE;
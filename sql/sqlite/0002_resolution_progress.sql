@@ -0,0 +1,2 @@
+-- Track which domains have been through reverse lookups, so interrupted runs can resume
+ALTER TABLE domains ADD COLUMN resolved smallint DEFAULT 0 NOT NULL
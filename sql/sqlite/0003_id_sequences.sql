@@ -0,0 +1,2 @@
+-- SQLite has no sequences, the backend counts ids up from the largest in each
+-- table instead. This keeps the version numbers in step with Firebird
@@ -0,0 +1,10 @@
+-- Indexes for the loaders, resumed runs and the reports in usefu_queries.sql
+-- Unlike Firebird, SQLite doesn't index foreign keys by itself, so the
+-- zone_file_id lookups need their own too
+CREATE INDEX domains_zone_resolved ON domains (zone_file_id, resolved);
+CREATE INDEX domain_ns_by_nameserver ON domain_nameservers (nameserver_id, domain_id);
+CREATE INDEX domain_ptrs_by_ptr ON domain_ptr_records (ptr_record_id, domain_id);
+CREATE INDEX domain_rdata_domain_rrtype ON domain_rdata (domain_id, rrtype);
+CREATE INDEX ptr_records_name ON ptr_records (reverse_lookup_name);
+CREATE INDEX ptr_records_zone ON ptr_records (zone_file_id);
+CREATE INDEX nameservers_zone ON nameservers (zone_file_id)
@@ -0,0 +1,2 @@
+-- Firebird starts its id sequences past existing rows here. SQLite counts
+-- up from the largest id already, so there's nothing to do
@@ -25,8 +25,12 @@ import tempfile
 import gtld_data
 from gtld_data import  gtld_db, gtld_lookup_config
 
+# Tests run against SQLite unless told otherwise, so they don't need a Firebird server
+TEST_BACKEND = os.environ.get('GTLD_TEST_BACKEND', 'sqlite')
+
 class DatabaseUnitTest(unittest.TestCase):
     def setUp(self):
+        gtld_lookup_config.database_backend = TEST_BACKEND
         self.db_filename = None
         file_descriptor, self.db_filename = tempfile.mkstemp()
         os.close(file_descriptor) # Don't need to write anything to it
@@ -40,6 +44,11 @@ class DatabaseUnitTest(unittest.TestCase):
         gtld_db.database_connection.close()
         os.remove(self.db_filename)
 
+        # SQLite's write-ahead log can outlive the connection
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(self.db_filename + suffix):
+                os.remove(self.db_filename + suffix)
+
     def create_zone_data(self, cursor):
         zd = gtld_data.ZoneData()
         zd.soa = "1"
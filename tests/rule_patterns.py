@@ -0,0 +1,63 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+'''Rule lists and nameserver names for exercising RuleMatcher, shared with its benchmark'''
+
+import random
+
+PATTERN_FILES = [
+    'data/parking_nameservers.txt',
+    'data/blocking_nameservers.txt',
+    'data/other_inactive_nameservers.txt',
+    'data/reverse_parking_ptrs.txt',
+    'data/reverse_expired_ptrs.txt',
+]
+
+def load_patterns(providers):
+    '''Loads the shipped lists, padded out with synthetic parking providers'''
+    patterns = []
+    for file_name in PATTERN_FILES:
+        with open(file_name, 'r') as f:
+            for line in f:
+                if len(line.rstrip()) == 0 or line[0] == "#":
+                    continue
+                patterns.append(line.rstrip())
+
+    for i in range(providers):
+        patterns.append("\\.parking" + str(i) + "\\.example\\.$")
+        if i % 10 == 0:
+            patterns.append("park(.*)" + str(i) + "\\.example\\.net\\.$")
+    return patterns
+
+def generate_names(count, providers):
+    '''Generates a deterministic mix of parked and unrelated nameserver names'''
+    rng = random.Random(1)
+    names = []
+    for i in range(count):
+        choice = rng.random()
+        if choice < 0.2:
+            names.append("ns" + str(i % 4) + ".parking" + str(rng.randrange(providers * 2)) + ".example.")
+        elif choice < 0.3:
+            names.append("ns1.sedoparking.com.")
+        elif choice < 0.35:
+            names.append("parking" + str(i % 7) + ".nic.ru.")
+        else:
+            names.append("ns" + str(i % 3) + ".host" + str(i) + ".com.")
+    return names
@@ -0,0 +1,113 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import socket
+import threading
+import unittest
+
+import dns.flags
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+
+from gtld_data import gtld_lookup_config, gtld_resolver_cache
+
+class StubDnsServer(object):
+    '''A tiny authoritative UDP server on 127.0.0.1 for resolver tests
+
+    records maps (name, rrtype text) to a list of rdata strings. Names with
+    no records at all get NXDOMAIN, other types on known names get NoAnswer.
+    Queries for names in dropped are never answered.'''
+
+    def __init__(self, records, ttl=300):
+        self.records = records
+        self.ttl = ttl
+        self.queries = []
+        self.known_names = set(name for name, _ in records)
+        self.dropped = set()
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("127.0.0.1", 0))
+        self.port = self.socket.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.socket.close()
+
+    def _serve(self):
+        while True:
+            try:
+                wire, address = self.socket.recvfrom(65535)
+            except OSError:
+                return # Socket closed
+
+            query = dns.message.from_wire(wire)
+            question = query.question[0]
+            name = question.name.to_text()
+            rrtype = dns.rdatatype.to_text(question.rdtype)
+            self.queries.append((name, rrtype))
+            if name in self.dropped:
+                continue
+
+            response = dns.message.make_response(query)
+            response.flags |= dns.flags.AA
+            rdatas = self.records.get((name, rrtype), None)
+            if rdatas is not None:
+                response.answer.append(
+                    dns.rrset.from_text_list(question.name, self.ttl, "IN", rrtype, rdatas)
+                )
+            elif name not in self.known_names:
+                response.set_rcode(dns.rcode.NXDOMAIN)
+
+            self.socket.sendto(response.to_wire(), address)
+
+STUB_RECORDS = {
+    ("one.example.", "A"): ["192.0.2.1", "192.0.2.2"],
+    ("one.example.", "AAAA"): ["2001:db8::1"],
+    ("two.example.", "A"): ["192.0.2.1"],
+    ("1.2.0.192.in-addr.arpa.", "PTR"): ["parking.example."],
+    ("2.2.0.192.in-addr.arpa.", "PTR"): ["host2.example."],
+    ("1.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.8.b.d.0.1.0.0.2.ip6.arpa.", "PTR"): ["host6.example."],
+    ("nordata.example.", "NS"): ["ns1.example."],
+}
+
+class StubDnsTestCase(unittest.TestCase):
+    '''Points the resolver config at a stub DNS server for the test'''
+    def setUp(self):
+        self.stub_server = StubDnsServer(STUB_RECORDS)
+        self.stub_server.start()
+
+        self.old_resolvers = gtld_lookup_config.upstream_resolvers
+        self.old_port = gtld_lookup_config.upstream_port
+        gtld_lookup_config.upstream_resolvers = ["127.0.0.1"]
+        gtld_lookup_config.upstream_port = self.stub_server.port
+        gtld_resolver_cache.clear()
+
+    def tearDown(self):
+        gtld_lookup_config.upstream_resolvers = self.old_resolvers
+        gtld_lookup_config.upstream_port = self.old_port
+        self.stub_server.stop()
+        gtld_resolver_cache.clear()
@@ -0,0 +1,120 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import unittest
+
+import gtld_data
+from gtld_data.async_resolver import AsyncReverseResolver
+
+from tests.stub_dns_server import StubDnsTestCase
+
+class TestAsyncResolver(StubDnsTestCase):
+    def make_domains(self):
+        domains = {}
+        for name in ["one.example.", "two.example.", "nordata.example.", "missing.example."]:
+            domains[name] = gtld_data.DomainRecord(name)
+        return domains
+
+    def test_reverse_lookup(self):
+        '''Tests concurrent lookups fill in records and PTRs'''
+        domains = self.make_domains()
+        resolver = AsyncReverseResolver(None, max_in_flight=2)
+        reverse_zones = resolver.resolve(domains.values())
+
+        self.assertEqual(len(reverse_zones), 4)
+        one = domains["one.example."]
+        self.assertEqual(set(r.rdata for r in one.records["A"]), set(["192.0.2.1", "192.0.2.2"]))
+        self.assertEqual(set(r.rdata for r in one.records["AAAA"]), set(["2001:db8::1"]))
+        self.assertEqual(set(p.reverse_lookup_name for p in one.reverse_lookup_ptrs),
+                         set(["parking.example.", "host2.example.", "host6.example."]))
+
+        # NoAnswer and NXDOMAIN leave empty record sets behind
+        self.assertEqual(len(domains["nordata.example."].records["A"]), 0)
+        self.assertEqual(len(domains["missing.example."].records["AAAA"]), 0)
+        self.assertEqual(len(reverse_zones["missing.example."]), 0)
+
+    def test_matches_blocking_lookup(self):
+        '''Tests the async engine gives the same answers as DomainRecord.reverse_lookup'''
+        async_domains = self.make_domains()
+        AsyncReverseResolver(None).resolve(async_domains.values())
+
+        for name, domain in self.make_domains().items():
+            ptrs = domain.reverse_lookup(None)
+            self.assertEqual(set(ptrs), async_domains[name].reverse_lookup_ptrs)
+            self.assertEqual(domain.records.keys(), async_domains[name].records.keys())
+            for record_type in domain.records:
+                self.assertEqual(domain.records[record_type], async_domains[name].records[record_type])
+
+    def test_shared_ptrs_queried_once(self):
+        '''Tests domains sharing an address only cause one PTR query'''
+        domains = self.make_domains()
+        AsyncReverseResolver(None).resolve(domains.values())
+
+        ptr_queries = [q for q in self.stub_server.queries if q == ("1.2.0.192.in-addr.arpa.", "PTR")]
+        self.assertEqual(len(ptr_queries), 1)
+        self.assertEqual(len(domains["two.example."].reverse_lookup_ptrs), 1)
+
+    def test_timeout(self):
+        '''Tests a query that's never answered fails that name alone, and isn't cached'''
+        self.stub_server.dropped.add("one.example.")
+        domains = self.make_domains()
+        resolver = AsyncReverseResolver(None)
+        resolver.resolver.lifetime = 0.5
+        gtld_data.gtld_instrumentation.reset()
+        reverse_zones = resolver.resolve(domains.values())
+
+        self.assertEqual(len(reverse_zones), 3)
+        self.assertEqual(resolver.failed, set(["one.example."]))
+        self.assertEqual(domains["one.example."].records, {})
+        self.assertEqual(len(domains["two.example."].reverse_lookup_ptrs), 1)
+        self.assertIsNone(gtld_data.gtld_resolver_cache.get("one.example.", "A"))
+        self.assertEqual(gtld_data.gtld_instrumentation.dns_failures, {"A": 1, "AAAA": 1})
+
+    def test_failure_is_not_empty(self):
+        '''Tests a failed lookup can be told apart from a name with no records'''
+        self.stub_server.dropped.add("one.example.")
+        resolver = AsyncReverseResolver(None)
+        resolver.resolver.lifetime = 0.5
+        missing = gtld_data.DomainRecord("missing.example.")
+        dropped = gtld_data.DomainRecord("one.example.")
+
+        async def lookups():
+            resolver._semaphore = asyncio.Semaphore(1)
+            return (await resolver.get_records(missing, "A"), await resolver.get_records(dropped, "A"))
+        missing_records, dropped_records = asyncio.run(lookups())
+
+        self.assertEqual(missing_records, set())
+        self.assertIsNone(dropped_records)
+        self.assertNotIn("A", dropped.records)
+
+        # The blocking lookups say the same
+        self.assertEqual(gtld_data.DomainRecord("missing.example.").get_records(None, "AAAA"), set())
+        self.assertIsNone(gtld_data.DomainRecord("one.example.").reverse_lookup(None))
+
+    def test_queries_counted(self):
+        '''Tests the queries sent upstream are counted by rrtype'''
+        gtld_data.gtld_instrumentation.reset()
+        AsyncReverseResolver(None).resolve(self.make_domains().values())
+
+        sent = {}
+        for _, rrtype in self.stub_server.queries:
+            sent[rrtype] = sent.get(rrtype, 0) + 1
+        self.assertEqual(gtld_data.gtld_instrumentation.dns_queries, sent)
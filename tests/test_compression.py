@@ -0,0 +1,102 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import unittest
+
+import gtld_data
+from gtld_data.compression import DecompressedLines, compression_opener
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open('tests/data/db.internic', 'rb') as f:
+            self.data = f.read()
+
+        self.compressed = {}
+        for opener, suffix in ((gzip.open, '.gz'), (bz2.open, '.bz2'), (lzma.open, '.xz')):
+            # No telling suffix, so it's the contents that give it away
+            path = os.path.join(self.directory, 'internic' + suffix + '.zone')
+            with opener(path, 'wb') as f:
+                f.write(self.data)
+            self.compressed[opener] = path
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_detection(self):
+        '''Tests each compression is recognised from its magic bytes'''
+        for opener, path in self.compressed.items():
+            self.assertIs(compression_opener(path), opener)
+        self.assertIsNone(compression_opener('tests/data/db.internic'))
+
+    def test_lines(self):
+        '''Tests lines come out whole even when they cross blocks'''
+        expected = self.data.decode('utf-8').splitlines(True)
+        for opener, path in self.compressed.items():
+            self.assertEqual(list(DecompressedLines(path, opener, block_size=7, queue_size=2)), expected)
+
+    def test_line_endings(self):
+        '''Tests lines only end on \n, the same as reading the plain file'''
+        data = "a IN NS ns1.a.\r\n; form\x0cfeed and next\x85line\nb IN NS ns1.b.\n".encode('utf-8')
+        path = os.path.join(self.directory, 'endings.zone')
+        with open(path, 'wb') as f:
+            f.write(data)
+        with open(path, 'r', encoding='utf-8', newline='\n') as f:
+            expected = list(f)
+        self.assertEqual(len(expected), 3)
+
+        with gzip.open(path + '.gz', 'wb') as f:
+            f.write(data)
+        self.assertEqual(list(DecompressedLines(path + '.gz', gzip.open, block_size=7)), expected)
+
+    def test_stop_early(self):
+        '''Tests giving up part way through doesn't leave the reader thread stuck'''
+        lines = DecompressedLines(self.compressed[gzip.open], gzip.open, block_size=7, queue_size=1)
+        for line in lines:
+            break
+
+    def test_truncated(self):
+        '''Tests a damaged file raises rather than ending quietly'''
+        path = self.compressed[gzip.open]
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(data[:len(data) // 2])
+
+        with self.assertRaises(EOFError):
+            list(DecompressedLines(path, gzip.open))
+
+    def test_load_zone(self):
+        '''Tests a compressed zone loads the same as the plain one'''
+        expected = gtld_data.ZoneData.load_from_file(None, 'tests/data/db.internic', origin='internic')
+        for path in self.compressed.values():
+            for workers in (None, 2):
+                zone_data = gtld_data.ZoneData.load_from_file(None, path, origin='internic', workers=workers)
+                self.assertEqual(list(zone_data.domains.keys()), list(expected.domains.keys()))
+                self.assertEqual(zone_data.soa, expected.soa)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import unittest
+
+import gtld_data
+
+from gtld_data import gtld_db, gtld_lookup_config
+from gtld_data.backends import BACKENDS
+from gtld_data.db import migration_files
+
+from tests.database_unit_test import DatabaseUnitTest
+
+class TestMigrationFiles(unittest.TestCase):
+    def test_versions(self):
+        '''Tests every backend has the same migrations, in order with no gaps'''
+        all_versions = []
+        for backend_class in BACKENDS.values():
+            migrations = migration_files(backend_class.schema_dir)
+            versions = [version for version, _ in migrations]
+            self.assertEqual(versions, list(range(1, len(versions) + 1)))
+            all_versions.append(versions)
+
+        for versions in all_versions:
+            self.assertEqual(versions, all_versions[0])
+
+class TestDatabase(DatabaseUnitTest):
+    def test_schema_version(self):
+        '''Tests a new database has every migration applied'''
+        latest_version = gtld_db.migrations()[-1][0]
+        self.assertEqual(gtld_db.schema_version(), latest_version)
+        self.assertEqual(gtld_db.upgrade(), [])
+
+    def test_upgrade_in_place(self):
+        '''Tests an older database is brought up to date on connect'''
+        gtld_db.database_connection.close()
+        os.remove(self.db_filename)
+        gtld_db.create_database(target_version=3)
+        self.assertEqual(gtld_db.schema_version(), 3)
+        gtld_db.database_connection.close()
+
+        gtld_db.connect()
+        latest_version = gtld_db.migrations()[-1][0]
+        self.assertEqual(gtld_db.schema_version(), latest_version)
+
+        cursor = gtld_db.database_connection.cursor()
+        self.assertIn('domains_zone_resolved', gtld_db.backend.index_names(cursor))
+
+    def test_upgrade_populated(self):
+        '''Tests ids handed out after an upgrade don't collide with rows already there'''
+        gtld_db.database_connection.close()
+        os.remove(self.db_filename)
+        gtld_db.create_database(target_version=1)
+
+        # Rows as the loaders wrote them before ids were reserved, numbered by the database
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+        cursor.execute("""INSERT INTO zone_files (origin, soa) VALUES ('example', 1)""")
+        cursor.execute("""SELECT MAX(id) FROM zone_files""")
+        zd_id = int(cursor.fetchone()[0])
+        for name in ["test1.example.", "test2.example."]:
+            cursor.execute("""INSERT INTO domains (zone_file_id, domain_name, status) VALUES (?, ?, 'UNKNOWN')""",
+                           [zd_id, name])
+        cursor.execute("""SELECT MAX(id) FROM domains""")
+        last_domain_id = int(cursor.fetchone()[0])
+        gtld_db.database_connection.commit()
+        gtld_db.database_connection.close()
+
+        gtld_db.connect()
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+        self.assertGreater(self.create_zone_data(cursor), zd_id)
+        self.assertGreater(self.create_domain_record(cursor, zd_id, "test3.example."), last_domain_id)
+        gtld_db.database_connection.commit()
+
+    def test_id_blocks(self):
+        '''Tests ids come out of reserved blocks without repeating'''
+        old_block_size = gtld_lookup_config.id_block_size
+        gtld_lookup_config.id_block_size = 3
+        try:
+            gtld_db._id_allocators = {}
+            ids = [gtld_db.next_id('domains') for _ in range(7)]
+        finally:
+            gtld_lookup_config.id_block_size = old_block_size
+
+        self.assertEqual(ids, list(range(ids[0], ids[0] + 7)))
+
+        # Anyone else reserving gets a block past ours
+        self.assertGreater(gtld_db.backend.reserve_ids(gtld_db.database_connection, 'domains', 1), ids[-1])
+
+    def test_bulk_load(self):
+        '''Tests indexes come back after a bulk load, whether it worked or not'''
+        cursor = gtld_db.database_connection.cursor()
+        index_names = sorted(gtld_db.backend.index_names(cursor))
+        gtld_db.database_connection.commit()
+
+        with gtld_db.bulk_load():
+            cursor = gtld_db.database_connection.cursor()
+            zone_data = gtld_data.ZoneData.load_from_file(cursor, 'tests/data/db.internic', origin='internic')
+
+        cursor = gtld_db.database_connection.cursor()
+        self.assertEqual(sorted(gtld_db.backend.index_names(cursor)), index_names)
+        self.assertEqual(gtld_data.ZoneData.latest_db_id(cursor), zone_data.db_id)
+        gtld_db.database_connection.commit()
+
+        # A load that fails part way is rolled back
+        with self.assertRaises(ValueError):
+            with gtld_db.bulk_load():
+                cursor = gtld_db.database_connection.cursor()
+                self.create_zone_data(cursor)
+                raise ValueError("load failed")
+
+        cursor = gtld_db.database_connection.cursor()
+        self.assertEqual(sorted(gtld_db.backend.index_names(cursor)), index_names)
+        self.assertEqual(gtld_data.ZoneData.latest_db_id(cursor), zone_data.db_id)
@@ -51,3 +51,23 @@ class TestDomainRData(DatabaseUnitTest):
         rdata2 = gtld_data.DomainRData.from_db(cursor, rdata.db_id)
         self.assertEqual(rdata.rrtype, rdata2.rrtype)
         self.assertEqual(rdata.rdata, rdata2.rdata)
+
+    def test_equality(self):
+        '''Tests rdata compares on its type and value, not just the hash'''
+        rdata = gtld_data.DomainRData()
+        rdata.rrtype = "A"
+        rdata.rdata = "192.168.1.1"
+
+        rdata2 = gtld_data.DomainRData()
+        rdata2.rrtype = "A"
+        rdata2.rdata = "192.168.1.1"
+        self.assertEqual(rdata, rdata2)
+        self.assertEqual(hash(rdata), hash(rdata2))
+
+        # The old hash ran type and value together, so these two collided
+        rdata.rrtype = "AA"
+        rdata.rdata = "AA"
+        rdata2.rrtype = "AAA"
+        rdata2.rdata = "A"
+        self.assertNotEqual(rdata, rdata2)
+        self.assertEqual(len(set([rdata, rdata2])), 2)
@@ -25,6 +25,7 @@ import dns.rdatatype
 from gtld_data import  gtld_db, gtld_lookup_config
 from gtld_data.domain_record import DomainRecord
 from gtld_data.domain_rdata import DomainRData
+from gtld_data.identity_map import IdentityMap
 
 from tests.database_unit_test import DatabaseUnitTest
 
@@ -110,6 +111,71 @@ class TestDomainRecord(DatabaseUnitTest):
         self.assertEqual(len(domain.records['A']), 2)
         self.assertEqual(len(domain.records['AAAA']), 1)
 
+    def test_bulk_write_database(self):
+        '''Test writing many domains at once fills in their ids'''
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+        zd_id = self.create_zone_data(cursor)
+        nameserver = self.create_nameserver_record(cursor, zd_id, "ns1.example.")
+
+        domains = []
+        for name in ["test1.example.", "test2.example."]:
+            domain = DomainRecord(name)
+            domain.nameservers.add(nameserver)
+            rdata = DomainRData()
+            rdata.rrtype = "A"
+            rdata.rdata = "192.168.1.1"
+            domain.add_record(cursor, rdata)
+            domains.append(domain)
+
+        DomainRecord.bulk_to_db(cursor, zd_id, domains)
+
+        for domain in domains:
+            self.assertIsNotNone(domain.db_id)
+            self.assertIsNotNone(list(domain.records['A'])[0].db_id)
+
+            domain2 = DomainRecord.from_db(cursor, domain.db_id)
+            self.assertEqual(domain.domain_name, domain2.domain_name)
+            self.assertEqual(len(domain2.nameservers), 1)
+            self.assertEqual(len(domain2.records['A']), 1)
+
+    def test_shared_nameservers(self):
+        '''Test domains read in one session share nameserver objects'''
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+        zd_id = self.create_zone_data(cursor)
+        nameserver = self.create_nameserver_record(cursor, zd_id, "ns1.example.")
+
+        domain_ids = []
+        for name in ["test1.example.", "test2.example."]:
+            domain = DomainRecord(name)
+            domain._zonefile_id = zd_id
+            domain.nameservers.add(nameserver)
+            domain.to_db(cursor)
+            domain_ids.append(domain.db_id)
+
+        identity_map = IdentityMap()
+        domain1 = DomainRecord.from_db(cursor, domain_ids[0], identity_map=identity_map)
+        domain2 = DomainRecord.from_db(cursor, domain_ids[1], identity_map=identity_map)
+        self.assertIs(list(domain1.nameservers)[0], list(domain2.nameservers)[0])
+
+    def test_resolution_progress(self):
+        '''Test tracking which domains have been reverse looked up'''
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+        zd_id = self.create_zone_data(cursor)
+
+        domain_ids = []
+        for name in ["test1.example.", "test2.example.", "test3.example."]:
+            domain_ids.append(self.create_domain_record(cursor, zd_id, name))
+        self.assertEqual(DomainRecord.count_resolved(cursor, zd_id), (0, 3))
+
+        DomainRecord.from_db(cursor, domain_ids[0]).mark_resolved(cursor)
+        self.assertEqual(DomainRecord.count_resolved(cursor, zd_id), (1, 3))
+
+        unresolved = DomainRecord.read_unresolved_from_db(cursor, zd_id)
+        self.assertEqual(set(d.db_id for d in unresolved), set(domain_ids[1:]))
+
     #def test_nxdomain_reverse_lookup(self):
     #    '''Test failure to reverse look up zone'''
     #    domain_record = DomainRecord("alexandria.casadevall.pro")
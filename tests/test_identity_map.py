@@ -0,0 +1,74 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import unittest
+
+from gtld_data.identity_map import IdentityMap
+from gtld_data.nameserver_record import NameserverRecord
+from gtld_data.ptr_record import PtrRecord
+
+class CountingNameserverRecord(NameserverRecord):
+    '''Stands in for a database read'''
+    loads = 0
+
+    @classmethod
+    def from_db(cls, cursor, db_id):
+        cls.loads = cls.loads + 1
+        nameserver_obj = cls("ns" + str(db_id) + ".example.")
+        nameserver_obj.db_id = db_id
+        return nameserver_obj
+
+class TestIdentityMap(unittest.TestCase):
+    def test_add(self):
+        '''Tests the first object registered for a row wins'''
+        identity_map = IdentityMap()
+        nameserver_obj = NameserverRecord("ns1.example.")
+        nameserver_obj.db_id = 1
+        self.assertIs(identity_map.add(nameserver_obj), nameserver_obj)
+
+        duplicate = NameserverRecord("ns1.example.")
+        duplicate.db_id = 1
+        self.assertIs(identity_map.add(duplicate), nameserver_obj)
+        self.assertIs(identity_map.get(NameserverRecord, 1), nameserver_obj)
+        self.assertEqual(len(identity_map), 1)
+
+    def test_classes_kept_apart(self):
+        '''Tests rows of different tables with the same id don't collide'''
+        identity_map = IdentityMap()
+        nameserver_obj = NameserverRecord("ns1.example.")
+        nameserver_obj.db_id = 1
+        ptr_obj = PtrRecord("192.0.2.1", "ptr.example.")
+        ptr_obj.db_id = 1
+
+        identity_map.add(nameserver_obj)
+        self.assertIs(identity_map.add(ptr_obj), ptr_obj)
+        self.assertIsNone(identity_map.get(PtrRecord, 2))
+
+    def test_get_or_load(self):
+        '''Tests each row is only read once'''
+        identity_map = IdentityMap()
+        CountingNameserverRecord.loads = 0
+        first = identity_map.get_or_load(CountingNameserverRecord, None, 5)
+        second = identity_map.get_or_load(CountingNameserverRecord, None, 5)
+        self.assertIs(first, second)
+        self.assertEqual(CountingNameserverRecord.loads, 1)
+
+if __name__ == '__main__':
+    unittest.main()
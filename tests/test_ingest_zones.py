@@ -0,0 +1,130 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import gtld_data
+from gtld_data.tools import ingest_zones
+
+from tests.database_unit_test import TEST_BACKEND
+
+SETTINGS = {
+    'backend': TEST_BACKEND,
+    'resolve': False,
+    'batch_size': 1000,
+    'max_in_flight': None,
+    'parking_nameservers': 'data/parking_nameservers.txt',
+    'blocking_nameservers': 'data/blocking_nameservers.txt',
+    'reverse_parking_ptrs': 'data/reverse_parking_ptrs.txt',
+    'reverse_expired_ptrs': 'data/reverse_expired_ptrs.txt',
+    'other_inactive_nameservers': 'data/other_inactive_nameservers.txt',
+    'stats': False,
+}
+
+class TestIngestZones(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.zone_dir = os.path.join(self.directory, 'zones')
+        os.mkdir(self.zone_dir)
+
+        # The test zone leaves its origin to whoever loads it, these set their own
+        with open('tests/data/db.internic', 'r') as f:
+            self.zone_text = "$ORIGIN internic.\n" + f.read()
+        self.write_zone_file('internic.zone')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        gtld_data.gtld_lookup_config.database_backend = 'firebird'
+
+    def write_zone_file(self, file_name):
+        zone_file = os.path.join(self.zone_dir, file_name)
+        with open(zone_file, 'w') as f:
+            f.write(self.zone_text)
+        return zone_file
+
+    def test_find_zone_files(self):
+        '''Tests directories are expanded and zones are named after their files'''
+        zone_files = ingest_zones.find_zone_files([self.zone_dir, 'tests/data/db.internic'])
+        self.assertEqual(zone_files, [os.path.join(self.zone_dir, 'internic.zone'), 'tests/data/db.internic'])
+        self.assertEqual(ingest_zones.zone_name(zone_files[0]), 'internic')
+
+    def test_zone_name(self):
+        '''Tests only the known suffixes come off a zone file's name'''
+        self.assertEqual(ingest_zones.zone_name('zones/co.uk.zone'), 'co.uk')
+        self.assertEqual(ingest_zones.zone_name('zones/com.zone.gz'), 'com')
+        self.assertEqual(ingest_zones.zone_name('zones/com.txt.xz'), 'com')
+        self.assertEqual(ingest_zones.zone_name('zones/xyz.2024-01-01.zone'), 'xyz.2024-01-01')
+        self.assertEqual(ingest_zones.zone_name('zones/xyz'), 'xyz')
+
+    def test_ingest_zones(self):
+        '''Tests each zone lands in its own database, same as loading it by itself'''
+        database_path = os.path.join(self.directory, 'internic.db')
+        jobs = [(os.path.join(self.zone_dir, 'internic.zone'), 'internic', database_path)]
+        results = ingest_zones.ingest_zones(jobs, SETTINGS, workers=1)
+        self.assertIsNone(results[0]['error'])
+
+        zone_data = gtld_data.ZoneData.load_from_file(None, jobs[0][0])
+        self.assertEqual(results[0]['domains'], len(zone_data.domains))
+        self.assertEqual(sum(results[0]['statuses'].values()), len(zone_data.domains))
+        self.assertIn('load', results[0]['timings'])
+
+        gtld_data.gtld_lookup_config.database_backend = TEST_BACKEND
+        gtld_data.gtld_lookup_config.database_path = database_path
+        gtld_data.gtld_db.connect()
+        gtld_data.gtld_db.database_connection.begin()
+        cursor = gtld_data.gtld_db.database_connection.cursor()
+        stored = gtld_data.ZoneData.load_from_db(cursor, 1)
+        self.assertEqual(sorted(stored.domains.keys()), sorted(zone_data.domains.keys()))
+        gtld_data.gtld_db.database_connection.close()
+
+    def test_origin_from_zone_file(self):
+        '''Tests the file name only names the database, the zone is loaded as create_data_from_zonefile would'''
+        zone_file = self.write_zone_file('snapshot-2024.zone')
+        database_path = os.path.join(self.directory, 'snapshot-2024.db')
+        results = ingest_zones.ingest_zones([(zone_file, 'snapshot-2024', database_path)], SETTINGS, workers=1)
+        self.assertIsNone(results[0]['error'])
+        self.assertEqual(results[0]['zone'], 'snapshot-2024')
+
+        # create_data_from_zonefile without --origin
+        expected = gtld_data.ZoneData.load_from_file(None, zone_file)
+        self.assertEqual(expected.origin, 'internic')
+
+        gtld_data.gtld_lookup_config.database_backend = TEST_BACKEND
+        gtld_data.gtld_lookup_config.database_path = database_path
+        gtld_data.gtld_db.connect()
+        gtld_data.gtld_db.database_connection.begin()
+        cursor = gtld_data.gtld_db.database_connection.cursor()
+        stored = gtld_data.ZoneData.load_from_db(cursor, 1)
+        self.assertEqual(stored.origin, expected.origin)
+        self.assertEqual(stored.soa, expected.soa)
+        self.assertEqual(sorted(stored.domains.keys()), sorted(expected.domains.keys()))
+        gtld_data.gtld_db.database_connection.close()
+
+    def test_failed_zone(self):
+        '''Tests a zone that can't be loaded is reported, not raised'''
+        result = ingest_zones.ingest_zone(os.path.join(self.zone_dir, 'missing.zone'), 'missing',
+                                          os.path.join(self.directory, 'missing.db'), SETTINGS)
+        self.assertIsNotNone(result['error'])
+
+if __name__ == '__main__':
+    unittest.main()
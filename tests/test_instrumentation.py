@@ -0,0 +1,100 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import json
+import os
+import tempfile
+import unittest
+
+import gtld_data
+from gtld_data import gtld_db, gtld_instrumentation
+from gtld_data.instrumentation import Instrumentation, InstrumentedCursor, statement_type
+
+from tests.database_unit_test import DatabaseUnitTest
+
+class TestStatementType(unittest.TestCase):
+    def test_statement_types(self):
+        '''Tests statements are named by what they do and the table they do it to'''
+        self.assertEqual(statement_type("""SELECT id, origin FROM zone_files WHERE id = ?"""), "SELECT zone_files")
+        self.assertEqual(statement_type("""INSERT INTO domains (id) VALUES (?)"""), "INSERT domains")
+        self.assertEqual(statement_type("""UPDATE OR INSERT INTO ptr_records (id) VALUES (?)"""), "UPDATE ptr_records")
+        self.assertEqual(statement_type("""  update domains SET resolved = 1"""), "UPDATE domains")
+        self.assertEqual(statement_type("""DELETE FROM domain_rdata WHERE domain_id = ?"""), "DELETE domain_rdata")
+        self.assertEqual(statement_type("""PRAGMA integrity_check"""), "PRAGMA")
+        self.assertEqual(statement_type("""-- Speeds up resume\nCREATE INDEX domains_resolved ON domains (resolved)"""), "CREATE")
+
+    def test_phases(self):
+        '''Tests phases add up over every time they're entered, even when they raise'''
+        instrumentation = Instrumentation()
+        with instrumentation.phase('parse'):
+            pass
+        with self.assertRaises(ValueError):
+            with instrumentation.phase('parse'):
+                raise ValueError()
+
+        report = instrumentation.report()
+        self.assertEqual(report['phases']['parse']['calls'], 2)
+        self.assertGreaterEqual(report['elapsed'], report['phases']['parse']['seconds'])
+
+class TestInstrumentedDatabase(DatabaseUnitTest):
+    def setUp(self):
+        gtld_instrumentation.reset()
+        gtld_instrumentation.enabled = True
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        gtld_instrumentation.enabled = False
+        gtld_instrumentation.reset()
+
+    def test_load_report(self):
+        '''Tests a load and read back are timed and their statements and rows counted'''
+        self.assertIsInstance(gtld_db.database_connection.cursor(), InstrumentedCursor)
+
+        with gtld_db.bulk_load():
+            cursor = gtld_db.database_connection.cursor()
+            zone_data = gtld_data.ZoneData.load_from_file(cursor, 'tests/data/db.internic', origin='internic')
+
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+        gtld_data.ZoneData.load_from_db(cursor, zone_data.db_id)
+        gtld_db.database_connection.commit()
+
+        report = gtld_instrumentation.report()
+        for phase in ['parse', 'db_write', 'rebuild_indexes', 'check_integrity', 'db_load']:
+            self.assertIn(phase, report['phases'])
+
+        statements = report['statements']
+        self.assertEqual(statements['INSERT domains']['rows'], len(zone_data.domains))
+        self.assertEqual(statements['INSERT zone_files'], {'executes': 1, 'rows': 1})
+        self.assertGreaterEqual(statements['SELECT domains']['rows'], len(zone_data.domains))
+        self.assertIn('resolver', report['caches'])
+
+        file_descriptor, report_file = tempfile.mkstemp()
+        os.close(file_descriptor)
+        try:
+            gtld_instrumentation.write_report(report_file)
+            with open(report_file, 'r') as f:
+                self.assertEqual(json.load(f)['statements'], statements)
+        finally:
+            os.remove(report_file)
+
+if __name__ == '__main__':
+    unittest.main()
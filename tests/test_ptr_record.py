@@ -73,3 +73,45 @@ class TestPtrRecord(DatabaseUnitTest):
         self.assertIn(ptr_obj1, ptr_set)
         self.assertIn(ptr_obj2, ptr_set)
         self.assertIn(ptr_obj3, ptr_set)
+
+    def test_equality(self):
+        '''Tests PTRs compare on their address and name'''
+        ptr_obj1 = gtld_data.PtrRecord("10.10.10.1", "test.example.")
+        ptr_obj2 = gtld_data.PtrRecord("10.10.10.1", "test.example.")
+        self.assertEqual(ptr_obj1, ptr_obj2)
+        self.assertEqual(hash(ptr_obj1), hash(ptr_obj2))
+
+        # Changing either half of the key has to change the hash with it
+        ptr_obj2.reverse_lookup_name = "test2.example."
+        self.assertNotEqual(ptr_obj1, ptr_obj2)
+        ptr_obj2.reverse_lookup_name = "test.example."
+        ptr_obj2.ip_address = "10.10.10.2"
+        self.assertNotEqual(ptr_obj1, ptr_obj2)
+        self.assertEqual(len(set([ptr_obj1, ptr_obj2])), 2)
+
+    def test_ptr_map(self):
+        '''Tests PTRs going through the interning map'''
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+        db_id = self.create_zone_data(cursor)
+        domain_id = self.create_domain_record(cursor, db_id, "test.example.")
+        existing = self.create_ptr_record(cursor, db_id, "10.10.10.1", "test1.example.")
+
+        ptr_map = gtld_data.PtrRecordMap()
+        ptr_map.load(cursor)
+        self.assertEqual(len(ptr_map), 1)
+
+        # Known records come back as is, new ones are only written on flush
+        ptr_obj1 = ptr_map.add(db_id, domain_id, "10.10.10.1", "test1.example.")
+        self.assertEqual(ptr_obj1.db_id, existing.db_id)
+        ptr_obj2 = ptr_map.add(db_id, domain_id, "10.10.10.2", "test2.example.")
+        self.assertIs(ptr_map.add(db_id, domain_id, "10.10.10.2", "test2.example."), ptr_obj2)
+        ptr_map.flush(cursor)
+
+        # Flushing the same link twice doesn't duplicate it
+        ptr_map.add(db_id, domain_id, "10.10.10.2", "test2.example.")
+        ptr_map.flush(cursor)
+
+        self.assertEqual(len(gtld_data.PtrRecord.read_all_from_db(cursor, db_id)), 2)
+        domain = gtld_data.DomainRecord.from_db(cursor, domain_id)
+        self.assertEqual(domain.reverse_lookup_ptrs, set([ptr_obj1, ptr_obj2]))
@@ -0,0 +1,72 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import unittest
+
+import dns.resolver
+
+import gtld_data
+from gtld_data import gtld_resolver_cache
+from gtld_data.resolver_cache import ResolverCache
+
+from tests.stub_dns_server import StubDnsTestCase
+
+class TestResolverCache(unittest.TestCase):
+    def test_ttl_expiry(self):
+        '''Tests entries stop being served once their TTL runs out'''
+        cache = ResolverCache(max_entries=10)
+        cache.put("example.", "A", ["192.0.2.1"], 60, now=100)
+        self.assertEqual(cache.get("EXAMPLE.", "A", now=159), ["192.0.2.1"])
+        self.assertIsNone(cache.get("example.", "A", now=160))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_lru_eviction(self):
+        '''Tests the least recently used entry is dropped when full'''
+        cache = ResolverCache(max_entries=2)
+        cache.put("one.example.", "A", ["192.0.2.1"], 60, now=0)
+        cache.put("two.example.", "A", ["192.0.2.2"], 60, now=0)
+        cache.get("one.example.", "A", now=1)
+        cache.put("three.example.", "A", ["192.0.2.3"], 60, now=1)
+
+        self.assertIsNotNone(cache.get("one.example.", "A", now=2))
+        self.assertIsNone(cache.get("two.example.", "A", now=2))
+        self.assertIsNotNone(cache.get("three.example.", "A", now=2))
+
+    def test_negative_answers(self):
+        '''Tests NXDOMAIN and NoAnswer are cached as empty answers'''
+        cache = ResolverCache()
+        cache.put_negative("missing.example.", "A", dns.resolver.NXDOMAIN())
+        self.assertEqual(cache.get("missing.example.", "A"), [])
+        self.assertIsNone(cache.get("missing.example.", "AAAA"))
+
+class TestResolverCacheLookups(StubDnsTestCase):
+    def test_blocking_lookups_use_cache(self):
+        '''Tests DomainRecord lookups only hit the network once per name'''
+        for _ in range(3):
+            domain = gtld_data.DomainRecord("two.example.")
+            domain.reverse_lookup(None)
+            domain = gtld_data.DomainRecord("missing.example.")
+            domain.get_records(None, "A")
+
+        self.assertEqual(self.stub_server.queries.count(("1.2.0.192.in-addr.arpa.", "PTR")), 1)
+        self.assertEqual(self.stub_server.queries.count(("missing.example.", "A")), 1)
+        self.assertGreater(gtld_resolver_cache.stats()['hits'], 0)
@@ -0,0 +1,71 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import unittest
+import os
+import tempfile
+
+import gtld_data
+from gtld_data import gtld_resolver_cache
+from gtld_data.response_store import ResponseStore
+
+from tests.stub_dns_server import StubDnsTestCase
+
+class TestResponseStore(StubDnsTestCase):
+    def setUp(self):
+        super().setUp()
+        file_descriptor, self.store_filename = tempfile.mkstemp()
+        os.close(file_descriptor)
+
+    def tearDown(self):
+        gtld_resolver_cache.close_store()
+        os.remove(self.store_filename)
+        super().tearDown()
+
+    def test_read_write_store(self):
+        '''Tests responses are kept until they expire'''
+        store = ResponseStore(self.store_filename)
+        store.put("example.", "A", ["192.0.2.1"], 60, now=1000)
+        store.put("missing.example.", "A", [], 60, now=1000)
+        store.close()
+
+        store = ResponseStore(self.store_filename)
+        self.assertEqual(store.get("EXAMPLE.", "A", now=1030), (["192.0.2.1"], 30))
+        self.assertEqual(store.get("missing.example.", "A", now=1030), ([], 30))
+        self.assertIsNone(store.get("example.", "A", now=1060))
+        self.assertIsNone(store.get("example.", "AAAA", now=1030))
+        store.close()
+
+    def test_rerun_skips_resolution(self):
+        '''Tests a second run is answered from the store instead of the network'''
+        gtld_resolver_cache.open_store(self.store_filename)
+        gtld_data.DomainRecord("two.example.").reverse_lookup(None)
+        gtld_resolver_cache.close_store()
+        queries = len(self.stub_server.queries)
+
+        # A fresh run starts with an empty in-memory cache
+        gtld_resolver_cache.clear()
+        gtld_resolver_cache.open_store(self.store_filename)
+        domain = gtld_data.DomainRecord("two.example.")
+        domain.reverse_lookup(None)
+
+        self.assertEqual(len(self.stub_server.queries), queries)
+        self.assertEqual(len(domain.reverse_lookup_ptrs), 1)
+        self.assertGreater(gtld_resolver_cache.stats()['store_hits'], 0)
@@ -0,0 +1,55 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import unittest
+import re
+
+from gtld_data.rule_matcher import RuleMatcher
+
+from tests.rule_patterns import load_patterns, generate_names
+
+class TestRuleMatcher(unittest.TestCase):
+    def test_suffix_rules(self):
+        '''Tests anchored suffix rules need a label in front of the suffix'''
+        matcher = RuleMatcher(["\\.sedoparking\\.com\\.$"])
+        self.assertTrue(matcher.search("ns1.sedoparking.com."))
+        self.assertTrue(matcher.search("a.b.sedoparking.com."))
+        self.assertFalse(matcher.search("sedoparking.com."))
+        self.assertFalse(matcher.search("ns1.notsedoparking.com."))
+        self.assertFalse(matcher.search("ns1.sedoparking.com"))
+
+    def test_exact_and_regex_rules(self):
+        '''Tests literal names and free-form patterns'''
+        matcher = RuleMatcher(["^ns1\\.example\\.com\\.$", "parking(.*)\\.nic\\.ru\\.$", "(a)\\1\\.test\\.$"])
+        self.assertEqual(len(matcher), 3)
+        self.assertTrue(matcher.search("ns1.example.com."))
+        self.assertFalse(matcher.search("ns2.example.com."))
+        self.assertTrue(matcher.search("parking7.nic.ru."))
+        self.assertTrue(matcher.search("aa.test."))
+        self.assertFalse(matcher.search("ab.test."))
+
+    def test_matches_regex_loop(self):
+        '''Tests the matcher agrees with searching each pattern in turn'''
+        patterns = load_patterns(50)
+        compiled = [re.compile(p) for p in patterns]
+        matcher = RuleMatcher(patterns)
+        for name in generate_names(5000, 50):
+            expected = any(p.search(name) is not None for p in compiled)
+            self.assertEqual(matcher.search(name), expected, name)
@@ -0,0 +1,115 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import tempfile
+import unittest
+
+import gtld_data
+from gtld_data import zone_chunks
+
+def write_zone(f, domains, middle_origin=False, origin="example."):
+    f.write("$ORIGIN %s\n" % origin)
+    f.write("$TTL 3600\n")
+    f.write("@ IN SOA ns1.example. hostmaster.example. (\n")
+    f.write("        42 3600 900\n")
+    f.write("        86400 3600 )\n")
+    f.write("@ IN NS ns1.example.\n")
+    f.write("ns1 IN A 192.0.2.1\n")
+    for i in range(domains):
+        if middle_origin is True and i == domains // 2:
+            f.write("$ORIGIN other.\n")
+        f.write("domain%d IN NS ns1.host%d.net.\n" % (i, i % 7))
+        f.write("  IN NS ns2.host%d.net.\n" % (i % 5))
+        if i % 10 == 0:
+            f.write("ns1.domain%d IN AAAA 2001:db8::%x\n" % (i, i))
+
+class TestZoneChunks(unittest.TestCase):
+    def setUp(self):
+        file_descriptor, self.zone_filename = tempfile.mkstemp()
+        with os.fdopen(file_descriptor, 'w') as f:
+            write_zone(f, 2000)
+
+    def tearDown(self):
+        os.remove(self.zone_filename)
+
+    def assertSameZone(self, zone_data, expected):
+        self.assertEqual(zone_data.origin, expected.origin)
+        self.assertEqual(zone_data.soa, expected.soa)
+        self.assertEqual(list(zone_data.domains.keys()), list(expected.domains.keys()))
+        for name, domain in expected.domains.items():
+            self.assertEqual(set(ns.nameserver for ns in zone_data.domains[name].nameservers),
+                             set(ns.nameserver for ns in domain.nameservers))
+        self.assertEqual(dict((name, ns.count) for name, ns in zone_data.known_nameservers.items()),
+                         dict((name, ns.count) for name, ns in expected.known_nameservers.items()))
+        self.assertEqual(zone_data.glue_records, expected.glue_records)
+
+    def test_find_chunks(self):
+        '''Tests chunks cover the file and start on a new owner'''
+        chunks = zone_chunks.find_chunks(self.zone_filename, 8)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], os.path.getsize(self.zone_filename))
+
+        with open(self.zone_filename, 'rb') as f:
+            data = f.read()
+        for (start, end), (next_start, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(end, next_start)
+            self.assertEqual(data[next_start - 1:next_start], b'\n')
+            self.assertFalse(data[next_start:next_start + 1].isspace())
+
+    def test_parallel_parse(self):
+        '''Tests a zone parsed in chunks comes out the same as one read serially'''
+        expected = gtld_data.ZoneData.load_from_file(None, self.zone_filename)
+        zone_data = gtld_data.ZoneData.load_from_file(None, self.zone_filename, workers=3)
+        self.assertEqual(expected.origin, 'example')
+        self.assertEqual(expected.soa, 42)
+        self.assertSameZone(zone_data, expected)
+
+    def test_relative_origin(self):
+        '''Tests a relative $ORIGIN at the top is only applied once'''
+        with open(self.zone_filename, 'w') as f:
+            write_zone(f, 2000, origin="gtld")
+
+        expected = gtld_data.ZoneData.load_from_file(None, self.zone_filename, origin='example')
+        self.assertIn('domain0.gtld.example.', expected.domains)
+
+        # Called directly, so falling back to a serial read would fail the test
+        zone_data = gtld_data.ZoneData()
+        zone_data.origin = expected.origin
+        end_origin = zone_chunks.parse_in_parallel(zone_data, self.zone_filename, origin='example', workers=3)
+        self.assertEqual(end_origin.to_text(), 'gtld.example.')
+        self.assertSameZone(zone_data, expected)
+
+    def test_origin_change(self):
+        '''Tests a zone changing $ORIGIN part way through is read serially'''
+        with open(self.zone_filename, 'w') as f:
+            write_zone(f, 2000, middle_origin=True)
+
+        with self.assertRaises(zone_chunks.SerialParseRequired):
+            zone_chunks.parse_in_parallel(gtld_data.ZoneData(), self.zone_filename, workers=3)
+
+        expected = gtld_data.ZoneData.load_from_file(None, self.zone_filename)
+        zone_data = gtld_data.ZoneData.load_from_file(None, self.zone_filename, workers=3)
+        self.assertIn('domain1999.other.', zone_data.domains)
+        self.assertSameZone(zone_data, expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -27,23 +27,26 @@ import tempfile
 import gtld_data
 from gtld_data import  gtld_db, gtld_lookup_config
 
-class TestZoneData(unittest.TestCase):
-    def setUp(self):
-        self.db_filename = None
-        file_descriptor, self.db_filename = tempfile.mkstemp()
-        os.close(file_descriptor) # Don't need to write anything to it
-        gtld_lookup_config.database_path = self.db_filename
-
-        # Just need a randomly generated filename
-        os.remove(self.db_filename)
-        gtld_db.create_database()
-
-    def tearDown(self):
-        gtld_db.database_connection.close()
-        os.remove(self.db_filename)
+from tests.database_unit_test import DatabaseUnitTest
 
+class TestZoneData(DatabaseUnitTest):
     def test_reading_zone_file_to_db(self):
         '''Tests looking up nameservers'''
         cursor = gtld_db.database_connection.cursor()
         zone_data = gtld_data.ZoneData.load_from_file(cursor, 'tests/data/db.internic', origin='internic')
         self.assertEqual(len(zone_data.domains), 2)
+
+    def test_loading_zone_from_db(self):
+        '''Tests reading a stored zone back in'''
+        cursor = gtld_db.database_connection.cursor()
+        zone_data = gtld_data.ZoneData.load_from_file(cursor, 'tests/data/db.internic', origin='internic')
+
+        zone_data2 = gtld_data.ZoneData.load_from_db(cursor, zone_data.db_id)
+        self.assertEqual(zone_data2.origin, 'internic')
+        self.assertEqual(set(zone_data2.domains.keys()), set(zone_data.domains.keys()))
+        self.assertEqual(set(zone_data2.known_nameservers.keys()), set(zone_data.known_nameservers.keys()))
+
+        # Domains share the nameserver objects the zone knows about
+        domain = zone_data2.domains['nynex.internic.']
+        nameserver = list(domain.nameservers)[0]
+        self.assertIs(nameserver, zone_data2.known_nameservers['ns1.nynex.internic.'])
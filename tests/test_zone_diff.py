@@ -0,0 +1,104 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import unittest
+
+import gtld_data
+from gtld_data import gtld_db
+from gtld_data.domain_rdata import DomainRData
+from gtld_data.zone_diff import UnsortedZoneError, ZoneDiff
+
+from tests.database_unit_test import DatabaseUnitTest
+
+OLD_ZONE = [
+    "@ IN SOA ns1.example. hostmaster.example. 1 3600 900 86400 3600",
+    "@ IN NS ns1.example.",
+    "changed IN NS ns1.host.net.",
+    "gone IN NS ns1.host.net.",
+    "same IN NS ns1.host.net.",
+    "same IN NS ns2.host.net.",
+]
+
+NEW_ZONE = [
+    "@ IN SOA ns1.example. hostmaster.example. 2 3600 900 86400 3600",
+    "@ IN NS ns1.example.",
+    "added IN NS ns2.host.net.",
+    "changed IN NS ns1.other.net.",
+    "same IN NS ns1.host.net.",
+    "same IN NS ns2.host.net.",
+    "ns1.same A 192.0.2.1",
+]
+
+class TestZoneDiff(DatabaseUnitTest):
+    def setUp(self):
+        DatabaseUnitTest.setUp(self)
+        gtld_db.database_connection.begin()
+        self.cursor = gtld_db.database_connection.cursor()
+        self.zone_data = gtld_data.ZoneData.load_from_file(self.cursor, OLD_ZONE, origin='example')
+
+        # Give every domain results, to see which keep them
+        for domain in self.zone_data.domains.values():
+            rdata = DomainRData()
+            rdata.rrtype = "A"
+            rdata.rdata = "192.0.2.1"
+            domain.add_record(self.cursor, rdata)
+            rdata.to_db(self.cursor)
+            domain.mark_resolved(self.cursor)
+
+    def test_diff(self):
+        '''Tests added, removed and changed delegations are found and written'''
+        diff = ZoneDiff.from_file(self.cursor, self.zone_data.db_id, NEW_ZONE)
+        self.assertEqual(diff.new_soa, 2)
+        self.assertEqual(diff.added, [("added.example.", frozenset(["ns2.host.net."]))])
+        self.assertEqual([domain_id for domain_id, _ in diff.removed],
+                         [self.zone_data.domains["gone.example."].db_id])
+        self.assertEqual(diff.changed, [(self.zone_data.domains["changed.example."].db_id,
+                                         frozenset(["ns1.host.net."]), frozenset(["ns1.other.net."]))])
+        self.assertEqual(diff.unchanged, 2)
+
+        diff.apply(self.cursor)
+        zone_data = gtld_data.ZoneData.load_from_db(self.cursor, self.zone_data.db_id)
+        self.assertEqual(zone_data.soa, 2)
+        self.assertEqual(sorted(zone_data.domains.keys()),
+                         ["added.example.", "changed.example.", "example.", "same.example."])
+        self.assertEqual(zone_data.known_nameservers["ns1.host.net."].count, 1)
+        self.assertEqual(zone_data.known_nameservers["ns2.host.net."].count, 2)
+        self.assertEqual(zone_data.known_nameservers["ns1.other.net."].count, 1)
+
+        # Only what changed needs resolving again
+        unresolved = gtld_data.DomainRecord.read_unresolved_from_db(self.cursor, self.zone_data.db_id)
+        self.assertEqual(sorted(d.domain_name for d in unresolved), ["added.example.", "changed.example."])
+        self.assertEqual(len(zone_data.domains["same.example."].records["A"]), 1)
+        self.assertEqual(zone_data.domains["changed.example."].records, {})
+
+    def test_same_serial(self):
+        '''Tests a zone with the serial already stored isn't compared'''
+        diff = ZoneDiff.from_file(self.cursor, self.zone_data.db_id, OLD_ZONE[:1] + ["!! not a record"])
+        self.assertTrue(diff.up_to_date)
+        self.assertEqual(len(diff), 0)
+
+    def test_unsorted(self):
+        '''Tests a zone file out of order is refused'''
+        unsorted = NEW_ZONE[:2] + [NEW_ZONE[3], NEW_ZONE[2]] + NEW_ZONE[4:]
+        with self.assertRaises(UnsortedZoneError):
+            ZoneDiff.from_file(self.cursor, self.zone_data.db_id, unsorted)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import unittest
+
+from gtld_data.zone_data import ZoneData
+from gtld_data.zone_processor import ZoneProcessor
+
+from benchmarks.zone_generator import ZoneGenerator
+
+class TestZoneGenerator(unittest.TestCase):
+    def test_deterministic(self):
+        '''Tests the same parameters and seed give the same zone'''
+        self.assertEqual(list(ZoneGenerator(200).lines()), list(ZoneGenerator(200).lines()))
+        self.assertEqual(list(ZoneGenerator(200).resolutions()), list(ZoneGenerator(200).resolutions()))
+        self.assertNotEqual(list(ZoneGenerator(200).lines()), list(ZoneGenerator(200, seed=2).lines()))
+
+    def test_parking_skew(self):
+        '''Tests the parking share of the zone classifies as parked against the shipped lists'''
+        zone_data = ZoneData.load_from_file(None, list(ZoneGenerator(1000, parking_share=0.5).lines()),
+                                            origin='example')
+        # The apex is delegated too
+        self.assertEqual(len(zone_data.domains), 1001)
+
+        zone_processor = ZoneProcessor(zone_data)
+        zone_processor.load_parked_domains_list('data/parking_nameservers.txt')
+        zone_processor.load_blocked_domains_list('data/blocking_nameservers.txt')
+        zone_processor.process_zone_data()
+        self.assertGreater(len(zone_processor.parked_domains), 400)
+        self.assertLess(len(zone_processor.parked_domains), 600)
+        self.assertGreater(len(zone_processor.blocked_domains), 0)
+
+        # The most used nameservers belong to parking providers
+        busiest = max(zone_data.known_nameservers.values(), key=lambda ns: ns.count)
+        self.assertTrue(zone_processor.known_parked_nameservers.search(busiest.nameserver))
+
+if __name__ == '__main__':
+    unittest.main()
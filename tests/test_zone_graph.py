@@ -0,0 +1,88 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import tempfile
+import unittest
+
+import gtld_data
+from gtld_data import zone_graph
+from gtld_data.zone_graph import ZoneGraph, build_csr
+
+class TestZoneGraph(unittest.TestCase):
+    def setUp(self):
+        self.zone_data = gtld_data.ZoneData.load_from_file(None, 'tests/data/db.internic', origin='internic')
+
+    def test_build_csr(self):
+        '''Tests edges are grouped by row, sorted and deduplicated'''
+        offsets, index = build_csr(3, [2, 0, 2, 0, 2], [5, 3, 1, 3, 1])
+        self.assertEqual(list(offsets), [0, 1, 1, 3])
+        self.assertEqual(list(index), [3, 1, 5])
+
+    def test_nameserver_counts(self):
+        '''Tests counts from the graph match the ones kept while loading'''
+        graph = self.zone_data.graph()
+        self.assertEqual(len(graph), len(self.zone_data.domains))
+
+        expected = dict((name, ns.count) for name, ns in self.zone_data.known_nameservers.items())
+        self.assertEqual(graph.nameserver_counts(), expected)
+
+        # Reading the file straight into a graph gives the same answer
+        self.assertEqual(ZoneGraph.from_file('tests/data/db.internic', origin='internic').nameserver_counts(),
+                         expected)
+
+    def test_domains_on_nameserver(self):
+        '''Tests looking up the domains a nameserver is used by'''
+        graph = self.zone_data.graph()
+        for name, nameserver in self.zone_data.known_nameservers.items():
+            expected = sorted(d.domain_name for d in self.zone_data.domains.values() if nameserver in d.nameservers)
+            self.assertEqual(sorted(graph.domains_on_nameserver(name)), expected)
+        self.assertEqual(graph.domains_on_nameserver('missing.example.'), [])
+
+    def test_snapshot(self):
+        '''Tests a graph over a snapshot matches one built from the zone'''
+        file_descriptor, snapshot_filename = tempfile.mkstemp()
+        os.close(file_descriptor)
+        try:
+            self.zone_data.save_snapshot(snapshot_filename)
+            zone_data = gtld_data.ZoneData.load_snapshot(snapshot_filename)
+            self.assertEqual(zone_data.graph().nameserver_counts(), self.zone_data.graph().nameserver_counts())
+            self.assertEqual(sorted(zone_data.graph().domains_on_nameserver('ns1.internic.')),
+                             sorted(self.zone_data.graph().domains_on_nameserver('ns1.internic.')))
+
+            # The graph shares the snapshot's memory, so let it go first
+            zone_data._graph = None
+            zone_data.snapshot.close()
+        finally:
+            os.remove(snapshot_filename)
+
+@unittest.skipIf(zone_graph.numpy is None, "numpy isn't installed")
+class TestZoneGraphWithoutNumpy(TestZoneGraph):
+    '''Runs the same tests with the plain Python fallbacks'''
+    def setUp(self):
+        TestZoneGraph.setUp(self)
+        self.numpy = zone_graph.numpy
+        zone_graph.numpy = None
+
+    def tearDown(self):
+        zone_graph.numpy = self.numpy
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import unittest
+
+import gtld_data
+from gtld_data import gtld_db, zone_processor
+
+from tests.database_unit_test import DatabaseUnitTest
+from tests.stub_dns_server import StubDnsTestCase
+
+class TestZoneProcessor(unittest.TestCase):
+    def setUp(self):
+        self.zone_processor = gtld_data.ZoneProcessor(gtld_data.ZoneData())
+        self.zone_processor.load_parked_domains_list('data/parking_nameservers.txt')
+        self.zone_processor.load_blocked_domains_list('data/blocking_nameservers.txt')
+        self.zone_processor.load_known_expired_ptrs('data/reverse_expired_ptrs.txt')
+        self.zone_processor.load_known_parked_ptrs('data/reverse_parking_ptrs.txt')
+        self.zone_processor.load_other_inactive_list('data/other_inactive_nameservers.txt')
+
+    def test_nameserver_verdicts(self):
+        '''Tests nameservers are checked against every list once'''
+        verdict = self.zone_processor.nameserver_verdict("ns1.sedoparking.com.")
+        self.assertEqual(verdict, zone_processor.PARKED_NAMESERVER)
+        self.assertIn("ns1.sedoparking.com.", self.zone_processor.nameserver_verdicts)
+
+        verdict = self.zone_processor.nameserver_verdict("blocked1.nic.ru.")
+        self.assertEqual(verdict, zone_processor.BLOCKED_NAMESERVER)
+
+        verdict = self.zone_processor.nameserver_verdict("ns1.example.com.")
+        self.assertEqual(verdict, 0)
+
+    def test_ptr_verdicts(self):
+        '''Tests PTR names are checked against the reverse lists'''
+        verdict = self.zone_processor.ptr_verdict("expirepages-kiae-1.nic.ru.")
+        self.assertEqual(verdict, zone_processor.EXPIRED_PTR)
+
+        verdict = self.zone_processor.ptr_verdict("dns.parked.zone.")
+        self.assertEqual(verdict, zone_processor.PARKED_PTR)
+
+    def add_domain(self, name, nameservers, ptrs=(), with_rdata=True):
+        domain = gtld_data.DomainRecord(name)
+        for nameserver in nameservers:
+            domain.nameservers.add(gtld_data.NameserverRecord(nameserver))
+        for ptr in ptrs:
+            domain.reverse_lookup_ptrs.add(gtld_data.PtrRecord("10.10.10.1", ptr))
+        if with_rdata is True:
+            rdata = gtld_data.DomainRData()
+            rdata.rrtype = "A"
+            rdata.rdata = "10.10.10.1"
+            domain.add_record(None, rdata)
+        self.zone_processor.zone_data.domains[name] = domain
+        return domain
+
+    def test_process_zone_data(self):
+        '''Tests every domain lands in the highest priority category'''
+        parked = self.add_domain("parked.example.", ["ns1.sedoparking.com.", "blocked1.nic.ru."])
+        blocked = self.add_domain("blocked.example.", ["blocked1.nic.ru.", "statuspage1.nic.ru."])
+        ptr_parked = self.add_domain("ptrparked.example.", ["ns1.example.com."], ["dns.parked.zone."])
+        ptr_expired = self.add_domain("ptrexpired.example.", ["statuspage1.nic.ru."], ["expirepages-kiae-1.nic.ru."])
+        other = self.add_domain("other.example.", ["statuspage1.nic.ru."])
+        no_rdata = self.add_domain("nordata.example.", ["ns1.example.com."], with_rdata=False)
+        unknown = self.add_domain("unknown.example.", ["ns1.example.com."])
+
+        self.zone_processor.process_zone_data()
+
+        self.assertEqual(self.zone_processor.parked_domains, set([parked]))
+        self.assertEqual(self.zone_processor.blocked_domains, set([blocked]))
+        self.assertEqual(self.zone_processor.reverse_parked_domains, set([ptr_parked]))
+        self.assertEqual(self.zone_processor.reverse_expired_domains, set([ptr_expired]))
+        self.assertEqual(self.zone_processor.other_inactive_nameservers, set([other]))
+        self.assertEqual(self.zone_processor.no_ns_rdata, set([no_rdata]))
+        self.assertEqual(self.zone_processor.unknown_status_domains, set([unknown]))
+
+        # Status is set on the zone's own objects, nothing is copied
+        self.assertIs(self.zone_processor.zone_data.domains["parked.example."], parked)
+        self.assertEqual(parked.status, gtld_data.DomainStatus.PARKED)
+        self.assertEqual(ptr_expired.status, gtld_data.DomainStatus.PTR_EXPIRED)
+        self.assertEqual(unknown.status, gtld_data.DomainStatus.UNKNOWN)
+
+    def test_process_zone_graph(self):
+        '''Tests classifying through a ZoneGraph agrees with process_zone_data'''
+        self.add_domain("parked.example.", ["ns1.sedoparking.com.", "blocked1.nic.ru."])
+        self.add_domain("blocked.example.", ["blocked1.nic.ru.", "statuspage1.nic.ru."])
+        self.add_domain("ptrparked.example.", ["ns1.example.com."], ["dns.parked.zone."])
+        self.add_domain("ptrexpired.example.", ["statuspage1.nic.ru."], ["expirepages-kiae-1.nic.ru."])
+        self.add_domain("other.example.", ["statuspage1.nic.ru."])
+        self.add_domain("nordata.example.", ["ns1.example.com."], with_rdata=False)
+        self.add_domain("unknown.example.", ["ns1.example.com."])
+
+        graph = self.zone_processor.zone_data.graph()
+        status_ids = self.zone_processor.process_zone_graph(graph)
+        self.zone_processor.process_zone_data()
+
+        for status, domain_ids in status_ids.items():
+            expected = [d.domain_name for d in self.zone_processor.zone_data.domains.values() if d.status == status]
+            self.assertEqual([graph.domain_names[i] for i in domain_ids], expected)
+
+class TestResolveInBatches(StubDnsTestCase, DatabaseUnitTest):
+    def setUp(self):
+        DatabaseUnitTest.setUp(self)
+        StubDnsTestCase.setUp(self)
+
+    def tearDown(self):
+        StubDnsTestCase.tearDown(self)
+        DatabaseUnitTest.tearDown(self)
+
+    def test_resolve_in_batches(self):
+        '''Tests reverse lookups are stored and every domain marked resolved'''
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+        zd_id = self.create_zone_data(cursor)
+        domains = []
+        for name in ["one.example.", "two.example."]:
+            domain_id = self.create_domain_record(cursor, zd_id, name)
+            domains.append(gtld_data.DomainRecord.from_db(cursor, domain_id))
+        gtld_db.database_connection.commit()
+
+        processor = gtld_data.ZoneProcessor(None)
+        resolved = processor.resolve_in_batches(gtld_db.database_connection, cursor, domains, batch_size=1)
+        self.assertEqual(resolved, 2)
+        self.assertEqual(gtld_data.DomainRecord.count_resolved(cursor, zd_id), (2, 2))
+
+        # 192.0.2.1 is shared, so there's one PTR for it with a link from each domain
+        self.assertEqual(len(gtld_data.PtrRecord.read_all_from_db(cursor, zd_id)), 3)
+        one = gtld_data.DomainRecord.from_db(cursor, domains[0].db_id)
+        two = gtld_data.DomainRecord.from_db(cursor, domains[1].db_id)
+        self.assertEqual(set(p.reverse_lookup_name for p in one.reverse_lookup_ptrs),
+                         set(["parking.example.", "host2.example.", "host6.example."]))
+        self.assertEqual(set(p.reverse_lookup_name for p in two.reverse_lookup_ptrs),
+                         set(["parking.example."]))
+
+    def test_failed_domains_stay_unresolved(self):
+        '''Tests a domain whose lookups failed is left for a resumed run'''
+        gtld_db.database_connection.begin()
+        cursor = gtld_db.database_connection.cursor()
+        zd_id = self.create_zone_data(cursor)
+        domains = []
+        for name in ["one.example.", "two.example."]:
+            domain_id = self.create_domain_record(cursor, zd_id, name)
+            domains.append(gtld_data.DomainRecord.from_db(cursor, domain_id))
+        gtld_db.database_connection.commit()
+
+        # only one.example. has the address behind this PTR
+        self.stub_server.dropped.add("2.2.0.192.in-addr.arpa.")
+        processor = gtld_data.ZoneProcessor(None)
+        resolved = processor.resolve_in_batches(gtld_db.database_connection, cursor, domains)
+        self.assertEqual(resolved, 1)
+        self.assertEqual(gtld_data.DomainRecord.count_resolved(cursor, zd_id), (1, 2))
+
+        unresolved = gtld_data.DomainRecord.read_unresolved_from_db(cursor, zd_id)
+        self.assertEqual([d.domain_name for d in unresolved], ["one.example."])
+        one = gtld_data.DomainRecord.from_db(cursor, domains[0].db_id)
+        self.assertEqual(one.records, {})
+        self.assertEqual(len(one.reverse_lookup_ptrs), 0)
+
+        # once the servers answer, resuming picks it up
+        self.stub_server.dropped.clear()
+        resolved = processor.resolve_in_batches(gtld_db.database_connection, cursor, unresolved)
+        self.assertEqual(resolved, 1)
+        self.assertEqual(gtld_data.DomainRecord.count_resolved(cursor, zd_id), (2, 2))
+        one = gtld_data.DomainRecord.from_db(cursor, domains[0].db_id)
+        self.assertEqual(len(one.reverse_lookup_ptrs), 3)
@@ -0,0 +1,70 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import unittest
+import io
+
+import dns.rdatatype
+
+import gtld_data
+from gtld_data.zone_reader import ZoneReader
+
+class TestZoneReader(unittest.TestCase):
+    def test_reading_zone_file(self):
+        '''Tests streaming the records we care about out of a zone file'''
+        records = list(ZoneReader('tests/data/db.internic', origin='internic'))
+
+        soa_records = [r for r in records if r[1] == dns.rdatatype.SOA]
+        self.assertEqual(len(soa_records), 1)
+        self.assertEqual(soa_records[0][2].serial, 2018102803)
+
+        ns_records = [(r[0], r[2].to_text()) for r in records if r[1] == dns.rdatatype.NS]
+        self.assertEqual(ns_records, [("internic.", "ns1.internic."),
+                                      ("nynex.internic.", "ns1.nynex.internic.")])
+
+        # DNSKEY and DS records are skipped
+        self.assertEqual(len(records), 7)
+
+    def test_relative_names_and_directives(self):
+        '''Tests $ORIGIN, blank owners and relative names'''
+        zone = io.StringIO(
+            "$ORIGIN example.\n"
+            "$TTL 3600\n"
+            "test  86400 IN NS ns1.test ; comment\n"
+            "      IN 86400 NS ns2.other.\n"
+            "txt   TXT \"a ; quoted ( string\"\n"
+            "@     NS (\n"
+            "        ns1.example.\n"
+            "      )\n"
+        )
+        reader = ZoneReader(zone)
+        records = [(r[0], r[2].to_text()) for r in reader if r[1] == dns.rdatatype.NS]
+        self.assertEqual(records, [("test.example.", "ns1.test.example."),
+                                   ("test.example.", "ns2.other."),
+                                   ("example.", "ns1.example.")])
+        self.assertEqual(reader.origin.to_text(), "example.")
+
+    def test_zone_data_from_stream(self):
+        '''Tests ZoneData counts nameservers while the file is read'''
+        zone_data = gtld_data.ZoneData.load_from_file(None, 'tests/data/db.internic', origin='internic')
+        self.assertEqual(zone_data.soa, 2018102803)
+        self.assertEqual(len(zone_data.domains), 2)
+        self.assertEqual(zone_data.known_nameservers["ns1.internic."].count, 1)
+        self.assertIn("fd36:7b4:c298:bce5::1002", zone_data.glue_records["ns1.nynex.internic."])
@@ -0,0 +1,91 @@
+# Copyright 2018 Michael Casadevall <michael@casadevall.pro>
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the 
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import tempfile
+import unittest
+
+import gtld_data
+from gtld_data.domain_rdata import DomainRData
+from gtld_data.zone_snapshot import ZoneSnapshot
+
+class TestZoneSnapshot(unittest.TestCase):
+    def setUp(self):
+        file_descriptor, self.snapshot_filename = tempfile.mkstemp()
+        os.close(file_descriptor)
+
+        self.zone_data = gtld_data.ZoneData.load_from_file(None, 'tests/data/db.internic', origin='internic')
+        domain = self.zone_data.domains['nynex.internic.']
+        domain.status = gtld_data.DomainStatus.PTR_PARKED
+        rdata = DomainRData()
+        rdata.rrtype = "A"
+        rdata.rdata = "192.0.2.1"
+        domain.add_record(None, rdata)
+        domain.store_ptrs(None, "192.0.2.1", ["parking.example."])
+
+    def tearDown(self):
+        os.remove(self.snapshot_filename)
+
+    def test_round_trip(self):
+        '''Tests a zone comes back from a snapshot the same as it went in'''
+        self.zone_data.save_snapshot(self.snapshot_filename)
+        zone_data = gtld_data.ZoneData.load_snapshot(self.snapshot_filename)
+
+        self.assertEqual(zone_data.origin, 'internic')
+        self.assertEqual(zone_data.soa, self.zone_data.soa)
+        self.assertEqual(sorted(zone_data.domains.keys()), sorted(self.zone_data.domains.keys()))
+        self.assertEqual(zone_data.known_nameservers['ns1.internic.'].count, 1)
+
+        domain = zone_data.domains['nynex.internic.']
+        self.assertEqual(domain.status, gtld_data.DomainStatus.PTR_PARKED)
+        self.assertEqual([ns.nameserver for ns in domain.nameservers], ['ns1.nynex.internic.'])
+        self.assertEqual([r.rdata for r in domain.records['A']], ['192.0.2.1'])
+        self.assertEqual([(p.ip_address, p.reverse_lookup_name) for p in domain.reverse_lookup_ptrs],
+                         [('192.0.2.1', 'parking.example.')])
+
+        # Lookups hand back the same objects each time, sharing nameservers
+        self.assertIs(zone_data.domains['nynex.internic.'], domain)
+        self.assertIs(list(domain.nameservers)[0], zone_data.known_nameservers['ns1.nynex.internic.'])
+        self.assertNotIn('missing.internic.', zone_data.domains)
+        zone_data.snapshot.close()
+
+    def test_processing(self):
+        '''Tests a snapshot classifies the same as the zone it came from'''
+        self.zone_data.save_snapshot(self.snapshot_filename)
+        zone_data = gtld_data.ZoneData.load_snapshot(self.snapshot_filename)
+
+        statuses = []
+        for zd in (self.zone_data, zone_data):
+            zone_processor = gtld_data.ZoneProcessor(zd)
+            zone_processor.load_known_parked_ptrs('data/reverse_parking_ptrs.txt')
+            zone_processor.process_zone_data()
+            statuses.append(dict((name, d.status) for name, d in zd.domains.items()))
+        self.assertEqual(statuses[0], statuses[1])
+        zone_data.snapshot.close()
+
+    def test_not_a_snapshot(self):
+        '''Tests other files are refused'''
+        with open(self.snapshot_filename, 'wb') as f:
+            f.write(b'not a snapshot at all')
+        with self.assertRaises(ValueError):
+            ZoneSnapshot(self.snapshot_filename)
+
+if __name__ == '__main__':
+    unittest.main()